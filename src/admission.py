@@ -0,0 +1,115 @@
+import threading
+import time
+from typing import Iterable, Iterator, Optional
+
+class AdmissionRejected(Exception):
+    """Raised by AdmissionControl.admit if an expensive request cannot be run, with the status code to answer with."""
+
+    def __init__(self, message: str, status: int, retry_after: int):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.retry_after = retry_after
+
+class AdmissionControl:
+    """
+    Keeps expensive requests from starving cheap ones. Requests are classified by their estimated cost (see
+    assignment.estimate_cost): cheap requests are always admitted, while expensive ones run in a bounded number of
+    slots, wait for a slot in a bounded queue, and get a deadline by which they are cancelled (see
+    assignment.DeadlineExceeded). Expensive requests are rejected upfront
+        with 429 if the queue is full, and
+        with 503 if their estimated run time exceeds the deadline, or no slot frees up in time to finish before it.
+
+    Used as `with admission.admit(estimate_cost(input)) as deadline: ...`, which passes the deadline (a
+    time.monotonic() value, or None for cheap requests) to the assignment. The slot is held until the with block ends,
+    or for streamed responses, until ticket.release() is called or the deadline passes, see _Ticket.stream.
+    """
+
+    def __init__(self, cost_threshold: int = 5000000, slots: int = 1, queue_size: int = 2, deadline: float = 30, cost_rate: float = 10000000):
+        """
+        :param cost_threshold: the estimated cost above which requests are expensive
+        :param slots: the number of expensive requests that run at the same time
+        :param queue_size: the number of expensive requests that wait for a slot at the same time
+        :param deadline: the number of seconds an expensive request may take, including waiting for a slot
+        :param cost_rate: the estimated cost that is computed per second, to estimate run times
+        """
+
+        self.cost_threshold = cost_threshold
+        self.queue_size = queue_size
+        self.deadline = deadline
+        self.cost_rate = cost_rate
+        self._slots = threading.BoundedSemaphore(slots)
+        self._lock = threading.Lock()
+        self._waiting = 0
+
+    def admit(self, cost: int) -> '_Ticket':
+        """Admits a request of the given estimated cost, or raises AdmissionRejected. Returns a ticket, see above."""
+
+        if cost <= self.cost_threshold: return _Ticket(None, None)
+
+        start = time.monotonic()
+        run_time = cost / self.cost_rate
+
+        if run_time > self.deadline:
+            raise AdmissionRejected(f"The request is estimated to take {run_time:.0f} seconds, above the deadline of {self.deadline} seconds. Request fewer seats or no table.", 503, 0)
+
+        acquired = self._slots.acquire(blocking=False)
+
+        if not acquired:
+            with self._lock:
+                if self._waiting >= self.queue_size:
+                    raise AdmissionRejected("Too many expensive requests are waiting. Try again later.", 429, max(1, round(run_time)))
+                self._waiting += 1
+
+            try:
+                acquired = self._slots.acquire(timeout=max(0, self.deadline - run_time))
+            finally:
+                with self._lock: self._waiting -= 1
+
+        if not acquired:
+            raise AdmissionRejected("The server is busy with expensive requests. Try again later.", 503, max(1, round(run_time)))
+
+        return _Ticket(start + self.deadline, self._slots)
+
+class _Ticket:
+    """An admitted request, holding a slot for expensive requests until released."""
+
+    def __init__(self, deadline: Optional[float], slots: Optional[threading.BoundedSemaphore]):
+        self.deadline = deadline
+        self._slots = slots
+        self._lock = threading.Lock()
+
+    def release(self):
+
+        with self._lock:
+            if self._slots is not None: self._slots.release()
+            self._slots = None
+
+    def stream(self, chunks: Iterable[str]) -> Iterator[str]:
+        """
+        Passes on the chunks of a streamed response. For expensive requests, the response is cut off at the deadline,
+        which leaves incomplete JSON rather than a result, and the slot is released then even if the client stalls
+        while a chunk is sent, so a slow client cannot hold it. The slot is also released once the chunks are sent.
+        """
+
+        if self.deadline is None:
+            yield from chunks
+            return
+
+        timer = threading.Timer(max(0, self.deadline - time.monotonic()), self.release)
+        timer.daemon = True
+        timer.start()
+
+        try:
+            for chunk in chunks:
+                if time.monotonic() > self.deadline: return
+                yield chunk
+        finally:
+            timer.cancel()
+            self.release()
+
+    def __enter__(self) -> Optional[float]:
+        return self.deadline
+
+    def __exit__(self, *exc_info):
+        self.release()
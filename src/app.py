@@ -1,30 +1,226 @@
 #from _typeshed.wsgi import ErrorStream
-from flask import Flask, request
+from flask import Flask, Response, request
 from flask_cors import CORS
 import json
 import os
 
-from assignment import assign
-from comparison import compare
+from admission import AdmissionControl, AdmissionRejected
+from assignment import DIVISOR_METHODS, METHODS, DeadlineExceeded, assign_lazy, estimate_cost, precompute_divisors
+from batch import assign_many
+from biproportional import biproportional, estimate_biproportional_cost
+from cache import AssignmentCache
+from comparison import compare, compare_lazy, compare_many
+from etags import input_etag
+from metrics import Metrics, json_response
+from outcomes import estimate_outcomes_cost, input_outcomes, listed_outcomes
+from quotients import estimate_quotients_cost, input_quotients
+from results import Distribution
+from robustness import PERTURBATION_MODELS, estimate_robustness_cost, robustness
+from sensitivity import estimate_sensitivity_cost, sensitivity
+from streaming import stream_json
+from validation import SEAT_LIMIT, dict_raise_on_duplicates, validate_compare_input, validate_input
 
 app = Flask(__name__)
 
-# Allows CORS ON ALL ROUTES FOR ALL METHODS
-CORS(app)
+# Allows CORS ON ALL ROUTES FOR ALL METHODS, with the headers of /azur and /azur_delta readable by the frontend
+CORS(app, expose_headers=['ETag', 'Azur-Unchanged-Seats'])
+
+# The divisor sequences of all divisor methods are computed up to the largest number of seats accepted (SEAT_LIMIT, see
+# validation.py) once, before the workers are forked, so they are shared by all requests and workers
+precompute_divisors(SEAT_LIMIT)
+
+# Results of /azur, see cache.py. Sized by the AZUR_CACHE_ENTRIES and AZUR_CACHE_BYTES environment variables
+cache = AssignmentCache(max_entries=int(os.environ.get('AZUR_CACHE_ENTRIES', 256)),
+                        memory_budget=int(os.environ.get('AZUR_CACHE_BYTES', 256 * 2**20)))
+
+# Timing of the phases of /azur requests, see metrics.py. Turned off by setting the AZUR_METRICS environment variable to 0.
+# With several server processes, AZUR_METRICS_DIR is the directory they share their metrics in (see gunicorn.conf.py)
+METRICS_ENABLED = os.environ.get('AZUR_METRICS', '1') != '0'
+metrics = Metrics(os.environ.get('AZUR_METRICS_DIR'))
+
+# Expensive requests run in a bounded number of slots per worker process with a deadline, see admission.py. Configured by
+# the AZUR_EXPENSIVE_COST, AZUR_EXPENSIVE_SLOTS, AZUR_EXPENSIVE_QUEUE and AZUR_DEADLINE environment variables
+admission = AdmissionControl(cost_threshold=int(os.environ.get('AZUR_EXPENSIVE_COST', 5000000)),
+                             slots=int(os.environ.get('AZUR_EXPENSIVE_SLOTS', 1)),
+                             queue_size=int(os.environ.get('AZUR_EXPENSIVE_QUEUE', 2)),
+                             deadline=float(os.environ.get('AZUR_DEADLINE', 30)))
+
+# Results of /azur and /azur_compare have an ETag, see etags.py, and may be cached by browsers and proxies for
+# AZUR_CACHE_MAX_AGE seconds, in particular those of the GET variants of the routes
+CACHE_MAX_AGE = int(os.environ.get('AZUR_CACHE_MAX_AGE', 3600))
+
+def assignment_cost(input):
+    """Estimates the cost of a validated assignment input, see assignment.estimate_cost, with its requested pages."""
+
+    cost = estimate_cost(input)
+    if input.get('return_quotients', False): cost += estimate_quotients_cost(input)
+    if input.get('return_outcomes', False): cost += estimate_outcomes_cost(input)
+
+    return cost
+
+def scenario_pages(input, status, output, deadline):
+    """
+    Adds the pages of quotients and outcomes requested by a scenario of /azur_batch to its output, like /azur does, in a
+    copy, as the output may be cached. Returns the status and output of the scenario, see batch.assign_many.
+    """
+
+    if status != 200: return status, output
+
+    try:
+        output = dict(output)
+        if input.get('return_quotients', False): output['quotients'] = list(input_quotients(input, SEAT_LIMIT, deadline))
+        if input.get('return_outcomes', False): output['outcomes'] = listed_outcomes(input, Distribution.from_dict(output['distribution']), deadline)
+    except DeadlineExceeded:
+        return 503, {'message': 'The scenario did not finish before the deadline of the batch.'}
+
+    return status, output
 
 @app.route('/hello_world') #TODO replace with default route and link to API docs
 def hello_world():
     return 'Hi Lotsen!'
 
-@app.route('/azur', methods=['POST'])
+@app.route('/azur', methods=['GET', 'POST'])
 def azur():
     """
     Main route of the app, accepts an API POST request with assignment parameters and returns distribution,
-    possibly assignment sequence, and possibly table depending on inputs
+    possibly assignment sequence, and possibly table depending on inputs. If metrics are enabled, the response has a
+    Server-Timing header with the time of each phase of the request, which is also recorded for /metrics. Expensive
+    requests go through admission control, and are answered with 429 or 503 if they cannot run or finish in time.
+    Results have an ETag, and a request with a matching If-None-Match header is answered with 304 without computing
+    the result. For divisor methods, a page of the quotient table can be added with 'return_quotients', see
+    quotients.py, and for ties, the number of outcomes of the lot and a page of them with 'return_outcomes', see
+    outcomes.py. The parameters can also be sent as GET request with the JSON in the 'input' query parameter, whose
+    results are cacheable, see request_json.
     """
     #TODO docstring
 
+    timer = metrics.timer(METRICS_ENABLED)
+
     # Read and parse request JSON
+    try:
+        with timer.phase('parse'):
+            input = request_json()
+    
+    except Exception as e:
+        if type(e) == ValueError: return timer.finish({'message': str(e)}, 500) # This probably means there's a duplicate key
+        return timer.finish({'message': 'The request JSON could not be parsed.'}, 500) # TODO error codes
+
+    try:
+        # Validating input completeness and sanitization
+        with timer.phase('validate'):
+            input_is_valid, error_info, error_code = validate_input(input)
+        
+        if not input_is_valid: return timer.finish(error_info, error_code)
+
+        etag, cache_headers = result_etag('/azur', input)
+        cache.remember(etag, input) # For /azur_delta
+        if request.if_none_match.contains_weak(etag): return timer.finish(Response(status=304), 304, cache_headers)
+
+        ticket = admission.admit(assignment_cost(input))
+
+        if input.get('stream', False):
+            # Streamed responses cannot fail once started, so they hold their slot until sent or cut off at the deadline
+            try:
+                out = assign_lazy(input)
+                if input.get('return_quotients', False): out['quotients'] = input_quotients(input, SEAT_LIMIT)
+                if input.get('return_outcomes', False): out['outcomes'] = input_outcomes(input, Distribution.from_dict(out['distribution']))
+
+                response = Response(ticket.stream(stream_json(out)), mimetype='application/json')
+            except:
+                ticket.release()
+                raise
+
+            response.call_on_close(ticket.release)
+            return timer.finish(response, 200, cache_headers)
+
+        with ticket as deadline, timer.phase('engine'):
+            output = cache.assign_result(input, deadline)
+            if input.get('return_quotients', False): output.quotients = list(input_quotients(input, SEAT_LIMIT, deadline))
+            if input.get('return_outcomes', False): output.outcomes = listed_outcomes(input, output.distribution, deadline)
+
+        timer.label(input, output)
+        return timer.finish(output, 200, cache_headers)
+
+    except AdmissionRejected as e:
+        return timer.finish({'message': e.message}, e.status, {'Retry-After': str(e.retry_after)} if e.retry_after else None)
+
+    except DeadlineExceeded:
+        return timer.finish({'message': f"The request did not finish within the deadline of {admission.deadline} seconds."}, 503)
+
+    except:
+        return timer.finish({'message': 'An unexpected server error occurred.'}, 500)
+
+@app.route('/azur_delta', methods=['POST'])
+def azur_delta():
+    """
+    Recomputes a previous /azur result for changed votes: accepts the ETag of the previous input as 'base' and the new
+    'votes' of the parties that changed, and returns the /azur output for the previous input with these votes, with the
+    ETag of that input. The result is updated from the cached result of the previous input where possible, see
+    AssignmentCache.update_result; if so, the Azur-Unchanged-Seats header has the number of seats up to which the
+    assignment sequence and table are unchanged. Previous inputs are only kept for a while, and by each worker process,
+    so a 'base' that is not known is answered with 404, and the full input has to be sent to /azur instead.
+    """
+
+    try:
+        input = request_json()
+
+    except Exception as e:
+        if type(e) == ValueError: return {'message': str(e)}, 500 # This probably means there's a duplicate key
+        return {'message': 'The request JSON could not be parsed.'}, 500 # TODO error codes
+
+    try:
+        try:
+            base_etag, changes = input['base'], input['votes']
+        except KeyError as e:
+            return {'message': f'Value with key {e} is required but was not found in the input data'}, 404
+
+        try:
+            assert type(base_etag) == str, f"'base' parameter must be the ETag of a previous /azur input, but got {str(type(base_etag))}."
+            assert type(changes) == dict and len(changes) > 0, "'votes' parameter must be a non-empty dict of format {party_name: votes}."
+        except AssertionError as e:
+            return {'message': str(e)}, 400
+
+        base = cache.recall(base_etag.strip('"'))
+        if base is None:
+            return {'message': f"The base input {base_etag} is not known (anymore), the full input has to be sent to /azur."}, 404
+
+        unknown = [party for party in changes.keys() if party not in base['votes'].keys()]
+        if unknown: return {'message': f"The parties {unknown} are not in the votes of the base input."}, 400
+
+        votes = dict(base['votes'], **changes)
+        updated = dict(base, votes=votes)
+        input_is_valid, error_info, error_code = validate_input(updated)
+        if not input_is_valid: return error_info, error_code
+
+        etag, cache_headers = result_etag('/azur', updated)
+        cache.remember(etag, updated)
+        if request.if_none_match.contains_weak(etag): return Response(status=304), 304, cache_headers
+
+        with admission.admit(assignment_cost(updated)) as deadline:
+            output, seats_kept = cache.update_result(base, votes, deadline)
+            if updated.get('return_quotients', False): output.quotients = list(input_quotients(updated, SEAT_LIMIT, deadline))
+            if updated.get('return_outcomes', False): output.outcomes = listed_outcomes(updated, output.distribution, deadline)
+
+        if seats_kept is not None: cache_headers['Azur-Unchanged-Seats'] = str(seats_kept)
+        return json_response(output), 200, cache_headers
+
+    except AdmissionRejected as e:
+        return {'message': e.message}, e.status, {'Retry-After': str(e.retry_after)} if e.retry_after else {}
+
+    except DeadlineExceeded:
+        return {'message': f"The request did not finish within the deadline of {admission.deadline} seconds."}, 503
+
+    except:
+        return {'message': 'An unexpected server error occurred.'}, 500
+
+@app.route('/azur_batch', methods=['POST'])
+def azur_batch():
+    """
+    Accepts a list of assignment inputs (as accepted by /azur) under the key 'scenarios', and returns a list 'results'
+    in the same order, with for each scenario its 'status' code and either its 'result' or 'error' info. Scenarios are
+    validated one by one, so an invalid scenario does not fail the others.
+    """
+
     try:
         request_data = request.get_data()
         input = json.loads(request_data, object_pairs_hook=dict_raise_on_duplicates) # Catch duplicates in input JSON
@@ -33,103 +229,284 @@ def azur():
         if type(e) == ValueError: return {'message': str(e)}, 500 # This probably means there's a duplicate key
         return {'message': 'The request JSON could not be parsed.'}, 500 # TODO error codes
 
+    scenarios = input.get('scenarios') if type(input) == dict else None
+    if type(scenarios) != list:
+        return {'message': f"'scenarios' parameter must be list, but got {str(type(scenarios))}."}, 400
+
+    scenario_limit = 1000
+    if len(scenarios) > scenario_limit:
+        return {'message': f"The batch contains {len(scenarios)} scenarios, above the accepted limit of {scenario_limit}"}, 400
+
+    try:
+        results = [None for _ in scenarios]
+        valid_positions = []
+
+        for i, scenario in enumerate(scenarios):
+            if type(scenario) != dict:
+                results[i] = {'status': 400, 'error': {'message': f"Scenario must be dict, but got {str(type(scenario))}."}}
+                continue
+
+            input_is_valid, error_info, error_code = validate_input(scenario)
+            if input_is_valid: valid_positions.append(i)
+            else: results[i] = {'status': error_code, 'error': error_info}
+
+        # The batch is admitted as a whole, see admission.py
+        valid_scenarios = [scenarios[i] for i in valid_positions]
+        with admission.admit(sum(assignment_cost(x) for x in valid_scenarios)) as deadline:
+            outputs = assign_many(valid_scenarios, cache.assign, deadline)
+            outputs = [scenario_pages(x, status, output, deadline) for x, (status, output) in zip(valid_scenarios, outputs)]
+
+        for i, (status, output) in zip(valid_positions, outputs):
+            results[i] = {'status': status, 'result' if status == 200 else 'error': output}
+
+        return {'results': results}, 200
+
+    except AdmissionRejected as e:
+        return {'message': e.message}, e.status, {'Retry-After': str(e.retry_after)} if e.retry_after else {}
+
+    except:
+        return {'message': 'An unexpected server error occurred.'}, 500
+
+@app.route('/metrics')
+def metrics_route():
+    """Returns the latency histograms and counters of /azur in the Prometheus text format, see metrics.py."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4'), 200
+
+@app.route('/cache_stats')
+def cache_stats():
+    """Returns the hit, miss and eviction counters and the memory usage of the result cache of /azur."""
+    return cache.stats(), 200
+
+@app.route('/azur_sensitivity', methods=['POST'])
+def azur_sensitivity():
+    """
+    Accepts the assignment parameters of /azur and returns the distribution and, for each party, the number of votes
+    it would need to gain resp. lose a seat, see sensitivity.sensitivity. Expensive requests go through admission
+    control like /azur.
+    """
+
+    try:
+        request_data = request.get_data()
+        input = json.loads(request_data, object_pairs_hook=dict_raise_on_duplicates) # Catch duplicates in input JSON
+
+    except Exception as e:
+        if type(e) == ValueError: return {'message': str(e)}, 500 # This probably means there's a duplicate key
+        return {'message': 'The request JSON could not be parsed.'}, 500 # TODO error codes
+
     try:
-        # Validating input completeness and sanitization
         input_is_valid, error_info, error_code = validate_input(input)
-        
-        if input_is_valid: return assign(input), 200
-        else: return error_info, error_code
+
+        if not input_is_valid: return error_info, error_code
+
+        with admission.admit(estimate_sensitivity_cost(len(input['votes']), input['method'])) as deadline:
+            return sensitivity(input['votes'], input['method'], input['num_of_seats'], deadline), 200
+
+    except AdmissionRejected as e:
+        return {'message': e.message}, e.status, {'Retry-After': str(e.retry_after)} if e.retry_after else {}
+
+    except DeadlineExceeded:
+        return {'message': f"The request did not finish within the deadline of {admission.deadline} seconds."}, 503
 
     except:
         return {'message': 'An unexpected server error occurred.'}, 500
 
-@app.route('/azur_compare', methods=['POST'])
-def azur_compare():
+@app.route('/azur_robustness', methods=['POST'])
+def azur_robustness():
+    """
+    Accepts the assignment parameters of /azur, plus a 'perturbation' of format {'model': 'uniform' or 'normal',
+    'scale': percent}, a number of 'samples' and optionally a 'seed', and returns for each party the probability of
+    each number of seats and of gaining or losing seats under this noise on the votes, see robustness.robustness.
+    """
 
     try:
         request_data = request.get_data()
         input = json.loads(request_data, object_pairs_hook=dict_raise_on_duplicates) # Catch duplicates in input JSON
-    
+
     except Exception as e:
         if type(e) == ValueError: return {'message': str(e)}, 500 # This probably means there's a duplicate key
         return {'message': 'The request JSON could not be parsed.'}, 500 # TODO error codes
-    
-    #TODO input validation
-    
-    params_1 = input['dist_A']
-    params_2 = input['dist_B']
-    num_seats = input['num_of_seats']
 
     try:
-        return compare(params_1, params_2, num_seats), 200
+        input_is_valid, error_info, error_code = validate_input(input)
+        if not input_is_valid: return error_info, error_code
+
+        perturbation = input.get('perturbation', {})
+        samples = input.get('samples', 10000)
+        seed = input.get('seed')
+
+        try:
+            assert type(perturbation) == dict, f"'perturbation' parameter must be dict, but got {str(type(perturbation))}."
+            assert perturbation.get('model', 'uniform') in PERTURBATION_MODELS, f"Unknown perturbation model: Expected one of {PERTURBATION_MODELS} but got {perturbation.get('model')}"
+            scale = perturbation.get('scale', 5)
+            assert type(scale) in [int, float] and 0 <= scale <= 100, f"'scale' of the perturbation must be a number of percent from 0 to 100, but got {scale}."
+            assert type(samples) == int and 1 <= samples <= 100000, f"'samples' parameter must be int from 1 to 100000, but got {samples}."
+            assert seed is None or type(seed) == int, f"'seed' parameter must be int, but got {str(type(seed))}."
+
+        except AssertionError as e:
+            return {'message': str(e)}, 400
+
+        cost = estimate_robustness_cost(len(input['votes']), input['num_of_seats'], samples)
+        with admission.admit(cost) as deadline:
+            return robustness(input['votes'], input['method'], input['num_of_seats'], perturbation.get('model', 'uniform'), scale, samples, seed, deadline), 200
+
+    except AdmissionRejected as e:
+        return {'message': e.message}, e.status, {'Retry-After': str(e.retry_after)} if e.retry_after else {}
+
+    except DeadlineExceeded:
+        return {'message': f"The request did not finish within the deadline of {admission.deadline} seconds."}, 503
+
     except:
-        return {'message':'An unexpected server error occured.'}, 500
+        return {'message': 'An unexpected server error occurred.'}, 500
+
+@app.route('/azur_biproportional', methods=['POST'])
+def azur_biproportional():
+    """
+    Accepts a matrix of 'votes' of format {row_name: {column_name: votes}}, eg. of parties in districts, a divisor
+    'method', the 'column_seats' of format {column_name: seats} and optionally the 'row_seats' or the 'upper_method'
+    distributing the seats to the rows, and returns the biproportional apportionment, see biproportional.biproportional.
+    """
+
+    try:
+        request_data = request.get_data()
+        input = json.loads(request_data, object_pairs_hook=dict_raise_on_duplicates) # Catch duplicates in input JSON
+
+    except Exception as e:
+        if type(e) == ValueError: return {'message': str(e)}, 500 # This probably means there's a duplicate key
+        return {'message': 'The request JSON could not be parsed.'}, 500 # TODO error codes
+
+    try:
+        try:
+            votes, method, column_seats = input['votes'], input['method'], input['column_seats']
+        except KeyError as e:
+            return {'message': f'Value with key {e} is required but was not found in the input data'}, 404
 
+        row_seats = input.get('row_seats')
+        upper_method = input.get('upper_method')
+        entries_limit = 100000
 
-def validate_input(input): #TODO docstring; typing
+        try:
+            assert type(votes) == dict and len(votes) > 0, "'votes' parameter must be a non-empty dict of format {row_name: {column_name: votes}}."
+            assert type(column_seats) == dict and len(column_seats) > 0, "'column_seats' parameter must be a non-empty dict of format {column_name: seats}."
+            assert all(type(row) == dict and row.keys() == column_seats.keys() for row in votes.values()), "Each row of the votes must have the votes of exactly the columns in 'column_seats'."
+            assert all(type(v) == int and 0 <= v <= 1000000000 for row in votes.values() for v in row.values()), "Some or all of the vote values are not integers from 0 to 1,000,000,000."
+            assert len(votes) * len(column_seats) <= entries_limit, f"The votes have {len(votes) * len(column_seats)} entries, above the accepted limit of {entries_limit}."
+            assert method in DIVISOR_METHODS, f"Unknown method: Expected one of {list(DIVISOR_METHODS.keys())} but got {method}"
+
+            seats = [column_seats] if row_seats is None else [column_seats, row_seats]
+            assert row_seats is None or (type(row_seats) == dict and row_seats.keys() == votes.keys()), "'row_seats' parameter must be a dict with the seats of exactly the rows in the votes."
+            assert all(type(x) == int and x >= 0 for totals in seats for x in totals.values()), "The numbers of seats of the rows and columns must be integers of at least 0."
+            assert 0 < sum(column_seats.values()) <= SEAT_LIMIT, f"The total number of seats must be between 1 and {SEAT_LIMIT}."
+            assert upper_method is None or upper_method in METHODS, f"Unknown upper method: Expected one of {list(METHODS.keys())} but got {upper_method}"
+            assert upper_method is None or row_seats is None, "Only one of 'row_seats' and 'upper_method' can be given."
+
+        except AssertionError as e:
+            return {'message': str(e)}, 400
+
+        cost = estimate_biproportional_cost(len(votes), len(column_seats), sum(column_seats.values()))
+        with admission.admit(cost) as deadline:
+            output = biproportional(votes, method, column_seats, row_seats, upper_method, deadline=deadline)
+
+        # Totals that can be met are checked upfront, see biproportional._check_totals, so this is not the input's fault
+        if not output['converged']: return {'message': 'The biproportional apportionment did not converge.'}, 500
+        return output, 200
+
+    except ValueError as e:
+        return {'message': str(e)}, 400
+
+    except AdmissionRejected as e:
+        return {'message': e.message}, e.status, {'Retry-After': str(e.retry_after)} if e.retry_after else {}
+
+    except DeadlineExceeded:
+        return {'message': f"The request did not finish within the deadline of {admission.deadline} seconds."}, 503
+
+    except:
+        return {'message': 'An unexpected server error occurred.'}, 500
+
+@app.route('/azur_compare', methods=['GET', 'POST'])
+def azur_compare():
     """
-    Determines whether a given json is a valid input for the API to receive
-    :param input: the input JSON received from flask
-    :return: 
-        (1) a bool with whether or not the input is valid
-        (2) if not valid, a dict with error information
-        (3) if not valid, an int with the error id
+    Compares the outputs of either two scenarios 'dist_A' and 'dist_B', or of a list of 'scenarios' (see
+    comparison.compare_many), each of format {'method': ..., 'votes': {...}}, for the same 'num_of_seats'. The table is
+    compared unless 'return_table' is false. For a list of scenarios, 'output' can be set to 'sparse' to only return
+    the rows and sequence positions where the scenarios diverge, while 'table_format' and 'stream' are only accepted
+    for 'dist_A' and 'dist_B'. Like /azur, results have an ETag and there is a GET
+    variant of the route, and expensive requests go through admission control, with the cost of all scenarios.
     """
 
-    # Required variables are in request
     try:
-        method = input['method']
-        votes = input['votes']
-        num_of_seats = input['num_of_seats']
-    except KeyError as e:
-        return False, {'message': f'Value with key {e} is required but was not found in the input data'}, 404
-
-    # Types and dimensions of input are correct
-    try:     
-        assert type(votes) == dict, f"'votes' parameter must be dict, but got {str(type(votes))}."
-        assert all(type(v) == str for v in votes.keys()), "Some or all of of the party names in the votes dictionary are not strings."
-        assert all(type(v) == int for v in votes.values()), "Some or all of of the vote values in the votes dictionary are not integers."
-        assert all(v >= 0 for v in votes.values()), "Some or all of the vote values in the votes dictionary are negative."
-        assert all(v <= 1000000000 for v in votes.values()), "Some or all of the vote values in the votes dictionary are above 1,000,000,000."
-        assert all(len(v) in range(1,33) for v in votes.keys()), "Some or all of the party names in the votes dict are not between 1 and 32 characters long."
-        assert len(votes) > 0, "The passed votes dictionary is empty."
-
-        assert type(num_of_seats) == int, f"'num_of_seats' parameter must be int, but got {str(type(num_of_seats))}."
-        assert type(method) == str, f"'method' parameter must be string, but got {str(type(method))}."
-
-        if 'return_table' in input.keys(): assert type(input['return_table']) == bool, f"'return_table' parameter must be bool, but got {str(type(input['return_table']))}."
-
-    except AssertionError as e:
-        return False, {'message': str(e)}, 400
-
-    # All submitted variables are within allowed range
-    # TODO turn into asserts
-    allowed_methods = ['schepers', 'hare', 'dhondt']
-    if method not in allowed_methods: 
-        return False, {'message': f"Unknown method: Expected one of {allowed_methods} but got {method}"}, 500
-    
-    seat_limit = 100000
-    if num_of_seats > seat_limit: 
-        return False, {'message': f"Num_of_seats ({num_of_seats}) is above accepted limit of {seat_limit}"}, 400
-    elif num_of_seats <= 0:
-        return False, {'message': f"Num_of_seats ({num_of_seats}) is below 1"}, 400
-
-    parties_limit = 100
-    if len(votes) > parties_limit: 
-        return False, {'message': f"The votes dictionary contains {len(votes)} parties, above the accepted limit of {parties_limit}"}
-    
-    return True, None, None
+        input = request_json()
+
+    except Exception as e:
+        if type(e) == ValueError: return {'message': str(e)}, 500 # This probably means there's a duplicate key
+        return {'message': 'The request JSON could not be parsed.'}, 500 # TODO error codes
+
+    input_is_valid, error_info, error_code = validate_compare_input(input)
+    if not input_is_valid: return error_info, error_code
+
+    num_seats = input.get('num_of_seats')
+    return_table = input.get('return_table', True)
+    table_format = input.get('table_format', 'rows')
+    output = input.get('output', 'full')
+
+    if 'scenarios' in input.keys(): scenarios = input['scenarios']
+    else: scenarios = [input.get('dist_A'), input.get('dist_B')]
+
+    etag, cache_headers = result_etag('/azur_compare', input)
+    if request.if_none_match.contains_weak(etag): return Response(status=304), 304, cache_headers
+
+    try:
+        cost = sum(estimate_cost(dict(x, num_of_seats=num_seats, return_table=return_table, table_format=table_format)) for x in scenarios)
+
+        if 'scenarios' in input.keys():
+            with admission.admit(cost) as deadline:
+                return compare_many(scenarios, num_seats, return_table, output == 'sparse', deadline), 200, cache_headers
+
+        params_1, params_2 = scenarios
+        if input.get('stream', False):
+            # Like the streamed responses of /azur, see there
+            ticket = admission.admit(cost)
+            try:
+                response = Response(ticket.stream(stream_json(compare_lazy(params_1, params_2, num_seats, return_table, table_format))), mimetype='application/json')
+            except:
+                ticket.release()
+                raise
+
+            response.call_on_close(ticket.release)
+            return response, 200, cache_headers
+
+        with admission.admit(cost) as deadline:
+            return compare(params_1, params_2, num_seats, return_table, table_format, deadline), 200, cache_headers
+
+    except AdmissionRejected as e:
+        return {'message': e.message}, e.status, {'Retry-After': str(e.retry_after)} if e.retry_after else {}
+
+    except DeadlineExceeded:
+        return {'message': f"The request did not finish within the deadline of {admission.deadline} seconds."}, 503
+
+    except:
+        return {'message':'An unexpected server error occured.'}, 500
+
+
+def request_json():
+    """
+    Parses the request JSON: the body of a POST request, or the 'input' query parameter of a GET request, so that the
+    URL identifies the result for browser and proxy caches. Rejects duplicate keys, see dict_raise_on_duplicates.
+    """
+
+    request_data = request.args.get('input', '') if request.method == 'GET' else request.get_data()
+    return json.loads(request_data, object_pairs_hook=dict_raise_on_duplicates) # Catch duplicates in input JSON
+
+def result_etag(route, input):
+    """
+    Returns the ETag of the result of a route for a validated input (see etags.input_etag), and the headers of its
+    responses: the quoted ETag and the Cache-Control, for AZUR_CACHE_MAX_AGE seconds.
+    """
 
-def dict_raise_on_duplicates(ordered_pairs): #TODO docstring; typing
-    """Helper function that rejects duplicate keys in dict, passed to json.loads above."""
-    d = {}
-    for k, v in ordered_pairs:
-        if k in d: raise ValueError("Duplicate key: %r" % (k,))
-        else: d[k] = v
-    return d
+    etag = input_etag(route, input)
+    return etag, {'ETag': f'"{etag}"', 'Cache-Control': f'public, max-age={CACHE_MAX_AGE}'}
 
 
 if __name__ == '__main__':
-    # Bind to PORT if defined, otherwise default to 5000.
+    # Development server only, see gunicorn.conf.py for production. Bind to PORT if defined, otherwise default to 5000.
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=port, debug=os.environ.get('AZUR_DEBUG', '0') == '1')
\ No newline at end of file
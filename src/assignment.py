@@ -1,156 +1,694 @@
+import heapq
+from array import array
+import threading
+import time
+from itertools import islice
 import numpy as np
-from typing import Mapping, Dict, List, Union
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, TypeVar, Union
 from fractions import Fraction
+from functools import lru_cache
 
-def assign(input): #TODO docstring; typing
+from results import AssignmentResult, Distribution, SeatAssignment, distributions
+from tables import TableRow, build_table, lazy_table, rows_from_distributions
+
+class DeadlineExceeded(Exception):
+    """Raised by the assignment methods if they are given a deadline and it passes before they finish."""
+
+T = TypeVar('T')
+
+class DivisorMethod:
+    """
+    A divisor method, declared by its sequence of divisors: a party with s seats competes for its next seat with the
+    quotient votes**power / divisor(s). All divisor methods run on the engine of assign_iterative.
+    Divisors are integers, scaled by a common factor if needed (which leaves the ordering of the quotients unchanged),
+    and must not decrease with s. A power other than 1 expresses irrational divisors exactly, eg. Huntington-Hill's
+    sqrt(s(s+1)) as votes**2 / (s(s+1)). A divisor of 0 gives an infinite quotient, ie. every party with votes gets a
+    seat before any party gets a second one.
+    The divisors are cached as an array, shared by all requests, which grows to the largest number of seats needed so
+    far (see precompute_divisors).
+    """
+
+    def __init__(self, divisor: Callable[[int], int], power: int = 1, scale: int = 1):
+        """
+        :param divisor: a function mapping a party's number of seats to the integer divisor of its next quotient, which
+        must also work elementwise on a numpy array of numbers of seats, and stay below 2**63 up to the seat limit
+        :param power: the power the votes are raised to in the quotients
+        :param scale: the factor the divisors are scaled by, ie. the actual quotient is (votes**power * scale /
+        divisor) ** (1 / power), as shown in the quotient table (see quotients.py)
+        """
+
+        self.divisor = divisor
+        self.power = power
+        self.scale = scale
+        self._divisors = np.zeros(0, dtype=np.int64)
+        self._lock = threading.Lock()
+
+    def divisors(self, n: int) -> np.ndarray:
+        """Returns the first n divisors, ie. for 0 up to n-1 seats, from the cache."""
+
+        divisors = self._divisors
+
+        if len(divisors) < n:
+            with self._lock:
+                if len(self._divisors) < n:
+                    size = max(n, 2 * len(self._divisors))
+                    self._divisors = np.asarray(self.divisor(np.arange(size, dtype=np.int64)), dtype=np.int64)
+                divisors = self._divisors
+
+        return divisors[:n]
+
+    def seats_above(self, weights: List[int], threshold: float, seats_available: int) -> List[int]:
+        """
+        Counts, for each weight, the quotients weight / d above the threshold, ie. the divisors d < weight * q / p for
+        the threshold p / q, in exact integer arithmetic. Counts above seats_available may be capped at seats_available + 1.
+        """
+
+        divisors = self.divisors(seats_available + 1)
+        p, q = threshold.as_integer_ratio()
+        bounds = [min(-(-w * q // p), int(divisors[-1]) + 1) for w in weights]
+
+        return np.searchsorted(divisors, np.array(bounds, dtype=np.int64), 'left').tolist()
+
+    def weights(self, votes: Mapping[str, int]) -> List[int]:
+        """Returns the weights of the quotients, ie. the votes of each party raised to the power of the method."""
+
+        return [x ** self.power for x in votes.values()] if self.power != 1 else list(votes.values())
+
+    def assign(self, votes: Mapping[str, int], seats_available: int, return_table: bool = False, return_sequence: bool = True, table_format: str = 'rows', deadline: Optional[float] = None) -> Dict[str, Union[Dict, List[Dict]]]:
+        """Applies the method, see assign_iterative."""
+
+        return self.result(votes, seats_available, return_table, return_sequence, table_format, deadline).to_dict()
+
+    def result(self, votes: Mapping[str, int], seats_available: int, return_table: bool = False, return_sequence: bool = True, table_format: str = 'rows', deadline: Optional[float] = None) -> AssignmentResult:
+        """Applies the method and returns the output as an AssignmentResult, see iterative_result."""
+
+        return iterative_result(votes, seats_available, self, return_table, return_sequence, table_format, deadline)
+
+class LinearDivisorMethod(DivisorMethod):
+    """A divisor method whose divisors grow by a constant step, first + step * s, which counts seats in closed form."""
+
+    def __init__(self, first: int, step: int, scale: int = 1):
+        super().__init__(lambda n_seats: first + step * n_seats, scale=scale)
+        self.first = first
+        self.step = step
+
+    def seats_above(self, weights: List[int], threshold: float, seats_available: int) -> List[int]:
+        p, q = threshold.as_integer_ratio()
+        return [max(0, -((self.first * p - w * q) // (self.step * p))) for w in weights]
+
+# The assignment methods by name, see register_method
+METHODS = {}
+
+# The divisor methods among them
+DIVISOR_METHODS = {}
+
+def register_method(name: str, method: Union[DivisorMethod, Callable]):
+    """
+    Makes an assignment method available under a name to assign and the API. A method is either a DivisorMethod or a
+    function with the signature of hare_niemeyer.
+    """
+
+    METHODS[name] = method
+    if isinstance(method, DivisorMethod): DIVISOR_METHODS[name] = method
+
+def precompute_divisors(seat_limit: int):
+    """Fills the divisor caches of all registered divisor methods up to seat_limit seats, eg. before forking workers."""
+
+    for method in DIVISOR_METHODS.values(): method.divisors(seat_limit + 1)
+
+def assign(input, deadline: Optional[float] = None): #TODO docstring; typing
     """
     Calls the assignment method required by an assignment input JSON and returns the output the method produces. Assumes
-    the input is validated.
+    the input is validated. If a deadline (in time.monotonic() seconds) is given, raises DeadlineExceeded once it passes.
     """
-    
+
+    return assign_result(input, deadline).to_dict()
+
+def assign_result(input: Dict, deadline: Optional[float] = None) -> AssignmentResult:
+    """
+    Like assign, but returns the output as an AssignmentResult (see results.py), which is only turned into the nested
+    dicts of the API by its to_dict. Methods registered as functions return these dicts, which are read back.
+    """
+
     votes = input['votes']
     method = input['method']
     num_seats = input['num_of_seats']
+    return_table, return_sequence, table_format = output_options(input)
+
+    if method in DIVISOR_METHODS:
+        result = DIVISOR_METHODS[method].result(votes, num_seats, return_table, return_sequence, table_format, deadline)
+    elif METHODS[method] is hare_niemeyer:
+        result = hare_niemeyer_result(votes, num_seats, return_table, table_format, deadline)
+    else:
+        result = AssignmentResult.from_dict(METHODS[method](votes, num_seats, return_table, table_format, deadline))
+
+    house_sizes = table_selection(input)
+    if house_sizes is not None: result.table = sparse_distributions(votes, method, house_sizes, deadline)
+
+    return result
+
+def assign_lazy(input: Dict) -> Dict[str, Union[Dict, Iterator]]:
+    """
+    Like assign, but the assignment sequence and table are generators (see tables.lazy_table) which run the engine only
+    while they are consumed, so the output can be streamed (see streaming.py) without holding it in memory. The
+    distribution is computed upfront, for divisor methods with _divisor_fast_start. Assumes the input is validated.
+    """
+
+    votes = input['votes']
+    method = input['method']
+    num_seats = input['num_of_seats']
+    return_table, return_sequence, table_format = output_options(input)
+
+    parties = list(votes.keys())
+    out = {}
+
+    house_sizes = table_selection(input)
+    if house_sizes is not None: out['table'] = sparse_table(votes, method, house_sizes)
+
+    if method == 'hare':
+        out['distribution'] = single_distribution_hare_niemeyer(votes, num_seats)
+        if return_table:
+            rows = _hare_niemeyer_rows(votes, np.arange(1, num_seats+1), table_format == 'delta')
+            out['table'] = lazy_table(parties, rows, table_format)
+        return out
+
+    divisor_method = DIVISOR_METHODS[method]
+    out['distribution'] = assign_iterative(votes, num_seats, divisor_method, False, False)['distribution']
+
+    # Each generator runs the engine on its own, so neither has to keep the steps of the other
+    weights, divisor = divisor_method.weights(votes), divisor_method.divisors(num_seats + 1).item
+    steps = lambda: _iterate_divisor_steps(weights, divisor, num_seats, [0 for _ in parties])
+
+    if return_sequence: out['assignment_sequence'] = (x.to_dict() for x in _divisor_sequence(parties, steps()))
+    if return_table: out['table'] = lazy_table(parties, _divisor_table_rows(len(parties), steps()), table_format)
+
+    return out
+
+def estimate_cost(input: Dict) -> int:
+    """
+    Estimates the cost of assign for a validated input, in rough units of 0.1 microseconds (ie. about 10^7 units per
+    second on a single core), from the number of seats and parties and the parts of the output that are requested.
+    """
+
+    n_parties, num_seats = len(input['votes']), input['num_of_seats']
+    return_table, return_sequence, _ = output_options(input)
+
+    cost = 64 * n_parties # a single distribution, including the fast start of divisor methods
+    if input['method'] in DIVISOR_METHODS and (return_table or return_sequence): cost += num_seats * (30 + 2 * n_parties.bit_length())
+    if return_table: cost += 2 * num_seats * n_parties
+
+    house_sizes = table_selection(input)
+    if house_sizes is not None:
+        cost += 2 * len(house_sizes) * n_parties
+        if input['method'] in DIVISOR_METHODS and type(house_sizes) == range: cost += len(house_sizes) * (30 + 2 * n_parties.bit_length())
+        elif input['method'] in DIVISOR_METHODS: cost += 64 * len(house_sizes) * n_parties
+
+    return cost
+
+def output_options(input: Dict) -> Tuple[bool, bool, str]:
+    """Reads return_table, return_sequence and table_format from an assignment input, with their defaults."""
 
-    # Handling return_table
     return_table = False
     if 'return_table' in input.keys(): return_table = input['return_table']
+    return_sequence = True
+    if 'return_sequence' in input.keys(): return_sequence = input['return_sequence']
+    table_format = 'rows'
+    if 'table_format' in input.keys(): table_format = input['table_format']
 
-    if method == 'schepers':
-        output = schepers(votes, num_seats, return_table)
-    elif method == 'dhondt':
-        output = dhondt(votes, num_seats, return_table)
-    elif method == 'hare':
-        output = hare_niemeyer(votes, num_seats, return_table)
-    
-    return output
+    if table_selection(input) is not None: return_table = False # Only the selected rows are returned, see sparse_table
+
+    return return_table, return_sequence, table_format
+
+def table_selection(input: Dict) -> Optional[Sequence[int]]:
+    """
+    Reads the rows of the table selected by an assignment input, if any: either a list of numbers of seats under
+    'table_seats', or a range of them under 'table_range' as [first, last]. Assumes the input is validated.
+    :return: the selected numbers of seats as a list, or as a range for 'table_range', else None
+    """
 
-def dhondt(votes: Mapping[str, int], seats_available: int, return_table: bool = False) -> Dict[str, Union[Dict, List[Dict]]]:
+    if 'table_seats' in input.keys(): return list(input['table_seats'])
+    if 'table_range' in input.keys(): return range(input['table_range'][0], input['table_range'][1] + 1)
+
+    return None
+
+def sparse_table(votes: Mapping[str, int], method: str, house_sizes: Sequence[int], deadline: Optional[float] = None) -> List[Dict]:
+    """
+    Computes only the given rows of the table of an assignment method, without the rows in between. Hare/Niemeyer
+    computes each house size directly. Divisor methods jump to each house size with _divisor_fast_start, or for a range
+    of house sizes, jump to its first row and run the engine from there.
+    :param house_sizes: the numbers of seats of the rows, in any order, eg. as returned by table_selection
+    :return: the distributions for the house sizes, in their order, each of format {'seats': {...}, 'is_ambiguous': bool}
+    """
+
+    return [x.to_dict() for x in sparse_distributions(votes, method, house_sizes, deadline)]
+
+def sparse_distributions(votes: Mapping[str, int], method: str, house_sizes: Sequence[int], deadline: Optional[float] = None) -> List[Distribution]:
+    """Like sparse_table, but returns each row as a Distribution (see results.py). Rows of the same size are shared."""
+
+    parties = list(votes.keys())
+
+    if len(house_sizes) == 0: return []
+
+    if method in DIVISOR_METHODS and type(house_sizes) == range:
+        divisor_method = DIVISOR_METHODS[method]
+        weights = divisor_method.weights(votes)
+        seats = _divisor_fast_start(weights, divisor_method, house_sizes[0] - 1)
+        start_seats = list(seats)
+
+        divisor = divisor_method.divisors(house_sizes[-1] + 1).item
+        steps = _with_deadline(_iterate_divisor_steps(weights, divisor, house_sizes[-1], seats), deadline)
+        rows = islice(_divisor_table_rows(len(parties), steps, start_seats), house_sizes[0] - 1 - sum(start_seats), None)
+        return distributions(parties, rows)
+
+    distinct_sizes = sorted(set(house_sizes))
+
+    if method in DIVISOR_METHODS:
+        rows = (iterative_result(votes, x, DIVISOR_METHODS[method], False, False, deadline=deadline).distribution for x in distinct_sizes)
+    else:
+        rows = (Distribution.from_row(parties, row) for row in _hare_niemeyer_rows(votes, np.array(distinct_sizes)))
+
+    rows_by_size = dict(zip(distinct_sizes, _with_deadline(rows, deadline)))
+
+    return [rows_by_size[x] for x in house_sizes]
+
+def dhondt(votes: Mapping[str, int], seats_available: int, return_table: bool = False, return_sequence: bool = True, table_format: str = 'rows', deadline: Optional[float] = None) -> Dict[str, Union[Dict, List[Dict]]]:
     """
     Applies the d'Hondt Method for calculating the distribution of all seats available based on
     the proportions of votes. See assign_iterative docstring for parameter and return documentation.
     """
     # TODO update docstring for new output
 
-    return assign_iterative(votes, seats_available, 1, return_table)
+    return assign_iterative(votes, seats_available, DIVISOR_METHODS['dhondt'], return_table, return_sequence, table_format, deadline)
 
-def schepers(votes: Mapping[str, int], seats_available: int, return_table: bool = False) -> Dict[str, Union[Dict, List[Dict]]]:
+def schepers(votes: Mapping[str, int], seats_available: int, return_table: bool = False, return_sequence: bool = True, table_format: str = 'rows', deadline: Optional[float] = None) -> Dict[str, Union[Dict, List[Dict]]]:
     """ 
     Applies the Saint-Lague/Schepers Method for calculating the distribution of all seats available based on
     the proportions of votes. See assign_iterative docstring for parameter and return documentation.
     """
 
-    return assign_iterative(votes, seats_available, 0.5, return_table)
+    return assign_iterative(votes, seats_available, DIVISOR_METHODS['schepers'], return_table, return_sequence, table_format, deadline)
 
-def assign_iterative(votes: Mapping[str, int], seats_available: int, div_starting_val: int = 1, return_table: bool = False) -> Dict[str, Union[Dict, List[Dict]]]:
+def assign_iterative(votes: Mapping[str, int], seats_available: int, divisor_method: Union[DivisorMethod, int, float] = 1, return_table: bool = False, return_sequence: bool = True, table_format: str = 'rows', deadline: Optional[float] = None) -> Dict[str, Union[Dict, List[Dict]]]:
     """ 
-    Performs the recursive assignment loop underlying dhondt and schepers methods
+    Performs the recursive assignment loop underlying all divisor methods (see DIVISOR_METHODS)
     :param votes: the number of votes each party/faction received in a mapping of format {party_name: seats}
     :param seats_available: the total number of seats (or minutes, or rooms...) available for distribution
-    :param div_starting_val: the initial value of the divisor which is kept for each faction (1 for d'Hondt, 0.5 for Schepers)
+    :param divisor_method: the DivisorMethod, or the initial value of a divisor which is kept for each faction and
+    increases by 1 per seat (1 for d'Hondt, 0.5 for Schepers)
     :param return_table: whether or not the function should also return a table with each distribution up to the given one
+    :param return_sequence: whether or not the function should return the assignment sequence. If neither the sequence
+    nor the table is needed, most seats are assigned at once by _divisor_fast_start instead of one by one
+    :param table_format: the format of the table, one of tables.TABLE_FORMATS
+    :param deadline: optionally a time.monotonic() value, after which the assignment is cancelled by DeadlineExceeded
     :return: A dict containing
         (1) 'distribution', a dict containing
             (a) 'seats', a dict of format {party_name: n_seats}, where n_seats is an int if unambiguous and a list of possible values if ambiguous
             (b) 'is_ambiguous', a bool signalling if there are ambiguities 
-        (2) 'assignment_sequence', a list of dicts which each contain
+        (2) optionally 'assignment_sequence', a list of dicts which each contain
             (a) 'seat_goes_to', the party (as str) or list of parties (if ambiguous) the seat goes to
             (b) 'is_ambiguous', a bool signalling if there are ambiguities
         (3) optionally 'table', a list containing dicts, each of the same format as (1), from 1 up to seats_available seats
+        (or the same table in the 'columnar' or 'delta' format, see tables.py)
     """
 
+    return iterative_result(votes, seats_available, divisor_method, return_table, return_sequence, table_format, deadline).to_dict()
+
+def iterative_result(votes: Mapping[str, int], seats_available: int, divisor_method: Union[DivisorMethod, int, float] = 1, return_table: bool = False, return_sequence: bool = True, table_format: str = 'rows', deadline: Optional[float] = None) -> AssignmentResult:
+    """Like assign_iterative, but returns the output as an AssignmentResult (see results.py)."""
+
+    divisor_method = _divisor_method(divisor_method)
+    parties = list(votes.keys())
+    weights = divisor_method.weights(votes)
+    divisor = divisor_method.divisors(seats_available + 1).item
+
     # Initialize required tracking vars
-    divs = {key: div_starting_val for key in votes.keys()}
-    ambigs = {key: 0 for key in votes.keys()}
-    assgs = []
-    if return_table: table, ambig_table = [], []
-    skip_iter = 0 # An n-way ambiguity handles n rows at once. This variable tracks how many iters are then skipped 
+    if return_table or return_sequence: seats = [0 for _ in parties]
+    else: seats = _divisor_fast_start(weights, divisor_method, seats_available)
 
-    for i in range(seats_available):
-        
-        if skip_iter > 0: # Iteration handled by previous one bc of ambiguity; skip iteration
-            skip_iter -= 1
-            continue 
+    steps = list(_with_deadline(_iterate_divisor_steps(weights, divisor, seats_available, seats), deadline))
+
+    return divisor_result(parties, steps, seats, return_table, return_sequence, table_format, deadline)
+
+def divisor_output(parties: List[str], steps: List[Tuple[List[int], int]], seats: List[int], return_table: bool = False, return_sequence: bool = True, table_format: str = 'rows', deadline: Optional[float] = None) -> Dict[str, Union[Dict, List[Dict]]]:
+    """
+    Formats the output of assign_iterative from the steps of its engine (see _iterate_divisor_steps).
+    :param parties: the party names, in order of the votes mapping
+    :param steps: the steps of the engine, starting from zero seats if the sequence or table is returned
+    :param seats: the number of seats of each party after the last step
+    :return: the output of assign_iterative
+    """
+
+    return divisor_result(parties, steps, seats, return_table, return_sequence, table_format, deadline).to_dict()
+
+def divisor_result(parties: List[str], steps: List[Tuple[List[int], int]], seats: List[int], return_table: bool = False, return_sequence: bool = True, table_format: str = 'rows', deadline: Optional[float] = None) -> AssignmentResult:
+    """Like divisor_output, but returns the output as an AssignmentResult (see results.py)."""
+
+    # The last step may be a tie that does not fit into the seats left
+    ambiguous = 0
+    if steps and steps[-1][1] < len(steps[-1][0]):
+        for p in steps[-1][0]: ambiguous |= 1 << p
+
+    result = AssignmentResult(Distribution(parties, seats, ambiguous))
+
+    if return_sequence: result.assignment_sequence = list(_with_deadline(_divisor_sequence(parties, steps), deadline))
+
+    if return_table:
+        rows = _with_deadline(_divisor_table_rows(len(parties), steps), deadline)
+        result.table = distributions(parties, rows) if table_format == 'rows' else build_table(parties, rows, table_format)
+
+    return result
+
+def divisor_steps(votes: Mapping[str, int], seats_available: int, divisor_method: Union[DivisorMethod, int, float] = 1, deadline: Optional[float] = None) -> List[Tuple[List[int], int]]:
+    """
+    Runs the engine of assign_iterative from zero seats and returns all of its steps (see _iterate_divisor_steps). These
+    are a compact record of the whole assignment, from which divisor_output can format the output for any number of
+    seats up to seats_available, see truncate_divisor_steps.
+    """
+
+    divisor_method = _divisor_method(divisor_method)
+    seats = [0 for _ in votes]
+    divisor = divisor_method.divisors(seats_available + 1).item
+
+    return list(_with_deadline(_iterate_divisor_steps(divisor_method.weights(votes), divisor, seats_available, seats), deadline))
+
+def truncate_divisor_steps(n_parties: int, steps: List[Tuple[List[int], int]], seats_available: int) -> Tuple[List[Tuple[List[int], int]], List[int]]:
+    """
+    Cuts the steps returned by divisor_steps down to the steps for a smaller number of seats. A tie that no longer fits
+    into the seats becomes the last, unresolved step.
+    :return: the steps for seats_available seats, and the number of seats of each party after them
+    """
+
+    seats = [0 for _ in range(n_parties)]
+    truncated = []
+    seats_assigned = 0
+
+    for tied, n_seats in steps:
+        if seats_assigned >= seats_available: break
+
+        n_seats = min(n_seats, seats_available - seats_assigned)
+        truncated.append((tied, n_seats))
+        seats_assigned += n_seats
+
+        if n_seats == len(tied):
+            for p in tied: seats[p] += 1
+
+    return truncated, seats
+
+def update_divisor_steps(old_votes: Mapping[str, int], votes: Mapping[str, int], steps: List[Tuple[List[int], int]], seats_available: int, divisor_method: Union[DivisorMethod, int, float] = 1, deadline: Optional[float] = None) -> Tuple[List[Tuple[List[int], int]], int]:
+    """
+    Updates the steps of divisor_steps for old_votes to the steps for votes, which differ in the votes of some parties.
+    The quotients of the other parties do not depend on the changed ones, so their steps are read from the old steps
+    (and only continued by the engine if they get more seats than before), and merged by quotient with the steps of the
+    engine over the changed parties alone. This replaces the heap of all parties by a merge of two streams.
+    :param old_votes: the votes the steps were computed for
+    :param votes: the new votes, of the same parties in the same order
+    :param steps: the steps for old_votes and seats_available seats, eg. of truncate_divisor_steps
+    :return: the steps for votes, and the number of seats before the first step that differs from the old steps
+    """
+
+    divisor_method = _divisor_method(divisor_method)
+    old_weights, weights = divisor_method.weights(old_votes), divisor_method.weights(votes)
+    divisor = divisor_method.divisors(seats_available + 1).item
+
+    changed = [p for p, (old, new) in enumerate(zip(old_weights, weights)) if old != new]
+    if not changed: return steps, seats_available
+
+    unchanged = [p for p in range(len(weights)) if p not in set(changed)]
+    streams = [_unchanged_steps(steps, unchanged, weights, divisor, seats_available), _party_steps(changed, weights, divisor, seats_available)]
+    new_steps = list(_with_deadline(_merge_divisor_steps(streams, weights, divisor, seats_available), deadline))
+
+    seats_kept = 0
+    for old_step, new_step in zip(steps, new_steps):
+        if old_step != new_step: break
+        seats_kept += new_step[1]
+
+    return new_steps, seats_kept
+
+def _unchanged_steps(steps: List[Tuple[List[int], int]], parties: List[int], weights: List[int], divisor: Callable[[int], int], seats_available: int) -> Iterator[List[int]]:
+    """
+    The tied parties of each step of the engine over a subset of parties whose weights did not change, read from the
+    steps of the engine over all parties as long as they last, ie. up to an unresolved tie, then continued by the engine.
+    """
+
+    included = set(parties)
+    seats = [0 for _ in weights]
+
+    for tied, n_seats in steps:
+        if n_seats < len(tied): break
+
+        if len(tied) > 1: tied = [p for p in tied if p in included]
+        elif tied[0] not in included: continue
+        if not tied: continue
+
+        for p in tied: seats[p] += 1
+        yield tied
+
+    yield from _party_steps(parties, weights, divisor, seats_available, [seats[p] for p in parties])
+
+def _party_steps(parties: List[int], weights: List[int], divisor: Callable[[int], int], seats_available: int, seats: Optional[List[int]] = None) -> Iterator[List[int]]:
+    """The tied parties of each step of the engine over a subset of parties, by their index among all parties."""
+
+    if not parties: return
+    if seats is None: seats = [0 for _ in parties]
+
+    for tied, _ in _iterate_divisor_steps([weights[p] for p in parties], divisor, seats_available, seats):
+        yield [parties[i] for i in tied]
+
+def _merge_divisor_steps(streams: List[Iterator[List[int]]], weights: List[int], divisor: Callable[[int], int], seats_available: int) -> Iterator[Tuple[List[int], int]]:
+    """
+    Merges the steps of the engine over two disjoint subsets of parties (see _party_steps) into the steps of the engine
+    over all of them, see _iterate_divisor_steps: the step with the higher quotient comes first, and tied steps are
+    joined. The quotient of a step is that of its first party, with its seats before the step, compared like _Quotient.
+    """
+
+    seats = [0 for _ in weights]
+    heads = [next(stream, None) for stream in streams]
+    seats_assigned = 0
+
+    def quotient(head):
+        if head is None: return None
+        w, d = weights[head[0]], divisor(seats[head[0]])
+        return w, d if w or d else 1
+
+    quotients = [quotient(head) for head in heads]
+
+    while seats_assigned < seats_available:
+        (w0, d0), (w1, d1) = quotients[0] or (-1, 1), quotients[1] or (-1, 1) # A finished stream comes last
+
+        if w0 * d1 > w1 * d0: take = (0,)
+        elif w0 * d1 < w1 * d0: take = (1,)
+        else: take = (0, 1)
+
+        tied = heads[take[0]] if len(take) == 1 else sorted(heads[0] + heads[1])
+
+        if seats_assigned + len(tied) > seats_available: # Tie can't be resolved within the seats left
+            yield tied, seats_available - seats_assigned
+            return
+
+        seats_assigned += len(tied)
+        for p in tied: seats[p] += 1
+        for i in take:
+            heads[i] = next(streams[i], None)
+            quotients[i] = quotient(heads[i])
+
+        yield tied, len(tied)
+
+def _with_deadline(items: Iterable[T], deadline: Optional[float], check_every: int = 1024) -> Iterator[T]:
+    """
+    Passes on the items of an iterable, eg. the steps of an engine or the rows of a table, and raises DeadlineExceeded
+    if the deadline (a time.monotonic() value) has passed, checking every check_every items. This is where the
+    assignment methods can be cancelled, as they are built on such iterables.
+    """
+
+    if deadline is None:
+        yield from items
+        return
+
+    for i, item in enumerate(items):
+        if i % check_every == 0 and time.monotonic() > deadline: raise DeadlineExceeded()
+        yield item
+
+class _Quotient:
+    """
+    Heap entry of a party in _iterate_divisor_steps, representing the quotient weight/divisor. Entries are ordered so that
+    heapq (a min-heap) pops the highest quotient first, and equal quotients in the order of the parties in the votes
+    mapping. Quotients are compared exactly by integer cross-multiplication instead of building Fractions.
+    """
+
+    __slots__ = ('weight', 'divisor', 'party')
+
+    def __init__(self, weight: int, divisor: int, party: int):
+        self.weight = weight
+        self.divisor = divisor if weight or divisor else 1 # 0/0 is 0, not equal to every quotient
+        self.party = party
 
-        divided_vals = {key: Fraction(val)/Fraction(divs[key]) for (key, val) in votes.items()}
+    def __lt__(self, other: '_Quotient') -> bool:
+        lhs, rhs = self.weight * other.divisor, other.weight * self.divisor
+        return lhs > rhs or (lhs == rhs and self.party < other.party)
+
+    def ties(self, other: '_Quotient') -> bool:
+        return self.weight * other.divisor == other.weight * self.divisor
+
+@lru_cache(maxsize=None)
+def _linear_divisor(div_starting_val: Union[int, float]) -> DivisorMethod:
+    """
+    Turns the starting value of a divisor sequence with steps of 1 (1 for d'Hondt, 0.5 for Schepers) into a
+    LinearDivisorMethod. All divisors are scaled by the same factor so that they are integers.
+    """
+
+    num, den = Fraction(div_starting_val).as_integer_ratio()
+
+    return LinearDivisorMethod(num, den, scale=den)
+
+def _divisor_method(divisor_method: Union[DivisorMethod, int, float]) -> DivisorMethod:
+    """Returns a DivisorMethod as is, and turns a starting value of a divisor into one, see _linear_divisor."""
+
+    return divisor_method if isinstance(divisor_method, DivisorMethod) else _linear_divisor(divisor_method)
+
+def _divisor_fast_start(weights: List[int], divisor_method: DivisorMethod, seats_available: int) -> List[int]:
+    """
+    Estimates the distribution of a divisor method directly instead of seat by seat: bisects on the quotient threshold
+    until (nearly) seats_available quotients lie strictly above it, and gives each party one seat per quotient above the
+    threshold. As tied quotients lie on the same side of any threshold, this is exactly the distribution after the first
+    seats of the sequential loop, and the few seats left (including any ties) can then go through _iterate_divisor_steps.
+    Costs O(P log V) for linear divisors (O(P log V log S) for others, once they are cached) regardless of seats_available.
+    :param weights: the weights of each party (see DivisorMethod.weights), in order of the parties
+    :param divisor_method: the divisor method
+    :param seats_available: the total number of seats available for distribution
+    :return: a list with the number of seats of each party, summing up to at most seats_available
+    """
+
+    first_divisor = int(divisor_method.divisors(2)[0]) or int(divisor_method.divisors(2)[1]) # The first finite quotient
+    lo, hi = 0.0, max(weights) / first_divisor # More than seats_available resp. no finite quotients above the threshold
+    seats = [0 for _ in weights]
+
+    while hi > 0:
+        mid = (lo + hi) / 2
+        if mid in (lo, hi): break
+
+        mid_seats = divisor_method.seats_above(weights, mid, seats_available)
+        n_seats = sum(mid_seats)
+
+        if n_seats > seats_available: lo = mid
+        else: 
+            hi, seats = mid, mid_seats
+            if n_seats == seats_available: break
+
+    return seats
+
+def _divisor_rows(quotient_weights: np.ndarray, divisors: np.ndarray, totals: np.ndarray, max_steps: int = 100) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Applies a divisor method to each row of a matrix at once, on floats: bisects, for all rows together, on the
+    quotient threshold t above which a row has exactly totals[row] quotients weight / d, counting the quotients of each
+    entry above t by binary search in the divisors. Rows without a threshold for their total, ie. with tied quotients,
+    and rows that are not resolved in max_steps steps keep the last bracket [lo, hi] of thresholds. As quotients are
+    compared as float64, callers check rows close to a tie exactly.
+    :param quotient_weights: a float array of shape (N, P) with the weights of the quotients (see DivisorMethod.weights)
+    :param divisors: a float array with the divisors for 0 up to at least max(totals) seats
+    :param totals: an int array of shape (N,) with the number of seats of each row
+    :return: the thresholds lo and hi of each row and the seats of each entry at either, where the seats at hi sum up
+    to at most the total, and exactly to it for resolved rows, and the seats at lo sum up to more than the total
+    """
+
+    n_rows, n_parties = quotient_weights.shape
+    divisors = divisors[:int(totals.max(initial=0)) + 1]
+    max_weights = quotient_weights.max(axis=1, initial=0)
+
+    with np.errstate(divide='ignore'):
+        # The largest weight alone has more than total quotients above lo, and no finite quotient is above hi
+        lo = max_weights / divisors[totals] / 2
+        hi = max_weights / (divisors[0] or divisors[1])
+
+    seats_lo = np.full((n_rows, n_parties), len(divisors))
+    seats_hi = np.zeros((n_rows, n_parties), dtype=np.int64)
+    hi[totals == 0] = np.inf
+    open_rows = np.flatnonzero((totals > 0) & (max_weights > 0))
+
+    for _ in range(max_steps):
+        if len(open_rows) == 0: break
+
+        mid = lo[open_rows] * np.sqrt(hi[open_rows] / lo[open_rows])
+        stuck = (mid <= lo[open_rows]) | (mid >= hi[open_rows]) # The bracket can't be narrowed any further
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mid_seats = np.searchsorted(divisors, quotient_weights[open_rows] / mid[:, None], 'left')
+        n_seats = mid_seats.sum(axis=1)
+
+        above = n_seats > totals[open_rows]
+        lo[open_rows[above]], seats_lo[open_rows[above]] = mid[above], mid_seats[above]
+        hi[open_rows[~above]], seats_hi[open_rows[~above]] = mid[~above], mid_seats[~above]
+
+        open_rows = open_rows[(n_seats != totals[open_rows]) & ~stuck]
+
+    return lo, hi, seats_lo, seats_hi
+
+def _iterate_divisor_steps(weights: List[int], divisor: Callable[[int], int], seats_available: int, seats: List[int]) -> Iterator[Tuple[List[int], int]]:
+    """
+    The engine underlying assign_iterative: keeps the parties in a priority queue by their current quotient and hands out
+    seats in order of the highest quotient. Yields, for each step, the indices of the parties with the highest quotient,
+    ie. one party or all parties that are tied for the next seat(s), and the number of seats this step covers. This is
+    the number of tied parties, unless the tie does not fit into the seats that are left.
+    :param weights: the votes of each party, in order of the parties
+    :param divisor: a function mapping a party's number of seats to the (integer) divisor of its next quotient
+    :param seats_available: the total number of seats to be handed out
+    :param seats: the number of seats of each party, updated in place before each yield. If a tie does not fit into the
+    seats that are left, its parties do not get a seat and the iteration ends
+    """
+
+    heap = [_Quotient(w, divisor(seats[p]), p) for p, w in enumerate(weights)]
+    heapq.heapify(heap)
+    seats_assigned = sum(seats)
+
+    while seats_assigned < seats_available:
 
         # Find party/parties that get next seat
-        seat_goes_to = [i for i, x in enumerate(divided_vals.values()) if x == max(divided_vals.values())]
-        
-        if len(seat_goes_to) == 1: # No ambiguity
-
-            party_key = max(divided_vals, key=divided_vals.get)  # get key for party that gets the seat
-            assgs.append(party_key)
-            divs[party_key] += 1
-            if return_table: 
-                table.append(divs.copy())
-                ambig_table.append({key: 0 for key in votes})
-
-        else: # Ambiguity
-            
-            # Find names of ambiguous parties
-            party_keys = [x for i, x in enumerate(divided_vals.keys()) if i in seat_goes_to]
-
-            # Find number of ambig. seats
-            n_ambiguous_seats = len(party_keys) - 1
-
-            # Add list of tied parties to assignment order
-            for p in range(n_ambiguous_seats + 1): 
-                if len(assgs) < seats_available:
-                    assgs.append(party_keys) 
-            
-            # Skip the next n iterations of the loop
-            skip_iter = n_ambiguous_seats
-
-            # Skipping those iterations may end the loop, in that case add ambiguity to seats output
-            if i + skip_iter >= seats_available: 
-                for party in party_keys: ambigs[party] = 1
-            else:
-                # Otherwise increase all ambiguous parties' divisors by 1
-                for party in party_keys: divs[party] += 1 
-            
-            if return_table:
-                
-                # Add as many rows in table as previous one as seats are ambiguous
-                # And add ambiguities in ambig table
-                for r in range(n_ambiguous_seats): 
-                    if len(table) <= seats_available:
-                        
-                        if len(table) > 0: table.append(table[-1].copy())
-                        else: table.append({key: div_starting_val for key in votes}) # Case where first row is ambiguous
-
-                        ambig_table.append({key: 1 if key in party_keys else 0 for key in votes})
-                    
-                # Add row to table where ambiguity is resolved, ie. each ambig. party gets an extra seat
-                if len(table) <= seats_available: 
-                    table.append(divs.copy())
-                    ambig_table.append({key: 0 for key in votes})
-
-    ### Format Output
-    out = {}
+        tied = [heapq.heappop(heap)]
+        while heap and heap[0].ties(tied[0]): tied.append(heapq.heappop(heap))
 
-    # Format final distribution
-    seats_corrected = {key: int(divs[key]-div_starting_val) for key in divs} # convert divisors to seats
-    seats_with_ambigs, is_ambiguous = add_ambiguity(seats_corrected, ambigs) # add ambiguities to seats dict if relevant
-    out['distribution'] = {'seats': seats_with_ambigs, 'is_ambiguous': is_ambiguous}
-    
-    # Format assignment sequence
-    assgs_final = [{'seat_goes_to': x, 'is_ambiguous': (type(x) == list)} for x in assgs]
-    out['assignment_sequence'] = assgs_final
+        if seats_assigned + len(tied) > seats_available: # Tie can't be resolved within the seats left
+            yield [q.party for q in tied], seats_available - seats_assigned
+            return
 
-    # Format table
-    if return_table: 
+        seats_assigned += len(tied)
+        for q in tied:
+            seats[q.party] += 1
+            heapq.heappush(heap, _Quotient(q.weight, divisor(seats[q.party]), q.party))
 
-        final_table = []
-        table = [{key: int(row[key] - div_starting_val) for key in row} for row in table] # convert divisors to seats
+        yield [q.party for q in tied], len(tied)
 
-        for row in range(seats_available):
-            row_seats, row_ambiguity = add_ambiguity(table[row], ambig_table[row])
-            final_table.append({'seats': row_seats, 'is_ambiguous': row_ambiguity})
-        
-        out['table'] = final_table
-    
-    return out
+def _divisor_sequence(parties: List[str], steps: Iterable[Tuple[List[int], int]]) -> Iterator[SeatAssignment]:
+    """
+    Generates the assignment sequence from the steps yielded by _iterate_divisor_steps. Each seat of a tie goes to the
+    list of all tied parties, whose SeatAssignment is shared by all seats of the tie.
+    """
+
+    for tied, n_seats in steps:
+
+        assignment = SeatAssignment(parties, tied)
+        for _ in range(n_seats): yield assignment
+
+def _divisor_table_rows(n_parties: int, steps: Iterable[Tuple[List[int], int]], start_seats: Optional[List[int]] = None) -> Iterator[TableRow]:
+    """
+    Replays the steps yielded by _iterate_divisor_steps from zero seats (or from start_seats, if the engine started
+    there) and generates the rows of the table (see tables.TableRow), one per seat. Rows inside a tie keep the seats
+    from before it, with the tied parties marked as ambiguous, until the row where the tie is resolved and each tied
+    party gets its seat.
+    """
+
+    seats = array('q', [0]) * n_parties if start_seats is None else array('q', start_seats)
+
+    for tied, n_seats in steps:
+
+        if len(tied) == 1: # No ambiguity
+            seats[tied[0]] += 1
+            yield seats, (), ((tied[0], 1),)
+            continue
+
+        for _ in range(min(n_seats, len(tied) - 1)): yield seats, tied, ()
+
+        if n_seats == len(tied):
+            for p in tied: seats[p] += 1
+            yield seats, (), [(p, 1) for p in tied]
 
 def add_ambiguity(seats: Dict[str, int], ambigs: Dict[str, int]) -> Dict[str, Union[int, list]]:
     """
@@ -167,28 +705,136 @@ def add_ambiguity(seats: Dict[str, int], ambigs: Dict[str, int]) -> Dict[str, Un
 
     return ambig_dict, is_ambiguous
 
-def hare_niemeyer(votes: Mapping[str, int], seats_available: int, return_table: bool = False) -> Dict[str, Union[Dict, List[Dict]]]:
+def hare_niemeyer(votes: Mapping[str, int], seats_available: int, return_table: bool = False, table_format: str = 'rows', deadline: Optional[float] = None) -> Dict[str, Union[Dict, List[Dict]]]:
 
-    out = {}
+    return hare_niemeyer_result(votes, seats_available, return_table, table_format, deadline).to_dict()
 
-    if return_table:
-        out['table'] = [single_distribution_hare_niemeyer(votes, x) for x in range(1,seats_available+1)]
-        out['distribution'] = out['table'][-1]
-    else:
-        out['distribution'] = single_distribution_hare_niemeyer(votes, seats_available)
+def hare_niemeyer_result(votes: Mapping[str, int], seats_available: int, return_table: bool = False, table_format: str = 'rows', deadline: Optional[float] = None) -> AssignmentResult:
+    """Like hare_niemeyer, but returns the output as an AssignmentResult (see results.py)."""
 
-    return out
+    if not return_table: return AssignmentResult(_hare_niemeyer_distribution(votes, seats_available))
+
+    parties = list(votes.keys())
+    rows = _with_deadline(_hare_niemeyer_rows(votes, np.arange(1, seats_available+1), table_format == 'delta'), deadline)
+
+    if table_format == 'rows':
+        table = distributions(parties, rows)
+        return AssignmentResult(table[-1], table=table)
+
+    return AssignmentResult(_hare_niemeyer_distribution(votes, seats_available), table=build_table(parties, rows, table_format))
+
+def _hare_niemeyer_rows(votes: Mapping[str, int], house_sizes: np.ndarray, with_changes: bool = False, chunk_entries: int = 1000000) -> Iterator[TableRow]:
+    """
+    Generates the Hare/Niemeyer distributions for several house sizes at once, as rows of a table (see tables.TableRow).
+    The house sizes are processed in chunks of at most chunk_entries quotas by _hare_niemeyer_kernel, which works on
+    integer arrays. Falls back to computing each distribution with Fractions if the votes are all zero or the quotas
+    would overflow int64.
+    :param votes: the number of votes that each party/fraction received in a mapping of format {party_name: seats}
+    :param house_sizes: a 1-D array of the numbers of seats to compute the distribution for
+    :param with_changes: whether or not to compute the changes of each row compared to the previous one (else left empty)
+    :param chunk_entries: the maximum number of house sizes times parties processed at once
+    """
+
+    votes_vals = list(votes.values())
+
+    if not _hare_niemeyer_fits_int64(votes_vals, int(max(house_sizes))):
+        yield from rows_from_distributions((_single_distribution_hare_niemeyer_fractions(votes, int(x)) for x in house_sizes), with_changes)
+        return
+
+    weights = np.array(votes_vals, dtype=np.int64)
+    chunk_size = max(1, chunk_entries // len(votes_vals))
+    previous_seats = np.zeros((1, len(votes_vals)), dtype=np.int64)
+
+    for start in range(0, len(house_sizes), chunk_size):
+        seats, ambigs, is_ambiguous = _hare_niemeyer_kernel(weights, np.asarray(house_sizes[start:start+chunk_size], dtype=np.int64))
+
+        if with_changes:
+            diffs = np.diff(seats, axis=0, prepend=previous_seats)
+            previous_seats = seats[-1:]
+
+        for r, (row_seats, row_is_ambiguous) in enumerate(zip(seats.tolist(), is_ambiguous.tolist())):
+            ambiguous = np.flatnonzero(ambigs[r]).tolist() if row_is_ambiguous else ()
+            changes = ()
+            if with_changes:
+                changed = np.flatnonzero(diffs[r])
+                changes = list(zip(changed.tolist(), diffs[r, changed].tolist()))
+            yield row_seats, ambiguous, changes
+
+def _hare_niemeyer_kernel(weights: np.ndarray, house_sizes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Applies the Hare/Niemeyer Method to each house size at once. The quota house_size * votes / total_votes is split into
+    its integer part and the remainder house_size * votes % total_votes, so remainders are compared exactly. The seats
+    left after the integer parts go to the largest remainders; if the last of these seats goes to a remainder that is
+    shared by more parties than seats are left, these parties are ambiguous, as in single_distribution_hare_niemeyer.
+    :param weights: an int64 array of shape (P,) with the votes of each party, or of shape (S, P) with other votes for
+    each house size
+    :param house_sizes: an int64 array of shape (S,) with the numbers of seats to distribute
+    :return: 
+        (1) an int array of shape (S, P) with the seats of each party that are certain
+        (2) an int array of shape (S, P) with 1 for each party that may get one seat more, else 0
+        (3) a bool array of shape (S,) signalling for each house size if there are ambiguities
+    """
+
+    totals = weights.sum(axis=-1, keepdims=True)
+    fulls, rests = np.divmod(house_sizes[:, None] * weights, totals)
+    seats_left = house_sizes - fulls.sum(axis=1)
+
+    # The remainder that gets the last seat left; with no seats left, no remainder reaches the threshold
+    n_rows, n_parties = fulls.shape
+    sorted_rests = np.sort(rests, axis=1)
+    last_index = np.clip(n_parties - seats_left, 0, n_parties - 1)
+    threshold = np.where(seats_left > 0, sorted_rests[np.arange(n_rows), last_index], totals[..., 0])
+
+    above = rests > threshold[:, None]
+    at = rests == threshold[:, None]
+    is_ambiguous = above.sum(axis=1) + at.sum(axis=1) > seats_left
+
+    seats = fulls + above + (at & ~is_ambiguous[:, None])
+    ambigs = (at & is_ambiguous[:, None]).astype(int)
+
+    return seats, ambigs, is_ambiguous
+
+def _hare_niemeyer_fits_int64(votes_vals: List[int], max_house_size: int) -> bool:
+    """
+    Checks whether _hare_niemeyer_kernel can compute the quotas of all house sizes up to max_house_size on int64 arrays
+    without overflow. Votes that are all zero are excluded as well, so they raise the ZeroDivisionError of the Fraction path.
+    """
+
+    int64_max = np.iinfo(np.int64).max
+
+    return 0 < sum(votes_vals) <= int64_max and max_house_size * max(votes_vals) <= int64_max
 
 def single_distribution_hare_niemeyer(votes: Mapping[str, int], seats_available: int) -> Dict[str, int]:
     """ 
     Applies the Hare/Niemeyer Method for calculating the distribution of all seats available based on
-    the proportions of votes
+    the proportions of votes. Runs on the int64 arrays of _hare_niemeyer_kernel, or on Fractions if the quotas would
+    overflow int64.
     :param votes: the number of votes that each party/fraction received in a mapping of format {party_name: seats}
     :param seats_available: the total number of seats (or minutes, or rooms...) available for distribution
     :return: The final distribution of seats (Hare/Niemeyer produces no ordering of these seats) in the format
     {'distribution': 'seats': {...}, is_ambiguous: bool}
     """
 
+    return _hare_niemeyer_distribution(votes, seats_available).to_dict()
+
+def _hare_niemeyer_distribution(votes: Mapping[str, int], seats_available: int) -> Distribution:
+    """Computes single_distribution_hare_niemeyer as a Distribution (see results.py)."""
+
+    votes_vals = list(votes.values())
+
+    if not _hare_niemeyer_fits_int64(votes_vals, seats_available):
+        return Distribution.from_dict(_single_distribution_hare_niemeyer_fractions(votes, seats_available))
+
+    seats, ambigs, _ = _hare_niemeyer_kernel(np.array(votes_vals, dtype=np.int64), np.array([seats_available], dtype=np.int64))
+
+    return Distribution.from_row(list(votes.keys()), (seats[0].tolist(), np.flatnonzero(ambigs[0]).tolist(), ()))
+
+def _single_distribution_hare_niemeyer_fractions(votes: Mapping[str, int], seats_available: int) -> Dict[str, int]:
+    """ 
+    Computes single_distribution_hare_niemeyer with exact Fractions on object arrays, for votes where the int64 kernel
+    would overflow.
+    """
+
     votes_vals = list(votes.values())
     props = [Fraction(seats_available * val) / Fraction(sum(votes_vals)) for val in votes_vals]
     # float(Decimal(seats_available) * Decimal(votes_vals) / Decimal(np.sum(votes_vals)))
@@ -253,3 +899,11 @@ def demo():
 
     print('Hare-Niemeyer')
     print(hare_niemeyer(votes, seats, True))
+
+register_method('dhondt', _linear_divisor(1))
+register_method('schepers', _linear_divisor(0.5))
+register_method('hare', hare_niemeyer)
+register_method('adams', LinearDivisorMethod(0, 1))
+register_method('huntington_hill', DivisorMethod(lambda n_seats: n_seats * (n_seats + 1), power=2))
+register_method('danish', LinearDivisorMethod(1, 3))
+register_method('imperiali', _linear_divisor(2))
@@ -0,0 +1,66 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+
+from assignment import DeadlineExceeded, assign, estimate_cost
+
+# Batches with a total estimated cost (see assignment.estimate_cost) above this are spread across worker processes
+PARALLEL_COST_THRESHOLD = 2000000
+
+_executor = None
+
+def assign_many(inputs: List[Dict], assign_function: Callable[[Dict, Optional[float]], Dict] = assign, deadline: Optional[float] = None) -> List[Tuple[int, Dict]]:
+    """
+    Runs the assignment of each of a list of inputs, in order. Small batches run in this process with assign_function;
+    batches with a large total cost are spread across a pool of worker processes running assign. Assumes the inputs are
+    validated.
+    :param inputs: a list of assignment inputs as accepted by assign
+    :param assign_function: the function running the assignments in this process, eg. AssignmentCache.assign
+    :param deadline: optionally a time.monotonic() value, after which the assignments that are not done fail with 503
+    :return: a list with, for each input, the status code and either the output of assign or a dict with error info
+    """
+
+    if len(inputs) > 1 and sum(estimate_cost(input) for input in inputs) > PARALLEL_COST_THRESHOLD:
+        return list(_get_executor().map(partial(_assign_or_error, deadline=deadline), inputs))
+
+    return [_assign_or_error(input, assign_function, deadline) for input in inputs]
+
+def _assign_or_error(input: Dict, assign_function: Callable[[Dict, Optional[float]], Dict] = assign, deadline: Optional[float] = None) -> Tuple[int, Dict]:
+
+    try:
+        return 200, assign_function(input, deadline)
+    except DeadlineExceeded:
+        return 503, {'message': 'The scenario did not finish before the deadline of the batch.'}
+    except:
+        return 500, {'message': 'An unexpected server error occurred.'}
+
+def _get_executor() -> ProcessPoolExecutor:
+    """
+    Creates the worker pool on first use, sized by _pool_size. The pool processes are started by a fork server (or
+    spawned where there is none) rather than forked from the server process, which runs threads.
+    """
+
+    global _executor
+
+    if _executor is None:
+        start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        context = multiprocessing.get_context(start_method)
+        if start_method == 'forkserver': context.set_forkserver_preload(['assignment'])
+
+        _executor = ProcessPoolExecutor(max_workers=_pool_size(), mp_context=context)
+
+    return _executor
+
+def _pool_size() -> int:
+    """
+    The number of processes of the worker pool, from the AZUR_BATCH_WORKERS environment variable. By default, the cores
+    are shared with the other server processes, which each have their own pool: all cores divided by the number of
+    server processes in WEB_CONCURRENCY (see gunicorn.conf.py).
+    """
+
+    workers = os.environ.get('AZUR_BATCH_WORKERS')
+    if workers: return int(workers)
+
+    return max(1, (os.cpu_count() or 1) // int(os.environ.get('WEB_CONCURRENCY', 1)))
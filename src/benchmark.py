@@ -0,0 +1,168 @@
+"""
+Benchmark suite for the assignment methods and comparisons. Sweeps the number of parties and seats, the skew of the
+votes and return_table, measures the time and peak memory of each case, and compares them to a baseline file.
+
+    python src/benchmark.py                      # run and compare to the baseline, fails on regressions, or
+                                                 # records the baseline if there is none yet
+    python src/benchmark.py --update-baseline    # run and store the results as the new baseline
+    python src/benchmark.py --filter hare-p100   # only run the cases whose name contains the filter
+
+Timings depend on the machine, so the baseline is not part of the repository but recorded by the first run on the
+machine the benchmarks are compared on.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from itertools import product
+from typing import Callable, Dict, List, Tuple
+
+from assignment import assign
+from comparison import compare
+
+PARTY_COUNTS = [2, 10, 100]
+SEAT_COUNTS = [1, 100, 10000, 100000]
+SKEWS = ['uniform', 'zipf', 'ties']
+
+# Tables hold one entry per party and number of seats; larger tables take seconds and gigabytes per run
+TABLE_ENTRIES_LIMIT = 1000000
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+def make_votes(n_parties: int, skew: str, seed: int = 0) -> Dict[str, int]:
+    """
+    Generates votes for a benchmark case, the same for each run.
+    :param skew: 'uniform' for random votes of similar size, 'zipf' for votes inversely proportional to the rank of the
+    party, 'ties' for equal votes, so that distributions are ambiguous for most numbers of seats
+    """
+
+    rng = random.Random(seed)
+
+    if skew == 'uniform': values = [rng.randint(500000, 1000000) for _ in range(n_parties)]
+    elif skew == 'zipf': values = [10000000 // rank for rank in range(1, n_parties + 1)]
+    elif skew == 'ties': values = [100000 for _ in range(n_parties)]
+    else: raise ValueError(f"Unknown skew: Expected one of {SKEWS} but got {skew}")
+
+    return {f'party_{i}': x for i, x in enumerate(values)}
+
+def benchmark_cases() -> List[Tuple[str, Callable[[], object]]]:
+    """Returns the benchmark cases as (name, function) pairs, in a fixed order."""
+
+    cases = []
+
+    for method, n_parties, n_seats, skew, return_table in product(['dhondt', 'schepers', 'hare', 'compare'], PARTY_COUNTS, SEAT_COUNTS, SKEWS, [False, True]):
+        if return_table and n_parties * n_seats > TABLE_ENTRIES_LIMIT: continue
+
+        votes = make_votes(n_parties, skew)
+        name = f"{method}-p{n_parties}-s{n_seats}-{skew}-{'table' if return_table else 'notable'}"
+
+        if method == 'compare':
+            run = lambda votes=votes, n_seats=n_seats, return_table=return_table: compare(
+                {'votes': votes, 'method': 'dhondt'}, {'votes': votes, 'method': 'hare'}, n_seats, return_table)
+        else:
+            input = {'votes': votes, 'method': method, 'num_of_seats': n_seats, 'return_table': return_table}
+            run = lambda input=input: assign(input)
+
+        cases.append((name, run))
+
+    return cases
+
+def measure(run: Callable[[], object], min_time: float = 0.2, min_repeats: int = 3, max_repeats: int = 20) -> Dict[str, float]:
+    """
+    Measures a benchmark case: its time as the best of at least min_repeats runs, repeated until min_time has passed,
+    and its peak memory in bytes in a separate run, as tracing the allocations slows the run down.
+    """
+
+    times = []
+    while len(times) < min_repeats or (len(times) < max_repeats and sum(times) < min_time):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    run()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'time': min(times), 'peak_memory': peak_memory}
+
+def run_benchmarks(name_filter: str = '', verbose: bool = True) -> Dict[str, Dict[str, float]]:
+    """Runs all benchmark cases whose name contains name_filter and returns their measurements by name."""
+
+    results = {}
+
+    for name, run in benchmark_cases():
+        if name_filter not in name: continue
+
+        results[name] = measure(run)
+        if verbose: print(f"{name:45} {results[name]['time']*1000:10.3f} ms {results[name]['peak_memory']/2**20:10.3f} MiB")
+
+    return results
+
+def find_regressions(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float = 1.5, min_time: float = 0.001) -> List[str]:
+    """
+    Compares results to a baseline and describes each regression, ie. each case whose time or peak memory is more than
+    threshold times its baseline. Times below min_time in the baseline are too noisy to compare, and are compared to
+    min_time instead. Cases without a baseline are skipped.
+    """
+
+    regressions = []
+
+    for name, result in results.items():
+        if name not in baseline: continue
+
+        reference_time = max(baseline[name]['time'], min_time)
+        if result['time'] > threshold * reference_time:
+            regressions.append(f"{name}: time {result['time']*1000:.3f} ms, baseline {baseline[name]['time']*1000:.3f} ms")
+
+        if result['peak_memory'] > threshold * max(baseline[name]['peak_memory'], 1024):
+            regressions.append(f"{name}: peak memory {result['peak_memory']} B, baseline {baseline[name]['peak_memory']} B")
+
+    return regressions
+
+def store_baseline(results: Dict[str, Dict[str, float]], path: str):
+    """Stores results in the baseline file, keeping the baseline of the cases that were not run."""
+
+    baseline = {}
+    if os.path.exists(path):
+        with open(path, encoding='utf8') as f: baseline = json.load(f)
+
+    baseline.update(results)
+    with open(path, 'w', encoding='utf8') as f: json.dump(baseline, f, indent=2, sort_keys=True)
+
+    print(f"Stored {len(results)} results in {path}")
+
+def main(argv: List[str] = None) -> int:
+
+    parser = argparse.ArgumentParser(description='Benchmarks the assignment methods against a baseline.')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='path of the JSON baseline file')
+    parser.add_argument('--update-baseline', action='store_true', help='store the results as the baseline instead of comparing')
+    parser.add_argument('--threshold', type=float, default=1.5, help='ratio to the baseline above which a case counts as regressed')
+    parser.add_argument('--filter', default='', help='only run the cases whose name contains this string')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.filter)
+
+    if args.update_baseline:
+        store_baseline(results, args.baseline)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline found at {args.baseline}, so there is nothing to compare to: recording this run as the baseline")
+        store_baseline(results, args.baseline)
+        return 0
+
+    with open(args.baseline, encoding='utf8') as f: baseline = json.load(f)
+
+    regressions = find_regressions(results, baseline, args.threshold)
+    for regression in regressions: print(f"REGRESSION {regression}")
+    print(f"{len(regressions)} regressions in {len(results)} cases")
+
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
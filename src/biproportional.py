@@ -0,0 +1,375 @@
+import numpy as np
+from fractions import Fraction
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import assignment
+
+def biproportional(votes: Mapping[str, Mapping[str, int]], method: str, column_seats: Mapping[str, int], row_seats: Optional[Mapping[str, int]] = None, upper_method: Optional[str] = None, max_iterations: int = 1000, deadline: Optional[float] = None) -> Dict:
+    """
+    Applies a biproportional divisor method to a matrix of votes, eg. of parties (rows) in committees or districts
+    (columns): every row and every column gets its total of seats, and each entry gets its votes, divided by a divisor
+    of its row and a divisor of its column, rounded by the divisor method. The divisors are found by alternating
+    scaling, where each step fits all columns resp. all rows to their totals at once (see assignment._divisor_rows),
+    until it stalls, and the last seats are then moved along ties by tie-and-transfer steps (see _transfer_step). The
+    result is checked in exact integer arithmetic, see _certify.
+    :param votes: the votes in a mapping of format {row_name: {column_name: votes}}, with the same columns in each row
+    :param method: the divisor method rounding the entries, one of assignment.DIVISOR_METHODS
+    :param column_seats: the seats of each column in a mapping of format {column_name: seats}
+    :param row_seats: the seats of each row in a mapping of format {row_name: seats}. If not given, the seats of all
+    columns are first distributed to the rows by their total votes, with upper_method
+    :param upper_method: the assignment method distributing the seats to the rows, one of assignment.METHODS, by
+    default method
+    :param max_iterations: the number of steps after which the method gives up
+    :param deadline: optionally a time.monotonic() value, after which the method is cancelled by DeadlineExceeded
+    :return: A dict containing
+        (1) 'seats', a dict of format {row_name: {column_name: seats}}
+        (2) 'row_seats' and 'column_seats', the totals of seats of the rows and columns
+        (3) 'row_divisors' and 'column_divisors', dicts with the divisor of each row resp. column (None without
+            seats), in the units of the divisors of the method (see assignment.DivisorMethod), ie. an entry's quotient
+            is votes**power / (row_divisor * column_divisor)
+        (4) 'iterations', the number of scaling and transfer steps taken
+        (5) 'converged', whether the seats add up to all totals and passed the exact check
+        (6) 'is_ambiguous', whether an entry's quotient is exactly at a tie, ie. it could get a seat more or less
+    :raises ValueError: if the totals cannot be met by the votes, or the distribution to the rows is tied
+    """
+
+    rows, columns = list(votes.keys()), list(column_seats.keys())
+    weights = [[votes[row][column] for column in columns] for row in rows]
+
+    if row_seats is None:
+        upper = assignment.assign({'votes': {row: sum(votes[row].values()) for row in rows}, 'method': upper_method or method,
+                                   'num_of_seats': sum(column_seats.values()), 'return_sequence': False})['distribution']
+        if upper['is_ambiguous']: raise ValueError(f"The distribution of seats to the rows is tied: {upper['seats']}. Give row_seats instead.")
+        row_seats = upper['seats']
+
+    divisor_method = assignment.DIVISOR_METHODS[method]
+    row_totals = np.array([row_seats[row] for row in rows], dtype=np.int64)
+    column_totals = np.array([column_seats[column] for column in columns], dtype=np.int64)
+    divisors = divisor_method.divisors(int(max(row_totals.max(initial=0), column_totals.max(initial=0))) + 1)
+    _check_totals(np.array(weights, dtype=np.float64), row_totals, column_totals, divisors[0] == 0)
+
+    quotient_weights = np.array(weights, dtype=np.float64) ** divisor_method.power
+    row_multipliers = np.ones(len(rows))
+    seats = np.zeros((len(rows), len(columns)), dtype=np.int64)
+    flaws = [] # The number of seats the rows are off by, after each column step
+    transferring = False
+
+    for iteration in assignment._with_deadline(range(1, max_iterations + 1), deadline, check_every=8):
+        if transferring:
+            if not _transfer_step(quotient_weights, seats, row_totals, row_multipliers, column_multipliers, divisors): break
+        else:
+            column_multipliers, seats_t = _scale(quotient_weights.T * row_multipliers, column_totals, divisors, row_totals - seats.sum(axis=1))
+            seats = seats_t.T
+            flaws.append(int(np.abs(seats.sum(axis=1) - row_totals).sum()))
+
+            transferring = len(flaws) > 8 and flaws[-1] >= flaws[-9] # Alternating scaling stalled
+            if flaws[-1] > 0 and not transferring:
+                row_multipliers, _ = _scale(quotient_weights * column_multipliers, row_totals, divisors, column_totals - seats.sum(axis=0))
+                row_multipliers /= row_multipliers.max(initial=0) or 1 # Keeps the multipliers from drifting out of range
+
+        if (seats.sum(axis=1) == row_totals).all(): break
+
+    converged = (seats.sum(axis=1) == row_totals).all() and (seats.sum(axis=0) == column_totals).all()
+    is_ambiguous = False
+
+    if converged:
+        row_multipliers, column_multipliers = _center(quotient_weights, seats, row_multipliers, column_multipliers, divisors)
+        power_weights = [[w ** divisor_method.power for w in row] for row in weights]
+        certified = _certify(power_weights, seats.tolist(), row_multipliers, column_multipliers, divisors.tolist())
+
+        if certified is None: converged = False
+        else: row_multipliers, column_multipliers, is_ambiguous = certified
+
+    return {'seats': {row: dict(zip(columns, x)) for row, x in zip(rows, seats.tolist())},
+            'row_seats': dict(zip(rows, row_totals.tolist())),
+            'column_seats': dict(zip(columns, column_totals.tolist())),
+            'row_divisors': dict(zip(rows, _divisors_of(row_multipliers))),
+            'column_divisors': dict(zip(columns, _divisors_of(column_multipliers))),
+            'iterations': iteration,
+            'converged': bool(converged),
+            'is_ambiguous': bool(is_ambiguous)}
+
+def estimate_biproportional_cost(n_rows: int, n_columns: int, num_seats: int) -> int:
+    """Estimates the cost of biproportional in the units of assignment.estimate_cost, ie. roughly 0.1 microseconds."""
+
+    # Up to some hundred vectorized scaling steps, which take about 2 log2(num_seats) + 20 bisection steps each, and
+    # the exact check of each entry in Python
+    return n_rows * n_columns * (4 * int(num_seats).bit_length() + 100)
+
+def _check_totals(weights: np.ndarray, row_totals: np.ndarray, column_totals: np.ndarray, seat_per_vote: bool):
+    """
+    Raises a ValueError if the totals cannot be met: if they differ in sum, if seats go to a row or column without
+    votes, or for methods which give every entry with votes a seat (seat_per_vote), if there are too few seats for that.
+    Beyond these, the totals can be met if and only if some matrix of seats meets them with seats only in entries with
+    votes (and at least one in each of these, for seat_per_vote), which is checked as a maximum flow, see _max_flow.
+    """
+
+    if row_totals.sum() != column_totals.sum():
+        raise ValueError(f"The rows have {row_totals.sum()} seats in total, but the columns {column_totals.sum()}.")
+
+    for axis, totals, name in [(1, row_totals, 'row'), (0, column_totals, 'column')]:
+        if ((totals > 0) & (weights.sum(axis=axis) == 0)).any():
+            raise ValueError(f"A {name} without votes cannot get seats.")
+        if seat_per_vote and (totals < (weights > 0).sum(axis=axis)).any():
+            raise ValueError(f"The method gives a seat to each entry with votes, but a {name} has fewer seats than entries with votes.")
+
+    support = [np.flatnonzero(row).tolist() for row in weights > 0]
+    seats_left = (row_totals - (weights > 0).sum(axis=1), column_totals - (weights > 0).sum(axis=0)) if seat_per_vote else (row_totals, column_totals)
+    if _max_flow(support, seats_left[0].tolist(), seats_left[1].tolist()) < seats_left[0].sum():
+        raise ValueError("The totals cannot be met by the votes: the seats cannot be distributed to the entries with votes so that every row and column gets its total.")
+
+def _max_flow(support: List[List[int]], supplies: List[int], demands: List[int]) -> int:
+    """
+    The maximum flow from rows with supplies to columns with demands, along the entries of each row in support (with
+    unbounded capacity), ie. the most seats that can be distributed to the entries without exceeding the totals. Starts
+    from a greedy flow and completes it with Dinic's algorithm: repeatedly labels the shortest augmenting paths
+    breadth-first and saturates them depth-first.
+    """
+
+    n_rows, n_columns = len(supplies), len(demands)
+    supplies, demands = list(supplies), list(demands) # Left in the rows resp. columns
+    flows = [{} for _ in range(n_rows)] # The flow of each row to each of its columns
+    back = [[] for _ in range(n_columns)] # The rows of each column, for flow sent back from it
+
+    for i, columns in enumerate(support):
+        for j in columns:
+            back[j].append(i)
+            x = min(supplies[i], demands[j])
+            if x > 0:
+                flows[i][j] = flows[i].get(j, 0) + x
+                supplies[i] -= x
+                demands[j] -= x
+
+    while True:
+        # Levels of the rows and columns on the shortest paths from the rows with supplies left
+        row_levels, column_levels = [-1] * n_rows, [-1] * n_columns
+        frontier = [i for i in range(n_rows) if supplies[i] > 0]
+        for i in frontier: row_levels[i] = 0
+        level, reached = 0, False
+
+        while frontier and not reached:
+            columns = []
+            for i in frontier:
+                for j in support[i]:
+                    if column_levels[j] < 0:
+                        column_levels[j] = level + 1
+                        columns.append(j)
+                        reached |= demands[j] > 0
+
+            frontier = []
+            if not reached:
+                for j in columns:
+                    for i in back[j]:
+                        if row_levels[i] < 0 and flows[i].get(j, 0) > 0:
+                            row_levels[i] = level + 2
+                            frontier.append(i)
+            level += 2
+
+        if not reached: return sum(sum(x.values()) for x in flows)
+
+        # Blocking flow along the levels, with the next entry to try of each row and column
+        row_next, column_next = [0] * n_rows, [0] * n_columns
+        for start in range(n_rows):
+            while supplies[start] > 0 and row_levels[start] == 0:
+                path, node, is_row = [], start, True
+
+                while True:
+                    if is_row:
+                        columns = support[node]
+                        while row_next[node] < len(columns) and column_levels[columns[row_next[node]]] != row_levels[node] + 1: row_next[node] += 1
+                        if row_next[node] == len(columns):
+                            row_levels[node] = -1 # Dead end
+                            if not path: break
+                            node, is_row = path.pop(), False
+                            column_next[node] += 1
+                            continue
+                        path.append(node)
+                        node, is_row = columns[row_next[node]], False
+                        if demands[node] > 0: break
+                    else:
+                        rows = back[node]
+                        while column_next[node] < len(rows) and (row_levels[rows[column_next[node]]] != column_levels[node] + 1 or flows[rows[column_next[node]]].get(node, 0) == 0): column_next[node] += 1
+                        if column_next[node] == len(rows):
+                            column_levels[node] = -1 # Dead end
+                            node, is_row = path.pop(), True
+                            row_next[node] += 1
+                            continue
+                        path.append(node)
+                        node, is_row = rows[column_next[node]], True
+
+                if is_row: break # No path left from start
+
+                # The path alternates rows and columns, from start to the column node, forward along even positions
+                path.append(node)
+                x = min(supplies[start], demands[node], min((flows[path[k + 1]][path[k]] for k in range(1, len(path) - 1, 2)), default=supplies[start]))
+                for k in range(0, len(path) - 1, 2): flows[path[k]][path[k + 1]] = flows[path[k]].get(path[k + 1], 0) + x
+                for k in range(1, len(path) - 1, 2): flows[path[k + 1]][path[k]] -= x
+                supplies[start] -= x
+                demands[node] -= x
+
+def _scale(quotient_weights: np.ndarray, totals: np.ndarray, divisors: np.ndarray, priorities: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fits each row of a matrix to its total of seats and returns the multiplier of each row and the seats. If the seats
+    of a row are tied, they go to the tied entries with the highest priority, ie. the largest deficit of seats in the
+    other direction.
+    """
+
+    _, hi, seats_lo, seats = assignment._divisor_rows(quotient_weights, divisors.astype(np.float64), totals)
+
+    for k in np.flatnonzero(seats.sum(axis=1) < totals):
+        candidates = np.flatnonzero(seats_lo[k] > seats[k])
+        candidates = candidates[np.argsort(-priorities[candidates], kind='stable')]
+        seats[k, candidates[:totals[k] - seats[k].sum()]] += 1
+
+    return 1 / hi, seats
+
+def _transfer_step(quotient_weights: np.ndarray, seats: np.ndarray, row_totals: np.ndarray, row_multipliers: np.ndarray, column_multipliers: np.ndarray, divisors: np.ndarray, tolerance: float = 1e-9) -> bool:
+    """
+    A step of tie-and-transfer, for seats that meet the column totals: labels the rows and columns reachable from the
+    rows with too few seats, along entries that are tied to gain a seat (row to column) and entries that are tied to
+    lose one (column to row). If a row with too many seats is reached, moves a seat along the path, which keeps the
+    column totals. Otherwise, scales the multipliers of the labeled rows up and those of the labeled columns down by the
+    smallest factor that ties another entry, which keeps all entries valid roundings. Updates seats and multipliers in
+    place.
+    :return: False if neither is possible
+    """
+
+    quotients = quotient_weights * row_multipliers[:, None] * column_multipliers
+    divisors = divisors.astype(np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # The factor by which an entry's quotient has to grow resp. shrink to tie for a seat more resp. less
+        gain_factors = np.where(quotient_weights > 0, divisors[seats] / quotients, np.inf)
+        lose_factors = np.where((quotient_weights > 0) & (seats > 0), quotients / divisors[np.maximum(seats - 1, 0)], np.inf)
+
+    gains, loses = gain_factors <= 1 + tolerance, lose_factors <= 1 + tolerance
+    row_sums = seats.sum(axis=1)
+
+    labeled_rows, labeled_columns = row_sums < row_totals, np.zeros(seats.shape[1], dtype=bool)
+    parent_rows, parent_columns = np.full(seats.shape[1], -1), np.full(seats.shape[0], -1)
+    frontier = np.flatnonzero(labeled_rows)
+
+    while len(frontier):
+        new_columns = np.flatnonzero(gains[frontier].any(axis=0) & ~labeled_columns)
+        if len(new_columns) == 0: break
+
+        parent_rows[new_columns] = frontier[gains[frontier][:, new_columns].argmax(axis=0)]
+        labeled_columns[new_columns] = True
+
+        new_rows = np.flatnonzero(loses[:, new_columns].any(axis=1) & ~labeled_rows)
+        parent_columns[new_rows] = new_columns[loses[new_rows][:, new_columns].argmax(axis=1)]
+        labeled_rows[new_rows] = True
+
+        over = new_rows[row_sums[new_rows] > row_totals[new_rows]]
+        if len(over):
+            row = over[0]
+            while parent_columns[row] >= 0:
+                column = parent_columns[row]
+                seats[row, column] -= 1
+                row = parent_rows[column]
+                seats[row, column] += 1
+            return True
+
+        frontier = new_rows
+
+    factor = min(gain_factors[labeled_rows][:, ~labeled_columns].min(initial=np.inf),
+                 lose_factors[~labeled_rows][:, labeled_columns].min(initial=np.inf))
+    if not np.isfinite(factor): return False
+
+    row_multipliers[labeled_rows] *= factor
+    column_multipliers[labeled_columns] /= factor
+
+    return True
+
+def _certify(weights: List[List[int]], seats: List[List[int]], row_multipliers: np.ndarray, column_multipliers: np.ndarray, divisors: List[int], tolerance: float = 1e-9) -> Optional[Tuple[np.ndarray, np.ndarray, bool]]:
+    """
+    Checks in exact arithmetic that the seats are roundings of the quotients: an entry with weight w and x seats needs
+    d(x-1) <= w * row * column <= d(x), and is tied at either bound. The multipliers are found in floats, where ties
+    only hold up to rounding, so they are first snapped to exact rationals along the entries that are tied up to the
+    tolerance: starting from one multiplier of each connected set of tied entries, the others are set so that the
+    tied quotients are exactly at their bounds.
+    :return: the exact multipliers (as floats) and whether an entry is tied, or None if a seat is not a rounding
+    """
+
+    n_rows, n_columns = len(seats), len(seats[0]) if seats else 0
+    row_values, column_values = [None for _ in range(n_rows)], [None for _ in range(n_columns)]
+    tied = [[None for _ in range(n_columns)] for _ in range(n_rows)] # The bound an entry is tied at, if any
+
+    for i in range(n_rows):
+        for j in range(n_columns):
+            w, x = weights[i][j], seats[i][j]
+            quotient = w * row_multipliers[i] * column_multipliers[j]
+            if w == 0 or quotient == 0: continue
+            if x > 0 and divisors[x-1] > 0 and quotient <= divisors[x-1] * (1 + tolerance): tied[i][j] = divisors[x-1]
+            elif quotient * (1 + tolerance) >= divisors[x]: tied[i][j] = divisors[x]
+
+    # Snap the multipliers along the tied entries, row i to column j by row * column = bound / w
+    for start in range(n_rows + n_columns):
+        is_row, index = start < n_rows, start if start < n_rows else start - n_rows
+        values = row_values if is_row else column_values
+        if values[index] is not None: continue
+
+        values[index] = Fraction((row_multipliers if is_row else column_multipliers)[index])
+        stack = [(is_row, index)]
+
+        while stack:
+            is_row, index = stack.pop()
+            for other in range(n_columns if is_row else n_rows):
+                i, j = (index, other) if is_row else (other, index)
+                other_values = column_values if is_row else row_values
+                if tied[i][j] is None or other_values[other] is not None: continue
+
+                value = (row_values if is_row else column_values)[index]
+                if value == 0: continue
+                other_values[other] = Fraction(tied[i][j], weights[i][j]) / value
+                stack.append((not is_row, other))
+
+    is_ambiguous = False
+
+    for i in range(n_rows):
+        for j in range(n_columns):
+            w, x = weights[i][j], seats[i][j]
+            quotient = w * row_values[i] * column_values[j]
+
+            if w == 0 or quotient == 0:
+                if x > 0: return None
+                continue
+
+            lower, upper = divisors[x-1] if x > 0 else -1, divisors[x]
+            if not lower <= quotient <= upper: return None
+            is_ambiguous |= quotient == lower or quotient == upper
+
+    return np.array([float(x) for x in row_values]), np.array([float(x) for x in column_values]), is_ambiguous
+
+def _center(quotient_weights: np.ndarray, seats: np.ndarray, row_multipliers: np.ndarray, column_multipliers: np.ndarray, divisors: np.ndarray, steps: int = 50) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Moves the multipliers away from the ties the scaling and transfer steps end on: alternately sets each row resp.
+    column multiplier to the middle (in log space) of the range in which all of its entries round to their seats,
+    given the other direction, so that the ranges balance out. Seats that are not tied end up with all quotients
+    strictly between their bounds, while tied seats stay at their bounds.
+    """
+
+    divisors = divisors.astype(np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Bounds of log(row) + log(column) for each entry, unbounded for entries without votes
+        has_votes = quotient_weights > 0
+        lower = np.where(has_votes & (seats > 0), np.log(divisors[np.maximum(seats - 1, 0)]) - np.log(quotient_weights), -np.inf)
+        upper = np.where(has_votes, np.log(divisors[seats]) - np.log(quotient_weights), np.inf)
+        row_logs, column_logs = np.log(row_multipliers), np.log(column_multipliers)
+
+    for _ in range(steps):
+        for logs, other_logs, lower_t, upper_t in [(row_logs, column_logs, lower, upper), (column_logs, row_logs, lower.T, upper.T)]:
+            # Entries of rows or columns without seats (a multiplier of 0) have no seats either way
+            with np.errstate(invalid='ignore'):
+                low = np.where(np.isfinite(other_logs), lower_t - other_logs, -np.inf).max(axis=1, initial=-np.inf)
+                high = np.where(np.isfinite(other_logs), upper_t - other_logs, np.inf).min(axis=1, initial=np.inf)
+            bounded = np.isfinite(low) & np.isfinite(high) & np.isfinite(logs)
+            logs[bounded] = (low[bounded] + high[bounded]) / 2
+
+    return np.exp(row_logs), np.exp(column_logs)
+
+def _divisors_of(multipliers: np.ndarray) -> List[Optional[float]]:
+    """Turns multipliers into divisors, None for rows or columns without seats (a multiplier of 0)."""
+
+    return [1 / x if x > 0 else None for x in multipliers.tolist()]
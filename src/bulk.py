@@ -0,0 +1,168 @@
+"""
+Offline bulk CLI for recalculating many scenarios without going through the HTTP API. Streams a scenario file, validates
+each scenario like the API (see validation.py), spreads the work across processes and writes the results as they are
+done, so memory stays bounded regardless of the size of the file.
+
+    python src/bulk.py scenarios.jsonl                           # results as JSONL on stdout
+    python src/bulk.py history.csv --output results.jsonl        # scenarios in the pipe-delimited format of tests.csv
+    python src/bulk.py scenarios.jsonl --workers 8 --chunk-size 50
+
+Scenario files are either JSONL, with one /azur input or /azur_compare input ('dist_A' and 'dist_B', or 'scenarios') per
+line, or CSV in the format of tests/tests.csv: method|votes|num_of_seats per row, the votes as a dict literal, with any
+further columns ignored. For each non-empty line, in order, one JSON line {'line': n, 'status': code, 'result': ...} or
+{'line': n, 'status': code, 'error': {'message': ...}} is written, with the status codes of the API.
+"""
+
+import argparse
+import ast
+import csv
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, TextIO, Tuple
+
+from assignment import assign_result
+from comparison import compare, compare_many
+from outcomes import listed_outcomes
+from quotients import input_quotients
+from results import json_default
+from validation import SEAT_LIMIT, dict_raise_on_duplicates, validate_compare_input, validate_input
+
+FORMATS = ['jsonl', 'csv']
+
+def read_records(file: TextIO, format: str) -> Iterator[Tuple[int, Any]]:
+    """
+    Reads the records of a scenario file one at a time, with their line numbers: the text of each non-empty line for
+    JSONL, the columns of each row for CSV. They are parsed by the workers, see parse_record.
+    """
+
+    if format == 'csv':
+        reader = csv.reader(file, delimiter='|')
+        for row in reader:
+            if row: yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(file, 1):
+        if line.strip(): yield line_number, line
+
+def parse_record(record: Any, format: str) -> Any:
+    """Parses a record of read_records into an input, raises ValueError if it cannot be parsed."""
+
+    try:
+        if format == 'csv': return {'method': record[0], 'votes': ast.literal_eval(record[1]), 'num_of_seats': int(record[2])}
+        return json.loads(record, object_pairs_hook=dict_raise_on_duplicates) # Catch duplicates in input JSON
+
+    except (ValueError, SyntaxError, IndexError) as e:
+        raise ValueError(f'The scenario could not be parsed: {e}')
+
+def run_record(record: Any, format: str, defaults: Dict) -> Tuple[int, Any]:
+    """
+    Parses, validates and runs the scenario of a record.
+    :param defaults: options for the assignment inputs that do not set them, eg. {'return_table': True}
+    :return: the status code and either the output of assignment.assign_result or comparison.compare(_many), or a
+    dict with error info
+    """
+
+    try:
+        input = parse_record(record, format)
+    except ValueError as e:
+        return 400, {'message': str(e)}
+
+    if type(input) != dict: return 400, {'message': f"The scenario must be dict, but got {str(type(input))}."}
+
+    try:
+        if 'scenarios' in input.keys() or 'dist_A' in input.keys():
+            input_is_valid, error_info, error_code = validate_compare_input(input)
+            if not input_is_valid: return error_code, error_info
+
+            num_seats, return_table = input.get('num_of_seats'), input.get('return_table', True)
+            if 'scenarios' in input.keys(): return 200, compare_many(input['scenarios'], num_seats, return_table, input.get('output', 'full') == 'sparse')
+            return 200, compare(input['dist_A'], input['dist_B'], num_seats, return_table, input.get('table_format', 'rows'))
+
+        input = dict(defaults, **input)
+        input_is_valid, error_info, error_code = validate_input(input)
+        if not input_is_valid: return error_code, error_info
+
+        output = assign_result(input)
+        if input.get('return_quotients', False): output.quotients = list(input_quotients(input, SEAT_LIMIT))
+        if input.get('return_outcomes', False): output.outcomes = listed_outcomes(input, output.distribution)
+
+        return 200, output
+
+    except:
+        return 500, {'message': 'An unexpected error occurred.'}
+
+def run_chunk(chunk: List[Tuple[int, Any]], format: str, defaults: Dict) -> List[Tuple[int, str]]:
+    """Runs the records of a chunk, and returns for each its status code and its result line, serialized by the worker."""
+
+    lines = []
+    for line_number, record in chunk:
+        status, output = run_record(record, format, defaults)
+        out = {'line': line_number, 'status': status, 'result' if status == 200 else 'error': output}
+        lines.append((status, json.dumps(out, default=json_default, separators=(',', ':'), sort_keys=True)))
+
+    return lines
+
+def run_bulk(records: Iterable[Tuple[int, Any]], format: str, defaults: Dict, workers: int = 1, chunk_size: int = 20) -> Iterator[Tuple[int, str]]:
+    """
+    Runs the records of read_records in chunks, and yields the status code and result line of each, in order. With
+    more than one worker, the chunks run in a pool of processes, of which at most two per worker are submitted but not
+    yet written, so that only a bounded number of records and results are held at any time.
+    """
+
+    records = iter(records)
+    chunks = iter(lambda: list(islice(records, chunk_size)), [])
+
+    if workers <= 1:
+        for chunk in chunks: yield from run_chunk(chunk, format, defaults)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+
+        for chunk in chunks:
+            pending.append(executor.submit(run_chunk, chunk, format, defaults))
+            if len(pending) >= 2 * workers: yield from pending.popleft().result()
+
+        while pending: yield from pending.popleft().result()
+
+def main(argv: List[str] = None) -> int:
+
+    parser = argparse.ArgumentParser(description='Runs the assignments and comparisons of a scenario file.')
+    parser.add_argument('input', help="path of the JSONL or CSV scenario file, or '-' for stdin")
+    parser.add_argument('--output', default='-', help="path of the JSONL result file, or '-' for stdout")
+    parser.add_argument('--format', choices=FORMATS, help='format of the scenario file (default: from its extension, else jsonl)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='number of worker processes (default: all cores)')
+    parser.add_argument('--chunk-size', type=int, default=20, help='number of scenarios sent to a worker at once')
+    parser.add_argument('--return-table', action='store_true', help='return the table for the assignments that do not set return_table')
+    parser.add_argument('--table-format', help='table_format of the assignments that do not set it')
+    args = parser.parse_args(argv)
+
+    format = args.format or ('csv' if args.input.lower().endswith('.csv') else 'jsonl')
+    defaults = {}
+    if args.return_table: defaults['return_table'] = True
+    if args.table_format: defaults['table_format'] = args.table_format
+
+    input_file = sys.stdin if args.input == '-' else open(args.input, encoding='utf8', newline='')
+    output_file = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf8')
+    counts = {}
+
+    try:
+        for status, line in run_bulk(read_records(input_file, format), format, defaults, args.workers, max(args.chunk_size, 1)):
+            output_file.write(line + '\n')
+            counts[status] = counts.get(status, 0) + 1
+
+    finally:
+        if input_file is not sys.stdin: input_file.close()
+        if output_file is not sys.stdout: output_file.close()
+
+    summary = ', '.join(f'{count} with status {status}' for status, count in sorted(counts.items()))
+    print(f"Ran {sum(counts.values())} scenarios: {summary or 'none'}", file=sys.stderr)
+
+    return 0 if set(counts) <= {200} else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
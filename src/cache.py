@@ -0,0 +1,197 @@
+import threading
+from collections import OrderedDict
+from itertools import islice
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import assignment
+from results import AssignmentResult, Distribution, distributions
+from tables import build_table, decode_table
+
+class AssignmentCache:
+    """
+    A bounded LRU cache in front of assignment.assign, keyed on the method and the votes. The votes are kept in their
+    order, since tied parties are listed in the order of the votes mapping. Each entry holds a compact record of the
+    largest assignment computed so far for its key: the engine steps for divisor methods (see assignment.divisor_steps),
+    and the table in 'columnar' format for Hare/Niemeyer. Any request for at most that many seats is answered from
+    the record, by cutting it down to the requested number of seats.
+
+    Requests that only need a distribution are cheap to compute, so they are answered from a record if there is one,
+    but do not create one. Requests for selected rows of the table bypass the cache, see assignment.sparse_table. Entries are evicted in least recently used order while there are more than max_entries of
+    them or their estimated size in bytes exceeds memory_budget.
+
+    The cache also remembers the last max_entries inputs by their ETag (see etags.py), so that a result can be updated
+    for changed votes by referencing a previous input, see update_result.
+    """
+
+    def __init__(self, max_entries: int = 256, memory_budget: int = 256 * 2**20):
+        self.max_entries = max_entries
+        self.memory_budget = memory_budget
+        self.hits, self.misses, self.evictions = 0, 0, 0
+        self.memory_used = 0
+        self._entries = OrderedDict() # key -> (num_of_seats, record, size)
+        self._inputs = OrderedDict() # ETag -> input
+        self._lock = threading.Lock()
+
+    def assign(self, input: Dict, deadline: Optional[float] = None) -> Dict:
+        """
+        Returns the output of assignment.assign for the input, from the cache if possible. Assumes the input is validated.
+        Like assignment.assign, raises assignment.DeadlineExceeded if the deadline passes.
+        """
+
+        return self.assign_result(input, deadline).to_dict()
+
+    def assign_result(self, input: Dict, deadline: Optional[float] = None) -> AssignmentResult:
+        """Like assign, but returns the output as an AssignmentResult, see assignment.assign_result."""
+
+        method, num_seats = input['method'], input['num_of_seats']
+        return_table, return_sequence, _ = assignment.output_options(input)
+        key = (method, tuple(input['votes'].items()))
+
+        # Selected rows of the table are computed directly, see assignment.sparse_table
+        if assignment.table_selection(input) is not None: return assignment.assign_result(input, deadline)
+
+        entry = self._lookup(key, num_seats)
+
+        if entry is None:
+            needs_record = return_table or (return_sequence and method in assignment.DIVISOR_METHODS)
+            if not needs_record: return assignment.assign_result(input, deadline)
+
+            entry = self._record(input, deadline)
+            self._store(key, entry)
+
+        return self._output(input, entry[1], deadline)
+
+    def update_result(self, base: Dict, votes: Dict, deadline: Optional[float] = None) -> Tuple[AssignmentResult, Optional[int]]:
+        """
+        Returns the output for the base input with other votes, of the same parties in the same order, as an
+        AssignmentResult. If the record of the base input is cached, the steps of divisor methods are updated from it
+        rather than computed again, see assignment.update_divisor_steps. Assumes the input with the new votes is valid.
+        :return: the output, and the number of seats up to which its assignment sequence and table are the same as for
+        the base input, or None if this is not known because the base input has no record
+        """
+
+        input = dict(base, votes=votes)
+        method, num_seats = input['method'], input['num_of_seats']
+        return_table, return_sequence, _ = assignment.output_options(input)
+
+        needs_record = return_table or (return_sequence and method in assignment.DIVISOR_METHODS)
+        if not needs_record or assignment.table_selection(input) is not None: return self.assign_result(input, deadline), None
+
+        base_entry = self._lookup((method, tuple(base['votes'].items())), num_seats)
+
+        if base_entry is not None and method in assignment.DIVISOR_METHODS:
+            steps, _ = assignment.truncate_divisor_steps(len(votes), base_entry[1], num_seats)
+            steps, seats_kept = assignment.update_divisor_steps(base['votes'], votes, steps, num_seats, assignment.DIVISOR_METHODS[method], deadline)
+            self._store((method, tuple(votes.items())), (num_seats, steps, _steps_size(steps)))
+
+            return self._output(input, steps, deadline), seats_kept
+
+        # Hare/Niemeyer quotas depend on the total votes, so any change can move seats for any number of seats
+        result = self.assign_result(input, deadline)
+        with self._lock: entry = self._entries.get((method, tuple(votes.items())))
+        if base_entry is None or entry is None: return result, None
+
+        rows = zip(decode_table(base_entry[1], 'columnar'), decode_table(entry[1], 'columnar'))
+        seats_kept = 0
+        for (base_seats, base_ambiguous, _), (seats, ambiguous, _) in islice(rows, num_seats):
+            if list(base_seats) != list(seats) or list(base_ambiguous) != list(ambiguous): break
+            seats_kept += 1
+
+        return result, seats_kept
+
+    def remember(self, etag: str, input: Dict):
+        """Remembers a validated input by its ETag, for update_result."""
+
+        with self._lock:
+            self._inputs[etag] = input
+            self._inputs.move_to_end(etag)
+            while len(self._inputs) > self.max_entries: self._inputs.popitem(last=False)
+
+    def recall(self, etag: str) -> Optional[Dict]:
+        """Returns the input remembered for an ETag, or None if it is not known (anymore)."""
+
+        with self._lock:
+            return self._inputs.get(etag)
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the counters and memory usage of the cache."""
+
+        with self._lock:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions,
+                    'entries': len(self._entries),
+                    'memory_used': self.memory_used,
+                    'memory_budget': self.memory_budget}
+
+    def clear(self):
+
+        with self._lock:
+            self._entries.clear()
+            self._inputs.clear()
+            self.memory_used = 0
+
+    def _lookup(self, key: Hashable, num_seats: int) -> Optional[Tuple[int, object, int]]:
+        """Returns the entry of a key if it covers at least num_seats seats, counting hits and misses."""
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] >= num_seats:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+            self.misses += 1
+            return None
+
+    def _record(self, input: Dict, deadline: Optional[float] = None) -> Tuple[int, object, int]:
+        """Computes the record of an input for its number of seats, and estimates its size in bytes."""
+
+        votes, method, num_seats = input['votes'], input['method'], input['num_of_seats']
+
+        if method in assignment.DIVISOR_METHODS:
+            steps = assignment.divisor_steps(votes, num_seats, assignment.DIVISOR_METHODS[method], deadline)
+            return num_seats, steps, _steps_size(steps)
+
+        table = assignment.hare_niemeyer(votes, num_seats, True, 'columnar', deadline)['table']
+        return num_seats, table, num_seats * (64 + 8 * len(votes)) + 120 * len(table['ambiguities'])
+
+    def _store(self, key: Hashable, entry: Tuple[int, object, int]):
+
+        with self._lock:
+            if entry[2] > self.memory_budget: return # Would evict everything and still not fit
+
+            previous = self._entries.pop(key, None)
+            if previous is not None: self.memory_used -= previous[2]
+
+            self._entries[key] = entry
+            self.memory_used += entry[2]
+
+            while len(self._entries) > self.max_entries or self.memory_used > self.memory_budget:
+                _, (_, _, size) = self._entries.popitem(last=False)
+                self.memory_used -= size
+                self.evictions += 1
+
+    def _output(self, input: Dict, record: object, deadline: Optional[float] = None) -> AssignmentResult:
+        """Formats the output of assignment.assign for the input from a record covering at least its number of seats."""
+
+        votes, method, num_seats = input['votes'], input['method'], input['num_of_seats']
+        return_table, return_sequence, table_format = assignment.output_options(input)
+        parties = list(votes.keys())
+
+        if method in assignment.DIVISOR_METHODS:
+            steps, seats = assignment.truncate_divisor_steps(len(parties), record, num_seats)
+            return assignment.divisor_result(parties, steps, seats, return_table, return_sequence, table_format, deadline)
+
+        result = AssignmentResult(Distribution.from_row(parties, next(islice(decode_table(record, 'columnar'), num_seats - 1, None))))
+
+        if return_table:
+            rows = assignment._with_deadline(islice(decode_table(record, 'columnar', table_format == 'delta'), num_seats), deadline)
+            result.table = distributions(parties, rows) if table_format == 'rows' else build_table(parties, rows, table_format)
+
+        return result
+
+def _steps_size(steps: List[Tuple[List[int], int]]) -> int:
+    """Estimates the size in bytes of the steps of a divisor method."""
+
+    return sum(120 + 8 * len(tied) for tied, _ in steps)
@@ -1,44 +1,150 @@
-from typing import Mapping, Tuple, Dict, List, Union
+from typing import Iterator, Mapping, Optional, Tuple, Dict, List, Union
 
-from assignment import assign
+from assignment import _with_deadline, assign_lazy, assign_result
+from results import Comparison, Distribution
+from tables import decode_table
 import os
 
-def compare(params_1: Dict, params_2: Dict, num_seats: int, return_table: bool = True ) -> Dict[str, Union[Dict, List[Dict]]]:
+def compare(params_1: Dict, params_2: Dict, num_seats: int, return_table: bool = True, table_format: str = 'rows', deadline: Optional[float] = None) -> Dict[str, Union[Dict, List[Dict]]]:
 
-    params_1['num_of_seats'], params_1['return_table'] = num_seats, True
-    params_2['num_of_seats'], params_2['return_table'] = num_seats, True
-    out_1 = assign(params_1)
-    out_2 = assign(params_2)
+    params_1 = dict(params_1, num_of_seats=num_seats, return_table=return_table, table_format=table_format)
+    params_2 = dict(params_2, num_of_seats=num_seats, return_table=return_table, table_format=table_format)
+    out_1 = assign_result(params_1, deadline)
+    out_2 = out_1 if _scenario_key(params_1) == _scenario_key(params_2) else assign_result(params_2, deadline)
 
+    # The outputs are compared as results (see results.py), and only the comparisons are turned into dicts
     comparison = {}
 
-    comparison['distribution'] = compare_instance(out_1['distribution'], out_2['distribution'])
+    comparison['distribution'] = Comparison(out_1.distribution, out_2.distribution).to_dict()
+
+    if return_table and table_format == 'rows':
+
+        comparison['table'] = [Comparison(row_1, row_2).to_dict() for row_1, row_2 in zip(out_1.table, out_2.table)]
+
+    elif return_table:
+
+        # Both tables stay in the requested format, and are compared row by row without building the 'rows' format
+        rows_1, rows_2 = decode_table(out_1.table, table_format), decode_table(out_2.table, table_format)
+        comparison['table'] = {'dist_A': out_1.table,
+                               'dist_B': out_2.table,
+                               'is_identical': [Distribution.from_row(out_1.table['parties'], row_1) == Distribution.from_row(out_2.table['parties'], row_2)
+                                                for row_1, row_2 in zip(rows_1, rows_2)]}
+
+    if out_1.assignment_sequence is not None and out_2.assignment_sequence is not None:
+
+        comparison['assignment_sequence'] = [Comparison(x_1, x_2, ('assignment_A', 'assignment_B')).to_dict()
+                                             for x_1, x_2 in zip(out_1.assignment_sequence, out_2.assignment_sequence)]
+
+    return comparison
+
+def compare_many(scenarios: List[Dict], num_seats: int, return_table: bool = True, sparse: bool = False, deadline: Optional[float] = None) -> Dict[str, Dict]:
+    """
+    Compares the outputs of any number of scenarios, eg. the same votes under all methods, for the same number of seats.
+    Scenarios with the same method and votes are computed only once, and all outputs are compared while the engines
+    produce them (see assignment.assign_lazy), so no table is held in memory in sparse mode.
+    :param scenarios: a list of dicts of format {'method': ..., 'votes': {...}}, which are not modified
+    :param num_seats: the number of seats to distribute in each scenario
+    :param return_table: whether or not to compare the tables, which are only computed if so
+    :param sparse: whether or not to only list the rows and sequence positions where the scenarios diverge
+    :param deadline: optionally a time.monotonic() value, after which the comparison is cancelled by DeadlineExceeded
+    :return: A dict containing
+        (1) 'distribution', a dict with the 'distributions' of all scenarios, in order, and 'is_identical'
+        (2) optionally 'table', either a list with a dict of the same format as (1) for each number of seats, or if
+            sparse, a dict with 'divergent_rows', a list of these dicts for the rows which are not identical, each
+            with its 'row' (ie. number of seats), and 'first_divergence', the first of these rows or None
+        (3) if all scenarios have one, 'assignment_sequence', of the same format as (2) with 'assignments' in place of
+            'distributions', and 'divergent_positions' and 'position' (ie. seat number) in place of the rows
+    """
+
+    inputs = [dict(x, num_of_seats=num_seats, return_table=return_table, table_format='rows') for x in scenarios]
+
+    # Scenario positions pointing to the distinct scenarios, which are computed once each
+    distinct_keys = {}
+    positions = [distinct_keys.setdefault(_scenario_key(x), len(distinct_keys)) for x in inputs]
+    distinct_inputs = {position: x for x, position in zip(inputs, positions)}
+    outputs = [assign_lazy(distinct_inputs[i]) for i in range(len(distinct_keys))]
+
+    comparison = {}
+
+    comparison['distribution'] = _compare_values([x['distribution'] for x in outputs], positions, 'distributions')
 
     if return_table:
+        rows = _with_deadline(zip(*(x['table'] for x in outputs)), deadline)
+        comparison['table'] = _compare_series(rows, positions, 'distributions', 'row', sparse)
+
+    if all('assignment_sequence' in x.keys() for x in outputs):
+        assignments = _with_deadline(zip(*(x['assignment_sequence'] for x in outputs)), deadline)
+        comparison['assignment_sequence'] = _compare_series(assignments, positions, 'assignments', 'position', sparse)
+
+    return comparison
+
+def _compare_values(values: Tuple, positions: List[int], key: str) -> Dict:
+    """Compares the values of the distinct scenarios, and lists them for each scenario."""
+
+    return {key: [values[i] for i in positions], 'is_identical': all(x == values[0] for x in values[1:])}
+
+def _compare_series(series: Iterator[Tuple], positions: List[int], key: str, index_key: str, sparse: bool) -> Union[List[Dict], Dict]:
+    """Compares a series of values of the distinct scenarios, eg. their table rows, see compare_many."""
+
+    if not sparse: return [_compare_values(values, positions, key) for values in series]
+
+    divergent = []
+
+    for index, values in enumerate(series, 1):
+        compared = _compare_values(values, positions, key)
+        if not compared['is_identical']: divergent.append(dict(compared, **{index_key: index}))
+
+    return {f'divergent_{index_key}s': divergent, 'first_divergence': divergent[0][index_key] if divergent else None}
+
+def _scenario_key(params: Dict) -> Tuple:
+    """Identifies the scenarios with the same output, keeping the order of the votes which tied parties are listed in."""
+
+    return params['method'], tuple(params['votes'].items())
+
+def compare_lazy(params_1: Dict, params_2: Dict, num_seats: int, return_table: bool = True, table_format: str = 'rows') -> Dict[str, Union[Dict, Iterator]]:
+    """
+    Like compare, but the table and assignment sequence comparisons are generators built on assignment.assign_lazy,
+    so the comparison can be streamed (see streaming.py) without holding either output in memory.
+    """
+
+    params_1 = dict(params_1, num_of_seats=num_seats, return_table=return_table, table_format=table_format)
+    params_2 = dict(params_2, num_of_seats=num_seats, return_table=return_table, table_format=table_format)
+    out_1 = assign_lazy(params_1)
+    out_2 = assign_lazy(params_2)
+
+    comparison = {}
+
+    comparison['distribution'] = compare_instance(out_1['distribution'], out_2['distribution'])
+
+    if return_table and table_format == 'rows':
+
+        comparison['table'] = map(compare_instance, out_1['table'], out_2['table'])
+
+    elif return_table:
+
+        # The tables are streamed one after the other, so the rows are compared on separate runs of the engines
+        rows_1 = assign_lazy(dict(params_1, table_format='rows'))['table']
+        rows_2 = assign_lazy(dict(params_2, table_format='rows'))['table']
+        comparison['table'] = {'dist_A': out_1['table'],
+                               'dist_B': out_2['table'],
+                               'is_identical': (row_1 == row_2 for row_1, row_2 in zip(rows_1, rows_2))}
 
-        comparison['table'] = [compare_instance(out_1['table'][x], out_2['table'][x]) for x in range(num_seats)]
-    
     if 'assignment_sequence' in out_1.keys() and 'assignment_sequence' in out_2.keys():
-        
-        comparison['assignment_sequence'] = [compare_instance(out_1['assignment_sequence'][x],
-                                                              out_2['assignment_sequence'][x],
-                                                              "assignment_A",
-                                                              "assignment_B")
-                                             for x in range(num_seats)]
+
+        comparison['assignment_sequence'] = map(lambda x_1, x_2: compare_instance(x_1, x_2, "assignment_A", "assignment_B"),
+                                                out_1['assignment_sequence'],
+                                                out_2['assignment_sequence'])
 
     return comparison
 
 def compare_instance(dist1, dist2, key1 = "dist_A", key2 = "dist_B"):
+    """
+    Compares two values of the streamed outputs, eg. distributions or table rows, listing the second only if they
+    differ. Errors are raised to the route like those of the engines, rather than streamed as an empty comparison.
+    """
 
-    is_identical = False
-
-    try:
-        if dist1 == dist2:
-            is_identical = True
-            dist2 = None
-    except:
-        print('An error occurred.')
-        return None
+    is_identical = dist1 == dist2
+    if is_identical: dist2 = None
 
     return {
             key1:  dist1,
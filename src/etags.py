@@ -0,0 +1,36 @@
+import hashlib
+import json
+from typing import Any
+
+# Part of every ETag, so that the ETags of all results change if a release changes any output. Bump it with such changes
+RESULT_VERSION = '1'
+
+def input_etag(route: str, input: Any) -> str:
+    """
+    Returns the ETag (without quotes) of the result of a route for a parsed input, a hash of the canonical input. The
+    results of /azur and /azur_compare are a pure function of their input, so equal ETags mean equal responses.
+
+    :param route: the route, eg. '/azur', since the same input gives different results on different routes
+    :param input: the parsed request JSON
+    """
+
+    canonical = f'{RESULT_VERSION}\n{route}\n{canonical_json(input)}'
+    return hashlib.sha256(canonical.encode()).hexdigest()[:32]
+
+def canonical_json(value: Any) -> str:
+    """
+    Encodes a parsed input as JSON such that equal inputs give the same string: the keys of all dicts are sorted, apart
+    from the parties of 'votes' mappings. These are kept in their order, as pairs, since tied parties are listed in the
+    order of the votes (like the keys of cache.AssignmentCache), so inputs that only differ in it differ in the result.
+    """
+
+    return json.dumps(_canonical(value), separators=(',', ':'), sort_keys=True)
+
+def _canonical(value: Any, ordered: bool = False) -> Any:
+
+    if type(value) == dict:
+        if ordered: return [[key, _canonical(x)] for key, x in value.items()]
+        return {key: _canonical(x, key == 'votes') for key, x in value.items()}
+
+    if type(value) == list: return [_canonical(x) for x in value]
+    return value
@@ -0,0 +1,51 @@
+# Configuration of the production server, run from the repository root with
+#   gunicorn --config src/gunicorn.conf.py app:app
+# The app (and with it numpy) is loaded once in the master process before the workers are forked. Each worker keeps its
+# own result cache (see cache.py), as it is not shared between processes, while the metrics are summed up over all
+# workers, see metrics_dir below.
+#
+# Graceful restart: SIGHUP to the master starts new workers and lets the old ones finish their requests within
+# graceful_timeout. As the app is preloaded, code changes need a full restart instead (or a USR2 + TERM binary upgrade).
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# WEB_CONCURRENCY is the number of workers Heroku suggests for the dyno size
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+
+# Each worker has its own process pool for large /azur_batch requests (see batch.py), which divides the cores by
+# WEB_CONCURRENCY unless AZUR_BATCH_WORKERS is set, so the pools of all workers together have about one process per
+# core rather than cores squared. Set here so that it is the actual number of workers.
+os.environ['WEB_CONCURRENCY'] = str(workers)
+threads = int(os.environ.get('AZUR_THREADS', 2))
+worker_class = 'gthread' # Unlike the sync worker, keeps connections alive between requests
+
+preload_app = True
+keepalive = int(os.environ.get('AZUR_KEEPALIVE', 5))
+timeout = int(os.environ.get('AZUR_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('AZUR_GRACEFUL_TIMEOUT', 30))
+
+# Workers are replaced after this many requests (0 to never replace them), so memory fragmentation cannot build up
+max_requests = int(os.environ.get('AZUR_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+# Each worker writes its metrics (see metrics.py) to a file of its own in this directory, and /metrics sums up the files
+# of all workers, so a scrape counts the requests of all workers whichever worker answers it. The files of workers that
+# have exited are merged into one file when they exit, so the counters never go down while the directory stays small,
+# until it is cleared when the server starts. Servers running side by side need directories of their own.
+metrics_dir = os.environ.setdefault('AZUR_METRICS_DIR', os.path.join(tempfile.gettempdir(), 'azur_metrics'))
+
+def on_starting(server):
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+
+def child_exit(server, worker):
+    import metrics # Loaded with the app, which is preloaded in the master process
+    metrics.compact(metrics_dir, worker.pid)
+
+accesslog = '-'
+loglevel = os.environ.get('AZUR_LOG_LEVEL', 'info')
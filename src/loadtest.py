@@ -0,0 +1,343 @@
+"""
+Load test of the served app. Starts the app locally (with gunicorn as in production, or with the Flask development
+server), replays a mix of /azur and /azur_compare requests at a target rate for each scenario, and reports the latency
+percentiles, throughput, error rate and memory of the worker processes of each scenario.
+
+    python src/loadtest.py                               # run all scenarios on gunicorn
+    python src/loadtest.py --scenario mixed --rate 100   # run one scenario at 100 requests per second
+    python src/loadtest.py --url http://localhost:5000   # run against a server that is already running (no memory)
+    python src/loadtest.py --update-baseline             # store the results as the baseline to compare to, which
+                                                         # the first run does without a baseline
+
+Requests are sent at fixed intervals whether or not earlier ones have finished (an open loop), and their latency is
+counted from when they were due to be sent, so a saturated server shows up in the latency rather than in a lower rate.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from benchmark import make_votes, store_baseline
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(SRC_DIR, 'loadtest_baseline.json')
+
+# A payload is a request as (path, JSON body), drawn with a random generator
+Payload = Tuple[str, Dict]
+
+def _assignment(n_parties: int, n_seats: int, **options) -> Callable[[random.Random], Payload]:
+
+    def payload(rng: random.Random) -> Payload:
+        votes = make_votes(n_parties, rng.choice(['uniform', 'zipf']), seed=rng.randrange(1000))
+        return '/azur', dict({'votes': votes, 'method': rng.choice(['dhondt', 'schepers', 'hare']), 'num_of_seats': n_seats}, **options)
+
+    return payload
+
+def _comparison(n_parties: int, n_seats: int) -> Callable[[random.Random], Payload]:
+
+    def payload(rng: random.Random) -> Payload:
+        votes = make_votes(n_parties, 'uniform', seed=rng.randrange(1000))
+        return '/azur_compare', {'dist_A': {'votes': votes, 'method': 'dhondt'}, 'dist_B': {'votes': votes, 'method': 'hare'}, 'num_of_seats': n_seats}
+
+    return payload
+
+# The kinds of requests, from the typical request of the frontend to requests that go through admission control
+PAYLOADS = {
+    'small': _assignment(6, 30),
+    'table': _assignment(20, 2000, return_table=True),
+    'huge': _assignment(100, 100000, return_table=True, table_format='columnar'),
+    'compare': _comparison(6, 100),
+}
+
+# The scenarios, each a mix of the kinds of requests with their shares of the traffic
+SCENARIOS = {
+    'small': {'small': 1},
+    'mixed': {'small': 0.85, 'table': 0.05, 'compare': 0.1},
+    'heavy': {'small': 0.8, 'table': 0.1, 'compare': 0.09, 'huge': 0.01},
+}
+
+class Server:
+    """
+    Runs the app in a subprocess on a local port: with gunicorn and src/gunicorn.conf.py, or with the Flask development
+    server ('flask'). Used as a context manager, which waits until the app answers and stops it at the end. The app
+    shares its metrics in a directory of its own (see gunicorn.conf.py), so that a server running on the same machine
+    keeps its metrics.
+    """
+
+    def __init__(self, server: str = 'gunicorn', port: int = 5099, workers: int = 2, threads: int = 2):
+        self.url = f'http://127.0.0.1:{port}'
+
+        if server == 'gunicorn':
+            command = [sys.executable, '-m', 'gunicorn', '--config', os.path.join(SRC_DIR, 'gunicorn.conf.py'), '--bind', f'127.0.0.1:{port}', 'app:app']
+        elif server == 'flask':
+            command = [sys.executable, '-c', f'from app import app; app.run(port={port}, threaded=True)']
+        else:
+            raise ValueError(f"Unknown server: Expected one of ['gunicorn', 'flask'] but got {server}")
+
+        env = dict(os.environ, WEB_CONCURRENCY=str(workers), AZUR_THREADS=str(threads))
+        self._command, self._env = command, env
+        self._metrics_dir = None
+        self.process = None
+
+    def __enter__(self) -> 'Server':
+
+        self._metrics_dir = tempfile.mkdtemp(prefix='azur_loadtest_metrics_')
+        env = dict(self._env, AZUR_METRICS_DIR=self._metrics_dir)
+        self.process = subprocess.Popen(self._command, cwd=SRC_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None: raise RuntimeError(f"The server exited with code {self.process.returncode}")
+            try:
+                if _request(self.url, 'GET', '/hello_world')[0] == 200: return self
+            except OSError:
+                time.sleep(0.2)
+
+        self.__exit__()
+        raise RuntimeError('The server did not start within 60 seconds')
+
+    def __exit__(self, *exc_info):
+
+        if self.process is not None:
+            self.process.terminate()
+            try: self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired: self.process.kill()
+
+        if self._metrics_dir is not None: shutil.rmtree(self._metrics_dir, ignore_errors=True)
+
+    def worker_memory(self) -> Optional[int]:
+        """The resident memory in bytes of the server and its worker processes, or None where /proc is not available."""
+
+        if self.process is None or not os.path.exists('/proc'): return None
+        return sum(_rss(pid) for pid in [self.process.pid] + _children(self.process.pid))
+
+def _children(pid: int) -> List[int]:
+    """The ids of the processes started by a process, read from /proc."""
+
+    children = []
+
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit(): continue
+        try:
+            with open(f'/proc/{entry}/stat') as f: stat = f.read()
+        except OSError:
+            continue
+        if int(stat.rsplit(')', 1)[1].split()[1]) == pid: children.append(int(entry)) # The parent id follows the name
+
+    return children
+
+def _rss(pid: int) -> int:
+    """The resident memory of a process in bytes, read from /proc, or 0 if it is gone."""
+
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'): return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    return 0
+
+def _request(url: str, method: str, path: str, body: Optional[Dict] = None, connection: Optional[http.client.HTTPConnection] = None) -> Tuple[int, http.client.HTTPConnection]:
+    """Sends a request and reads the response, on a kept-alive connection if given. Returns the status and the connection."""
+
+    if connection is None: connection = http.client.HTTPConnection(urlparse(url).netloc, timeout=120)
+
+    data = None if body is None else json.dumps(body).encode()
+    connection.request(method, path, data, {'Content-Type': 'application/json'} if data else {})
+    response = connection.getresponse()
+    response.read()
+
+    return response.status, connection
+
+def http_sender(url: str) -> Callable[[str, Dict], int]:
+    """Returns a function that posts a payload to the app at url and returns the status, with a connection per thread."""
+
+    local = threading.local()
+
+    def send(path: str, body: Dict) -> int:
+        try:
+            status, local.connection = _request(url, 'POST', path, body, getattr(local, 'connection', None))
+            return status
+        except (OSError, http.client.HTTPException):
+            local.connection = None
+            return 0 # Counted as an error, like any status but 200
+
+    return send
+
+def run_scenario(send: Callable[[str, Dict], int], mix: Dict[str, float], rate: float, duration: float, concurrency: int = 64, seed: int = 0, memory: Optional[Callable[[], Optional[int]]] = None) -> Dict:
+    """
+    Sends requests drawn from a mix of PAYLOADS at a constant rate for a number of seconds, and measures them.
+    :param send: a function posting a payload (path, body) to the app and returning the status code, eg. http_sender
+    :param mix: the share of each kind of request in PAYLOADS, see SCENARIOS
+    :param rate: the number of requests per second
+    :param concurrency: the number of requests that can be in flight at once; later ones wait for a free thread
+    :param memory: optionally a function returning the memory of the workers in bytes, sampled during the run
+    :return: the report of the scenario, see report
+    """
+
+    rng = random.Random(seed)
+    kinds, weights = list(mix.keys()), list(mix.values())
+    n_requests = max(1, int(rate * duration))
+
+    # The payloads are generated upfront, so generating them does not slow down sending them
+    schedule = [(i / rate, kind, *PAYLOADS[kind](rng)) for i, kind in enumerate(rng.choices(kinds, weights, k=n_requests))]
+    results = [] # (kind, status, latency)
+    lock = threading.Lock()
+    memory_samples = []
+
+    def sample_memory(done: threading.Event):
+        while not done.is_set():
+            value = memory()
+            if value is not None: memory_samples.append(value)
+            done.wait(0.5)
+
+    def run(due: float, kind: str, path: str, body: Dict):
+        status = send(path, body)
+        latency = time.perf_counter() - due
+        with lock: results.append((kind, status, latency))
+
+    done = threading.Event()
+    if memory is not None: threading.Thread(target=sample_memory, args=(done,), daemon=True).start()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        for offset, kind, path, body in schedule:
+            delay = start + offset - time.perf_counter()
+            if delay > 0: time.sleep(delay)
+            executor.submit(run, start + offset, kind, path, body)
+    elapsed = time.perf_counter() - start
+
+    done.set()
+
+    return report(results, elapsed, memory_samples)
+
+def report(results: List[Tuple[str, int, float]], elapsed: float, memory_samples: List[int]) -> Dict:
+    """
+    Summarizes the measured requests of a scenario: the number of requests, the throughput in requests per second,
+    the share of requests that failed (any status but 200), the number rejected by admission control (429 or 503), the
+    latency percentiles in seconds, overall and by kind of request, and the peak memory of the workers in bytes.
+    """
+
+    latencies = sorted(x for _, _, x in results)
+    errors = sum(status != 200 for _, status, _ in results)
+
+    by_kind = {}
+    for kind in sorted(set(kind for kind, _, _ in results)):
+        kind_latencies = sorted(x for k, _, x in results if k == kind)
+        by_kind[kind] = {'requests': len(kind_latencies), 'p50': percentile(kind_latencies, 50), 'p99': percentile(kind_latencies, 99)}
+
+    return {'requests': len(results),
+            'throughput': len(results) / elapsed if elapsed > 0 else 0.0,
+            'error_rate': errors / len(results) if results else 0.0,
+            'rejected': sum(status in [429, 503] for _, status, _ in results),
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'by_kind': by_kind,
+            'peak_memory': max(memory_samples) if memory_samples else None}
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """The q-th percentile of sorted values by the nearest rank method, or None without values."""
+
+    if not sorted_values: return None
+    rank = max(1, -(-len(sorted_values) * q // 100)) # ceil(n * q / 100)
+    return sorted_values[int(rank) - 1]
+
+def find_regressions(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float = 1.5) -> List[str]:
+    """
+    Compares the reports of scenarios to a baseline and describes each regression: a throughput below the baseline
+    divided by threshold (ie. the server did not keep up with the rate), a p99 latency above threshold times the
+    baseline, or an error rate above the baseline by more than 1%. Scenarios without a baseline are skipped.
+    """
+
+    regressions = []
+
+    for name, result in results.items():
+        if name not in baseline: continue
+        reference = baseline[name]
+
+        if result['throughput'] * threshold < reference['throughput']:
+            regressions.append(f"{name}: throughput {result['throughput']:.1f}/s, baseline {reference['throughput']:.1f}/s")
+        if result['p99'] is not None and reference['p99'] is not None and result['p99'] > threshold * max(reference['p99'], 0.001):
+            regressions.append(f"{name}: p99 {result['p99']*1000:.1f} ms, baseline {reference['p99']*1000:.1f} ms")
+        if result['error_rate'] > reference['error_rate'] + 0.01:
+            regressions.append(f"{name}: error rate {result['error_rate']:.2%}, baseline {reference['error_rate']:.2%}")
+
+    return regressions
+
+def _print_report(name: str, result: Dict):
+
+    memory = f"{result['peak_memory']/2**20:8.1f} MiB" if result['peak_memory'] is not None else '       - MiB'
+    print(f"{name:8} {result['requests']:7} req {result['throughput']:8.1f} req/s  errors {result['error_rate']:6.2%}  "
+          f"p50 {result['p50']*1000:8.1f} ms  p95 {result['p95']*1000:8.1f} ms  p99 {result['p99']*1000:8.1f} ms  {memory}")
+
+def main(argv: List[str] = None) -> int:
+
+    parser = argparse.ArgumentParser(description='Load tests the app with a mix of /azur and /azur_compare requests.')
+    parser.add_argument('--scenario', action='append', choices=list(SCENARIOS.keys()), help='a scenario to run (repeatable, default: all)')
+    parser.add_argument('--mix', help="a custom scenario as JSON, eg. '{\"small\": 0.9, \"huge\": 0.1}', see PAYLOADS")
+    parser.add_argument('--rate', type=float, default=50, help='requests per second')
+    parser.add_argument('--duration', type=float, default=20, help='seconds per scenario')
+    parser.add_argument('--concurrency', type=int, default=64, help='requests in flight at most')
+    parser.add_argument('--url', help='the URL of a running server, instead of starting one')
+    parser.add_argument('--server', default='gunicorn', choices=['gunicorn', 'flask'], help='the server to start the app on')
+    parser.add_argument('--workers', type=int, default=2, help='the number of gunicorn workers')
+    parser.add_argument('--threads', type=int, default=2, help='the number of threads per gunicorn worker')
+    parser.add_argument('--port', type=int, default=5099, help='the port to start the server on')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='path of the JSON baseline file')
+    parser.add_argument('--update-baseline', action='store_true', help='store the results as the baseline instead of comparing')
+    parser.add_argument('--threshold', type=float, default=1.5, help='ratio to the baseline above which a scenario counts as regressed')
+    parser.add_argument('--output', help='also write the reports as JSON to this path')
+    args = parser.parse_args(argv)
+
+    if args.mix: scenarios = {'custom': json.loads(args.mix)}
+    else: scenarios = {name: SCENARIOS[name] for name in (args.scenario or SCENARIOS.keys())}
+
+    unknown = [kind for mix in scenarios.values() for kind in mix if kind not in PAYLOADS]
+    if unknown: parser.error(f"Unknown kinds of requests {unknown}: Expected some of {list(PAYLOADS.keys())}")
+
+    results = {}
+
+    def run_all(url: str, memory: Optional[Callable[[], Optional[int]]]):
+        for name, mix in scenarios.items():
+            results[name] = run_scenario(http_sender(url), mix, args.rate, args.duration, args.concurrency, memory=memory)
+            _print_report(name, results[name])
+
+    if args.url: run_all(args.url, None)
+    else:
+        with Server(args.server, args.port, args.workers, args.threads) as server: run_all(server.url, server.worker_memory)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf8') as f: json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.update_baseline:
+        store_baseline(results, args.baseline)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline found at {args.baseline}, so there is nothing to compare to: recording this run as the baseline")
+        store_baseline(results, args.baseline)
+        return 0
+
+    with open(args.baseline, encoding='utf8') as f: baseline = json.load(f)
+
+    regressions = find_regressions(results, baseline, args.threshold)
+    for regression in regressions: print(f"REGRESSION {regression}")
+    print(f"{len(regressions)} regressions in {len(results)} scenarios")
+
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,282 @@
+import atexit
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional, Tuple
+
+import json
+from flask import Response, jsonify
+
+from results import AssignmentResult, json_default
+
+# Upper bounds in seconds of the buckets of the latency histograms
+LATENCY_BUCKETS = [0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10]
+
+# Upper bounds of the buckets that requests are grouped into by their number of seats resp. parties
+SIZE_BUCKETS = [10, 100, 1000, 10000, 100000, 1000000]
+
+# The file of the metrics of all exited processes in a directory shared by processes, see compact
+EXITED_FILE = 'metrics_exited.json'
+
+class Metrics:
+    """
+    Collects the latency histograms of requests by method and by bucket of their number of seats and parties, and
+    counts the requests by status, the ambiguous results by method and the errors by status. Rendered in the Prometheus
+    text format, so it can be scraped from /metrics.
+    With several server processes (see gunicorn.conf.py), each only sees its own requests, so they can share a
+    directory: each process then writes its metrics to a file of its own there, from a background thread every
+    flush_interval seconds if they have changed, and when it exits. render sums up the files of all processes, so that
+    the counters of a scrape do not depend on the process answering it, including those of exited processes, which are
+    merged into a single file by compact.
+    """
+
+    def __init__(self, directory: Optional[str] = None, flush_interval: float = 1):
+        """
+        :param directory: the directory shared by the processes, or None to only render the metrics of this process
+        :param flush_interval: the number of seconds between writes of the metrics of this process to the directory
+        """
+
+        self._histograms = {} # (method, seats_bucket, parties_bucket) -> [bucket counts..., sum, count]
+        self._requests = {} # status -> count
+        self._ambiguous = {} # method -> count
+        self._lock = threading.Lock()
+
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._file = None # The file of this process, named on its first write, as processes are forked with the metrics
+        self._pid = None
+        self._changed = False
+        self._flusher_pid = None # The process the background thread writing the file runs in, as threads are not forked
+        if directory is not None: atexit.register(self.flush)
+
+    def record(self, status: int, duration: float, method: Optional[str] = None, n_seats: int = 0, n_parties: int = 0, is_ambiguous: bool = False):
+        """
+        Records a finished request. The latency is only recorded for requests that got to an assignment, ie. that have
+        a method.
+        """
+
+        with self._lock:
+            self._requests[status] = self._requests.get(status, 0) + 1
+            self._changed = True
+            start_flusher = self.directory is not None and self._flusher_pid != os.getpid()
+            if start_flusher: self._flusher_pid = os.getpid()
+
+            if method is not None:
+                if is_ambiguous: self._ambiguous[method] = self._ambiguous.get(method, 0) + 1
+
+                key = (method, _size_bucket(n_seats), _size_bucket(n_parties))
+                histogram = self._histograms.setdefault(key, [0 for _ in range(len(LATENCY_BUCKETS) + 3)])
+                histogram[bisect_left(LATENCY_BUCKETS, duration)] += 1
+                histogram[-2] += duration
+                histogram[-1] += 1
+
+        if start_flusher: threading.Thread(target=self._flush_changes, daemon=True).start()
+
+    def _flush_changes(self):
+        """Runs in a background thread of each process, writing its metrics to the directory when they have changed."""
+
+        while True:
+            time.sleep(self.flush_interval)
+            if self._changed: self.flush()
+
+    def flush(self):
+        """Writes the metrics of this process to its file in the directory, replacing the file at once."""
+
+        with self._lock:
+            if os.getpid() != self._pid: self._pid, self._file = os.getpid(), f'metrics_{os.getpid()}_{uuid.uuid4().hex}.json'
+            self._changed = False
+            state = _state(self._histograms, self._requests, self._ambiguous)
+
+        os.makedirs(self.directory, exist_ok=True)
+        _write_state(os.path.join(self.directory, self._file), state)
+
+    def render(self) -> str:
+        """Renders all metrics in the Prometheus text exposition format, of all processes if they share a directory."""
+
+        if self.directory is None:
+            with self._lock: histograms, requests, ambiguous = {k: list(x) for k, x in self._histograms.items()}, dict(self._requests), dict(self._ambiguous)
+        else:
+            self.flush()
+            histograms, requests, ambiguous = _read_directory(self.directory)
+
+        lines = ['# HELP azur_request_duration_seconds Latency of /azur requests by method, number of seats and number of parties.',
+                 '# TYPE azur_request_duration_seconds histogram']
+
+        for (method, seats, parties), histogram in sorted(histograms.items()):
+            labels = f'method="{method}",seats="{seats}",parties="{parties}"'
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS + ['+Inf'], histogram):
+                cumulative += n
+                lines.append(f'azur_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'azur_request_duration_seconds_sum{{{labels}}} {histogram[-2]}')
+            lines.append(f'azur_request_duration_seconds_count{{{labels}}} {histogram[-1]}')
+
+        lines += ['# HELP azur_requests_total Requests to /azur by status code.',
+                  '# TYPE azur_requests_total counter']
+        lines += [f'azur_requests_total{{status="{status}"}} {n}' for status, n in sorted(requests.items())]
+
+        lines += ['# HELP azur_errors_total Requests to /azur that failed, by status code.',
+                  '# TYPE azur_errors_total counter']
+        lines += [f'azur_errors_total{{status="{status}"}} {n}' for status, n in sorted(requests.items()) if status >= 400]
+
+        lines += ['# HELP azur_ambiguous_results_total Results of /azur with an ambiguous distribution, by method.',
+                  '# TYPE azur_ambiguous_results_total counter']
+        lines += [f'azur_ambiguous_results_total{{method="{method}"}} {n}' for method, n in sorted(ambiguous.items())]
+
+        return '\n'.join(lines) + '\n'
+
+    def timer(self, enabled: bool = True) -> 'RequestTimer':
+        """Starts timing a request, or returns a timer that does nothing if metrics are not enabled."""
+
+        return RequestTimer(self) if enabled else NULL_TIMER
+
+def compact(directory: str, pid: int):
+    """
+    Merges the files of an exited process in a directory shared by processes (see Metrics) into the file of all exited
+    processes, and removes them, so that the directory does not grow with each process that is replaced. Called by the
+    process that starts the others (see gunicorn.conf.py), as the only one writing the file of exited processes.
+    """
+
+    names = [name for name in os.listdir(directory) if name.startswith(f'metrics_{pid}_') and name.endswith('.json')]
+    if not names: return
+
+    exited = _load_state(os.path.join(directory, EXITED_FILE))
+    states = ([] if exited is None else [exited]) + [x for x in (_load_state(os.path.join(directory, name)) for name in names) if x is not None]
+
+    # The files merged last are listed, so that a scrape reading them before they are removed does not count them twice
+    _write_state(os.path.join(directory, EXITED_FILE), dict(_state(*_sum_states(states)), merged=names))
+
+    for name in names:
+        try: os.remove(os.path.join(directory, name))
+        except OSError: pass
+
+def _read_directory(directory: str) -> Tuple[Dict, Dict, Dict]:
+    """
+    Sums up the metrics in the files of all processes in a directory, see Metrics.flush. The file of exited processes
+    is read last, so that the files it has merged since they were read are left out, see compact.
+    """
+
+    states = {name: _load_state(os.path.join(directory, name)) for name in os.listdir(directory) if name.endswith('.json') and name != EXITED_FILE}
+    exited = _load_state(os.path.join(directory, EXITED_FILE))
+
+    if exited is not None:
+        for name in exited['merged']: states.pop(name, None)
+        states[EXITED_FILE] = exited
+
+    return _sum_states([x for x in states.values() if x is not None])
+
+def _state(histograms: Dict, requests: Dict, ambiguous: Dict) -> Dict:
+    """The metrics of a file in a directory shared by processes, in a format that JSON can hold."""
+
+    return {'histograms': [list(key) + [list(histogram)] for key, histogram in histograms.items()],
+            'requests': list(requests.items()),
+            'ambiguous': list(ambiguous.items())}
+
+def _write_state(path: str, state: Dict):
+    """Writes the metrics of a file, replacing the file at once."""
+
+    temporary = f'{path}.{threading.get_ident()}.tmp'
+    with open(temporary, 'w') as f: json.dump(state, f)
+    os.replace(temporary, path)
+
+def _load_state(path: str) -> Optional[Dict]:
+    """Reads the metrics of a file, None if it has been removed since it was listed."""
+
+    try:
+        with open(path) as f: return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _sum_states(states: List[Dict]) -> Tuple[Dict, Dict, Dict]:
+    """Sums up the metrics of files, into the histograms, requests and ambiguous results of Metrics."""
+
+    histograms, requests, ambiguous = {}, {}, {}
+
+    for state in states:
+        for *key, histogram in state['histograms']:
+            total = histograms.setdefault(tuple(key), [0 for _ in histogram])
+            for i, x in enumerate(histogram): total[i] += x
+        for status, n in state['requests']: requests[status] = requests.get(status, 0) + n
+        for method, n in state['ambiguous']: ambiguous[method] = ambiguous.get(method, 0) + n
+
+    return histograms, requests, ambiguous
+
+def _size_bucket(n: int) -> str:
+    """Names the bucket of a number of seats or parties by its upper bound, eg. 'le_100'."""
+
+    index = bisect_left(SIZE_BUCKETS, n)
+    return f'le_{SIZE_BUCKETS[index]}' if index < len(SIZE_BUCKETS) else 'inf'
+
+class RequestTimer:
+    """
+    Times the phases of a request, eg. parsing, validation and the engine, and on finishing the request, serializes
+    the response as a phase of its own, adds the breakdown as a Server-Timing header and records it in the metrics.
+    """
+
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+        self.start = time.perf_counter()
+        self.phases = [] # (name, duration)
+        self.labels = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try: yield
+        finally: self.phases.append((name, time.perf_counter() - start))
+
+    def label(self, input: Dict, output: AssignmentResult):
+        """Labels the request with the method and size of its (validated) input and the ambiguity of its output."""
+
+        self.labels = {'method': input['method'],
+                       'n_seats': input['num_of_seats'],
+                       'n_parties': len(input['votes']),
+                       'is_ambiguous': output.distribution.is_ambiguous}
+
+    def finish(self, body, status: int, headers: Optional[Dict[str, str]] = None) -> Tuple[Response, int]:
+        """
+        Turns the body of a route (a dict, an AssignmentResult or a Response) and its headers into the response, timed
+        and recorded.
+        """
+
+        with self.phase('serialize'):
+            response = body if isinstance(body, Response) else json_response(body)
+
+        if headers: response.headers.update(headers)
+
+        duration = time.perf_counter() - self.start
+        timings = [f'{name};dur={x * 1000:.3f}' for name, x in self.phases + [('total', duration)]]
+        response.headers['Server-Timing'] = ', '.join(timings)
+
+        self.metrics.record(status, duration, **self.labels)
+
+        return response, status
+
+class _NullTimer:
+    """Stands in for a RequestTimer if metrics are not enabled, so that timing costs a few no-op calls per request."""
+
+    def phase(self, name: str) -> nullcontext:
+        return _NO_OP
+
+    def label(self, input: Dict, output: AssignmentResult):
+        pass
+
+    def finish(self, body, status: int, headers: Optional[Dict[str, str]] = None) -> Tuple:
+        if isinstance(body, AssignmentResult): body = json_response(body)
+        return (body, status) if headers is None else (body, status, headers)
+
+def json_response(body) -> Response:
+    """
+    Like flask.jsonify, but serializes an AssignmentResult directly, building the dicts of its rows one at a time
+    while they are encoded (see results.json_default), with the same output as jsonify of its to_dict.
+    """
+
+    if not isinstance(body, AssignmentResult): return jsonify(body)
+
+    return Response(json.dumps(body, default=json_default, separators=(',', ':'), sort_keys=True) + '\n', mimetype='application/json')
+
+_NO_OP = nullcontext()
+NULL_TIMER = _NullTimer()
@@ -0,0 +1,126 @@
+"""
+The outcomes of the ties of an assignment. If more parties are tied for the last seats than seats are left, both the
+divisor methods and Hare-Niemeyer give each tied party a range [n, n+1] of seats (see assignment.add_ambiguity), and a
+lot decides which of them get the seats left. Each outcome of the lot is a complete distribution, in which a subset of
+the tied parties of the size of the seats left gets one seat more, so there are binomial(tied, left) of them. Their
+number is computed without enumerating them, and they are enumerated lazily, in lexicographic order of the subsets of
+tied parties, starting from any position by unranking it, so they can be returned one page at a time.
+"""
+
+from math import comb
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from assignment import _with_deadline
+from results import Distribution
+
+# The largest number of outcomes of a page returned by the API
+OUTCOME_PAGE_LIMIT = 1000
+
+def outcome_range(input: Dict) -> Tuple[int, int]:
+    """
+    Reads the page of outcomes requested by an assignment input with 'return_outcomes': the first and last outcome
+    from 'outcome_range', by default the first OUTCOME_PAGE_LIMIT outcomes.
+    """
+
+    if 'outcome_range' in input.keys(): return tuple(input['outcome_range'])
+    return 1, OUTCOME_PAGE_LIMIT
+
+def estimate_outcomes_cost(input: Dict) -> int:
+    """
+    Estimates the cost of the page of outcomes requested by a validated assignment input, in the units of
+    assignment.estimate_cost: each outcome is a distribution of all parties, and the page is at most as long as its range.
+    """
+
+    first, last = outcome_range(input)
+    return (last - first + 1) * (100 + 4 * len(input['votes']))
+
+def input_outcomes(input: Dict, distribution: Distribution) -> Dict[str, object]:
+    """
+    Returns the number of outcomes of the ties of the distribution of a validated assignment input, and a generator
+    of the page of them requested by the input, see outcome_range.
+    :return: a dict of format {'count': int, 'distributions': Iterator[Dict[str, int]]}
+    """
+
+    first, last = outcome_range(input)
+    num_seats = input['num_of_seats']
+
+    return {'count': count_outcomes(distribution, num_seats), 'distributions': tie_outcomes(distribution, num_seats, first, last)}
+
+def listed_outcomes(input: Dict, distribution: Distribution, deadline: Optional[float] = None) -> Dict[str, object]:
+    """
+    Like input_outcomes, but with the page of outcomes as a list, for responses that are not streamed, raising
+    assignment.DeadlineExceeded once the deadline (a time.monotonic() value) has passed.
+    """
+
+    outcomes = input_outcomes(input, distribution)
+    return dict(outcomes, distributions=list(_with_deadline(outcomes['distributions'], deadline, check_every=64)))
+
+def count_outcomes(distribution: Distribution, num_seats: int) -> int:
+    """The number of outcomes of the ties of a distribution of num_seats seats, 1 if it is not ambiguous."""
+
+    tied, seats_left = _tie(distribution, num_seats)
+    return comb(len(tied), seats_left)
+
+def tie_outcomes(distribution: Distribution, num_seats: int, first: int = 1, last: Optional[int] = None) -> Iterator[Dict[str, int]]:
+    """
+    Generates the outcomes of the ties of a distribution of num_seats seats, from the first to the last (counting from
+    1, by default to the end), in lexicographic order of the tied parties getting the seats left. The outcomes before
+    the first are not generated.
+    :return: the outcomes, each a distribution of format {party_name: n_seats}
+    """
+
+    tied, seats_left = _tie(distribution, num_seats)
+    count = comb(len(tied), seats_left)
+    last = count if last is None else min(last, count)
+    if first > last: return
+
+    parties, seats = distribution.parties, distribution.seats.tolist()
+    chosen = _unrank_combination(len(tied), seats_left, first - 1)
+
+    for _ in range(last - first + 1):
+        outcome = list(seats)
+        for i in chosen: outcome[tied[i]] += 1
+        yield dict(zip(parties, outcome))
+
+        _next_combination(chosen, len(tied))
+
+def _tie(distribution: Distribution, num_seats: int) -> Tuple[List[int], int]:
+    """The indices of the tied parties of a distribution, and the number of seats left to them by the lot."""
+
+    return distribution.ambiguous_parties(), num_seats - sum(distribution.seats)
+
+def _unrank_combination(n: int, k: int, rank: int) -> List[int]:
+    """
+    Returns the combination of k of the numbers 0 to n - 1 at a rank (counting from 0) of their lexicographic order,
+    by choosing each element in turn, skipping the blocks of combinations starting with smaller elements. The sizes of
+    the blocks are binomials updated from each other by exact integer ratios, rather than computed one by one.
+    """
+
+    combination, c = [], 0
+    count = comb(n - 1, k - 1) if k > 0 else 0 # The combinations of the rest if the first element is 0
+
+    for i in range(k):
+        rest = k - i - 1
+
+        # count is binomial(n - c - 1, rest), the number of combinations if element i is c
+        while rank >= count:
+            rank -= count
+            count = count * (n - c - 1 - rest) // (n - c - 1)
+            c += 1
+
+        combination.append(c)
+        if rest: count = count * rest // (n - c - 1)
+        c += 1
+
+    return combination
+
+def _next_combination(combination: List[int], n: int):
+    """Advances a combination of the numbers 0 to n - 1 to the next in lexicographic order, in place, if there is one."""
+
+    k = len(combination)
+
+    for i in reversed(range(k)):
+        if combination[i] < n - k + i:
+            combination[i] += 1
+            for j in range(i + 1, k): combination[j] = combination[j - 1] + 1
+            return
@@ -0,0 +1,244 @@
+"""
+The quotient table (Höchstzahlen) of the divisor methods: the quotients votes / divisor of each party for each of its
+seats, which the engine of assignment.assign_iterative compares and discards. Each entry has its rank, ie. its position
+in the order in which the engine hands out seats, which is the seat it gets if the rank is at most the number of seats.
+The table is generated lazily, one page at a time: either the entries of a range of ranks, or the entries of a range
+of seats of each party, ie. of the rows of the classic table with one row per divisor.
+"""
+
+from fractions import Fraction
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from assignment import DIVISOR_METHODS, DivisorMethod, _divisor_fast_start, _iterate_divisor_steps, _with_deadline
+
+# The number of decimals of the fixed-point quotients, which are rounded half up
+QUOTIENT_DECIMALS = 6
+
+# The largest number of entries of a page of the quotient table returned by the API
+QUOTIENT_PAGE_LIMIT = 10000
+
+# A quotient of the table: its rank (or None if it is above max_rank), the index of the party and its number of seats
+# before the quotient, and the first rank and number of quotients of the step of the engine the quotient belongs to
+QuotientEntry = Tuple[Optional[int], int, int, Optional[int], Optional[int]]
+
+def quotient_page(input: Dict) -> Tuple[Optional[Tuple[int, int]], Optional[Tuple[int, int]]]:
+    """
+    Reads the page of the quotient table requested by an assignment input with 'return_quotients': the ranks or seats
+    of the page from 'quotient_ranks' or 'quotient_seats', as [first, last], by default the ranks of the seats up to
+    QUOTIENT_PAGE_LIMIT.
+    :return: the ranks and seats of the page, one of which is None
+    """
+
+    if 'quotient_seats' in input.keys(): return None, tuple(input['quotient_seats'])
+    if 'quotient_ranks' in input.keys(): return tuple(input['quotient_ranks']), None
+
+    return (1, min(input['num_of_seats'], QUOTIENT_PAGE_LIMIT)), None
+
+def estimate_quotients_cost(input: Dict) -> int:
+    """
+    Estimates the cost of the page of the quotient table requested by a validated assignment input, in the units of
+    assignment.estimate_cost. The entries of a range of ranks come from running the engine, while each entry of a range
+    of seats counts the quotients of all parties before it, see _quotient_rank.
+    """
+
+    ranks, seats = quotient_page(input)
+    n_parties = len(input['votes'])
+
+    if ranks is not None: return 64 * n_parties + 200 * (ranks[1] - ranks[0] + 1)
+    return (seats[1] - seats[0] + 1) * n_parties * (1000 + 3 * n_parties)
+
+def input_quotients(input: Dict, max_rank: int, deadline: Optional[float] = None) -> Iterator[Dict]:
+    """
+    Generates the page of the quotient table requested by a validated assignment input, see quotient_table, raising
+    assignment.DeadlineExceeded once the deadline (a time.monotonic() value) has passed.
+    """
+
+    ranks, seats = quotient_page(input)
+    entries = quotient_table(input['votes'], DIVISOR_METHODS[input['method']], input['num_of_seats'], ranks, seats, max_rank)
+    return _with_deadline(entries, deadline, check_every=16)
+
+def quotient_table(votes: Mapping[str, int], divisor_method: DivisorMethod, num_seats: int, ranks: Optional[Tuple[int, int]] = None, seats: Optional[Tuple[int, int]] = None, max_rank: Optional[int] = None) -> Iterator[Dict]:
+    """
+    Generates a page of the quotient table of a divisor method, ordered by rank for a range of ranks, and by seat and
+    then party for a range of seats. Parties without votes have no quotients, as these never get a seat, unless no
+    party has votes: then all quotients are 0 (also 0/0, as in assignment._Quotient) and each step gives every party a
+    seat.
+    :param votes: the number of votes of each party in a mapping of format {party_name: votes}
+    :param num_seats: the number of seats, which decides which quotients get a seat
+    :param ranks: the first and last rank of the page, counting from 1
+    :param seats: the first and last seat of each party of the page, counting from 1, if no ranks are given
+    :param max_rank: the largest rank that is computed for a range of seats, above which the rank is None. Defaults to
+    the last seat of the range times the number of parties
+    :return: entries of format {'rank': int, 'party': str, 'seat': int, 'quotient': str, 'exact': str, 'assigned': bool,
+    'is_ambiguous': bool}, where 'seat' is the seat of the party the quotient is for, 'quotient' the quotient as a
+    fixed-point decimal and 'exact' as an exact fraction (or root of a fraction, for methods with a power), and
+    'is_ambiguous' tells if the quotient is tied for the last seats with more quotients than seats are left
+    """
+
+    parties = list(votes.keys())
+    weights = divisor_method.weights(votes)
+
+    if ranks is not None: entries = _rank_entries(weights, divisor_method, ranks[0], ranks[1])
+    else: entries = _seat_entries(weights, divisor_method, seats[0], seats[1], max_rank or seats[1] * len(parties))
+
+    for rank, p, party_seats, step_start, step_size in entries:
+        weight, divisor = weights[p], int(divisor_method.divisors(party_seats + 1)[party_seats])
+        step_end = None if step_start is None else step_start + step_size - 1
+
+        yield {'rank': rank,
+               'party': parties[p],
+               'seat': party_seats + 1,
+               'quotient': format_quotient(weight, divisor, divisor_method),
+               'exact': exact_quotient(weight, divisor, divisor_method),
+               'assigned': step_end is not None and step_end <= num_seats,
+               'is_ambiguous': step_start is not None and step_start <= num_seats < step_end}
+
+def exact_quotient(weight: int, divisor: int, divisor_method: DivisorMethod) -> str:
+    """Formats the quotient of a weight and a divisor of a divisor method exactly, eg. '2469/2' or 'sqrt(1000/3)'."""
+
+    if weight == 0: return '0' # Also 0/0, as in assignment._Quotient
+    if divisor == 0: return 'Infinity'
+
+    value = Fraction(weight * divisor_method.scale, divisor)
+
+    if divisor_method.power == 1: return str(value)
+    if divisor_method.power == 2: return f'sqrt({value})'
+    return f'({value})^(1/{divisor_method.power})'
+
+def format_quotient(weight: int, divisor: int, divisor_method: DivisorMethod, decimals: int = QUOTIENT_DECIMALS) -> str:
+    """
+    Formats the quotient of a weight and a divisor of a divisor method as a fixed-point decimal, rounded half up in
+    exact integer arithmetic, also for methods with a power, whose quotients are roots of the weight / divisor.
+    """
+
+    if divisor == 0 and weight == 0: divisor = 1 # 0/0 is 0, as in assignment._Quotient
+    if divisor == 0: return 'Infinity'
+
+    # Twice the quotient, scaled to an integer and rounded down, decides the rounding of the last decimal
+    power = divisor_method.power
+    numerator, denominator = weight * divisor_method.scale * (2 * 10**decimals) ** power, divisor
+    twice = _integer_root(numerator // denominator, power)
+    scaled = (twice + 1) // 2
+
+    digits = str(scaled).rjust(decimals + 1, '0')
+    return f'{digits[:-decimals]}.{digits[-decimals:]}' if decimals else digits
+
+def _integer_root(x: int, k: int) -> int:
+    """The k-th root of x, rounded down, by Newton's method on integers from an upper bound."""
+
+    if k == 1 or x < 2: return x
+
+    root = 1 << -(-x.bit_length() // k)
+    while True:
+        next_root = ((k - 1) * root + x // root ** (k - 1)) // k
+        if next_root >= root: return root
+        root = next_root
+
+def _table_parties(weights: List[int]) -> List[int]:
+    """The indices of the parties with quotients in the table: those with votes, or all if no party has votes."""
+
+    return [p for p, w in enumerate(weights) if w > 0] or list(range(len(weights)))
+
+def _rank_entries(weights: List[int], divisor_method: DivisorMethod, first: int, last: int) -> Iterator[QuotientEntry]:
+    """
+    Generates the quotients with ranks from first to last in the order of the engine, by running it: from the seats
+    after (nearly) first - 1 seats, see assignment._divisor_fast_start, so the quotients before are not generated.
+    """
+
+    positive = _table_parties(weights)
+    positive_weights = [weights[p] for p in positive]
+    seats = _divisor_fast_start(positive_weights, divisor_method, first - 1) if first > 1 else [0 for _ in positive]
+    before = list(seats)
+    rank = sum(seats) + 1
+
+    divisor = divisor_method.divisors(last + 1).item
+
+    for tied, _ in _iterate_divisor_steps(positive_weights, divisor, last, seats):
+        for i, p in enumerate(tied):
+            if first <= rank + i <= last: yield rank + i, positive[p], before[p], rank, len(tied)
+
+        for p in tied: before[p] += 1
+        rank += len(tied)
+        if rank > last: return
+
+def _seat_entries(weights: List[int], divisor_method: DivisorMethod, first_seat: int, last_seat: int, max_rank: int) -> Iterator[QuotientEntry]:
+    """
+    Generates the quotients of the seats from first_seat to last_seat of each party, by seat and then party, with their
+    rank from counting the quotients before them in the order of the engine, see _quotient_rank.
+    """
+
+    positive = _table_parties(weights)
+    positive_weights = [weights[p] for p in positive]
+    divisors = divisor_method.divisors(max(max_rank, last_seat) + 1)
+
+    if not any(positive_weights): # All quotients are 0, so step s gives every party its seat s + 1, in order
+        for s in range(first_seat - 1, last_seat):
+            for i, p in enumerate(positive):
+                rank = s * len(positive) + i + 1
+                yield (rank, p, s, s * len(positive) + 1, len(positive)) if rank <= max_rank else (None, p, s, None, None)
+        return
+
+    floats = np.array(positive_weights, dtype=np.float64), divisors.astype(np.float64) # Converted once for the page
+
+    for s in range(first_seat - 1, last_seat):
+        for i, p in enumerate(positive):
+            rank, step_start, step_size = _quotient_rank(positive_weights, divisors, floats, i, s, max_rank)
+            yield rank, p, s, step_start, step_size
+
+def _quotient_rank(weights: List[int], divisors: np.ndarray, floats: Tuple[np.ndarray, np.ndarray], party: int, seats: int, max_rank: int) -> Tuple[Optional[int], Optional[int], Optional[int]]:
+    """
+    Computes the rank of the quotient of a party with a number of seats, and the first rank and size of its step, by
+    counting the quotients of each party before it in the order of the engine, exactly: all higher quotients, and the
+    equal quotients of the steps before and of the parties before it in its step. The engine takes equal quotients in
+    one step, except for equal quotients of the same party (if its divisors do not increase), which are in the
+    following steps. Counts are capped at the length of divisors, so ranks above max_rank are None.
+    :param weights: the weights of the parties with votes
+    :param divisors: the divisors for 0 up to at least max_rank seats
+    :param floats: the weights and the divisors as floats
+    """
+
+    weight, divisor = weights[party], int(divisors[seats])
+
+    if divisor == 0: # Infinite quotients tie with each other only
+        higher = np.zeros(len(weights), dtype=np.int64)
+        n_equal = np.full(len(weights), np.searchsorted(divisors, 0, 'right'))
+    else:
+        higher, n_equal = _count_quotients(weights, divisors, floats, weight, divisor)
+
+    if (higher >= len(divisors)).any(): return None, None, None
+
+    occurrence = seats - int(np.searchsorted(divisors, divisor, 'left')) # Equal quotients of the party before it
+    in_step = n_equal > occurrence
+
+    step_start = int(higher.sum() + np.minimum(n_equal, occurrence).sum()) + 1
+    rank = step_start + int(in_step[:party].sum())
+    if rank > max_rank: return None, None, None
+
+    return rank, step_start, int(in_step.sum())
+
+def _count_quotients(weights: List[int], divisors: np.ndarray, floats: Tuple[np.ndarray, np.ndarray], weight: int, divisor: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Counts, for each weight w, its quotients w / d higher than and equal to weight / divisor, ie. the divisors d below
+    and equal to w * divisor / weight. The bound is compared to the divisors as a float first, and exactly in integers
+    for the weights whose bound is within the rounding error of a divisor.
+    """
+
+    float_weights, float_divisors = floats
+    bounds = float_weights * (divisor / weight)
+    higher = np.searchsorted(float_divisors, bounds, 'left')
+    n_equal = np.zeros(len(weights), dtype=np.int64)
+
+    below = float_divisors[np.maximum(higher - 1, 0)]
+    above = float_divisors[np.minimum(higher, len(divisors) - 1)]
+    close = np.flatnonzero((np.abs(below - bounds) <= 1e-9 * bounds) | (np.abs(above - bounds) <= 1e-9 * bounds))
+
+    cap = int(divisors[-1]) + 1
+    for p in close.tolist():
+        product = weights[p] * divisor
+        higher[p] = np.searchsorted(divisors, min(-(-product // weight), cap), 'left')
+        if product % weight == 0 and product // weight < cap:
+            n_equal[p] = np.searchsorted(divisors, product // weight, 'right') - np.searchsorted(divisors, product // weight, 'left')
+
+    return higher, n_equal
@@ -0,0 +1,199 @@
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+from tables import TableRow, _distribution_row
+
+class Distribution:
+    """
+    A distribution of seats, stored compactly: the (lower bound of the) seats of each party as an int array, and the
+    parties that may get one seat more as a bitset, ie. an int with bit p set for the party with index p. The party
+    names are a list shared by all distributions of an output, so they are not copied. Turned into the format
+    {'seats': {...}, 'is_ambiguous': bool} of the API only by to_dict.
+    """
+
+    __slots__ = ('parties', 'seats', 'ambiguous')
+
+    def __init__(self, parties: List[str], seats: Iterable[int], ambiguous: int = 0):
+        self.parties = parties
+        self.seats = array('q', seats)
+        self.ambiguous = ambiguous
+
+    @classmethod
+    def from_row(cls, parties: List[str], row: TableRow) -> 'Distribution':
+        """Copies a row of a table (see tables.TableRow), whose seats list may be reused by its producer."""
+
+        seats, ambiguous, _ = row
+        return cls(parties, seats, _bitset(ambiguous))
+
+    @classmethod
+    def from_dict(cls, distribution: Dict) -> 'Distribution':
+        """Reads a distribution of format {'seats': {...}, 'is_ambiguous': bool}, eg. of a registered method."""
+
+        values = list(distribution['seats'].values())
+        seats = [x[0] if type(x) == list else x for x in values]
+        return cls(list(distribution['seats'].keys()), seats, _bitset(p for p, x in enumerate(values) if type(x) == list))
+
+    @property
+    def is_ambiguous(self) -> bool:
+        return self.ambiguous != 0
+
+    def ambiguous_parties(self) -> List[int]:
+        """The indices of the parties that may get one seat more, in order."""
+
+        parties, bits = [], self.ambiguous
+        while bits:
+            parties.append((bits & -bits).bit_length() - 1) # The lowest bit set
+            bits &= bits - 1
+
+        return parties
+
+    def upper(self) -> List[int]:
+        """The upper bound of the seats of each party."""
+
+        return [x + (self.ambiguous >> p & 1) for p, x in enumerate(self.seats)]
+
+    def to_dict(self) -> Dict:
+
+        if not self.ambiguous: return {'seats': dict(zip(self.parties, self.seats)), 'is_ambiguous': False}
+        return _distribution_row(self.parties, self.seats, self.ambiguous_parties())
+
+    def __eq__(self, other: object) -> bool:
+        """Equal if the dicts are, ie. regardless of the order of the parties."""
+
+        if not isinstance(other, Distribution): return NotImplemented
+        if self.parties is other.parties or self.parties == other.parties: return self.seats == other.seats and self.ambiguous == other.ambiguous
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f'Distribution({self.to_dict()})'
+
+class SeatAssignment:
+    """
+    An entry of the assignment sequence: the index of the party the seat goes to, or the indices of all tied parties
+    if the seat goes to one of them. Turned into the format {'seat_goes_to': ..., 'is_ambiguous': bool} by to_dict.
+    """
+
+    __slots__ = ('parties', 'tied')
+
+    def __init__(self, parties: List[str], tied: Sequence[int]):
+        self.parties = parties
+        self.tied = tuple(tied)
+
+    @classmethod
+    def from_dict(cls, parties: List[str], assignment: Dict) -> 'SeatAssignment':
+
+        goes_to = assignment['seat_goes_to']
+        return cls(parties, [parties.index(x) for x in goes_to] if type(goes_to) == list else [parties.index(goes_to)])
+
+    @property
+    def is_ambiguous(self) -> bool:
+        return len(self.tied) > 1
+
+    def to_dict(self) -> Dict:
+
+        if len(self.tied) == 1: return {'seat_goes_to': self.parties[self.tied[0]], 'is_ambiguous': False}
+        return {'seat_goes_to': [self.parties[p] for p in self.tied], 'is_ambiguous': True}
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, SeatAssignment): return NotImplemented
+        if self.parties is other.parties or self.parties == other.parties: return self.tied == other.tied
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f'SeatAssignment({self.to_dict()})'
+
+class AssignmentResult:
+    """
+    The output of an assignment method: the Distribution, optionally the assignment sequence as a list of
+    SeatAssignment, and optionally the table, as a list of Distribution in the 'rows' format, or as the dict of the
+    'columnar' and 'delta' formats, which are compact already (see tables.py). A page of the quotient table of divisor
+    methods (see quotients.py) can be added as a list of its entries, and the outcomes of the ties (see outcomes.py)
+    as a dict with their number and a page of them. to_dict turns it into the output of
+    assignment.assign, which is only done where it is returned by the API.
+    """
+
+    __slots__ = ('distribution', 'assignment_sequence', 'table', 'quotients', 'outcomes')
+
+    def __init__(self, distribution: Distribution, assignment_sequence: Optional[List[SeatAssignment]] = None, table: Optional[Union[List[Distribution], Dict]] = None, quotients: Optional[List[Dict]] = None, outcomes: Optional[Dict] = None):
+        self.distribution = distribution
+        self.assignment_sequence = assignment_sequence
+        self.table = table
+        self.quotients = quotients
+        self.outcomes = outcomes
+
+    @classmethod
+    def from_dict(cls, output: Dict) -> 'AssignmentResult':
+        """Reads an output in the format of assignment.assign, eg. of a method registered as a function."""
+
+        distribution = Distribution.from_dict(output['distribution'])
+        parties = distribution.parties
+
+        sequence = output.get('assignment_sequence')
+        if sequence is not None: sequence = [SeatAssignment.from_dict(parties, x) for x in sequence]
+
+        table = output.get('table')
+        if type(table) == list: table = [Distribution.from_dict(x) for x in table]
+
+        return cls(distribution, sequence, table, output.get('quotients'), output.get('outcomes'))
+
+    def to_dict(self, nested: bool = True) -> Dict:
+        """
+        :param nested: whether or not to turn the Distribution and SeatAssignment in it into dicts as well, else they
+        are left for json_default
+        """
+
+        convert = (lambda x: x.to_dict()) if nested else (lambda x: x)
+
+        out = {'distribution': convert(self.distribution)}
+        if self.assignment_sequence is not None: out['assignment_sequence'] = [convert(x) for x in self.assignment_sequence] if nested else self.assignment_sequence
+        if type(self.table) == list: out['table'] = [convert(x) for x in self.table] if nested else self.table
+        elif self.table is not None: out['table'] = self.table
+        if self.quotients is not None: out['quotients'] = self.quotients
+        if self.outcomes is not None: out['outcomes'] = self.outcomes
+
+        return out
+
+class Comparison:
+    """
+    A comparison of two values with to_dict, eg. two Distribution, which only keeps the second value if they differ.
+    Turned into the format {key_1: ..., key_2: ... or None, 'is_identical': bool} by to_dict.
+    """
+
+    __slots__ = ('first', 'second', 'keys', 'is_identical')
+
+    def __init__(self, first, second, keys: Sequence[str] = ('dist_A', 'dist_B')):
+        self.is_identical = first == second
+        self.first = first
+        self.second = None if self.is_identical else second
+        self.keys = keys
+
+    def to_dict(self, nested: bool = True) -> Dict:
+
+        convert = (lambda x: x.to_dict()) if nested else (lambda x: x)
+
+        return {self.keys[0]: convert(self.first),
+                self.keys[1]: None if self.second is None else convert(self.second),
+                'is_identical': self.is_identical}
+
+def json_default(value: Any) -> Dict:
+    """
+    Serializes results for json.dumps(default=...), one at a time: nested results are left in the dicts of an
+    AssignmentResult or Comparison, so json.dumps builds the dict of each row of a table only once it encodes the row,
+    and drops it after, rather than holding the dicts of all rows at once as to_dict does.
+    """
+
+    if isinstance(value, (Distribution, SeatAssignment)): return value.to_dict()
+    if isinstance(value, (AssignmentResult, Comparison)): return value.to_dict(nested=False)
+
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+def distributions(parties: List[str], rows: Iterable[TableRow]) -> List[Distribution]:
+    """Stores the rows of a table (see tables.TableRow) as a list of Distribution, ie. the 'rows' format."""
+
+    return [Distribution.from_row(parties, row) for row in rows]
+
+def _bitset(indices: Iterable[int]) -> int:
+
+    bits = 0
+    for p in indices: bits |= 1 << p
+    return bits
@@ -0,0 +1,146 @@
+import numpy as np
+from typing import Dict, Mapping, Optional, Tuple
+
+import assignment
+from results import Distribution
+
+PERTURBATION_MODELS = ['uniform', 'normal']
+
+def robustness(votes: Mapping[str, int], method: str, num_seats: int, model: str = 'uniform', scale: float = 5, samples: int = 10000, seed: Optional[int] = None, deadline: Optional[float] = None) -> Dict:
+    """
+    Estimates how stable a distribution is under noise on the votes, by Monte Carlo: draws samples of perturbed votes
+    and computes the distribution of each sample. All samples are apportioned at once on numpy matrices (see
+    _divisor_samples and _hare_niemeyer_samples), in chunks of bounded size. Ties within a sample are resolved by lot,
+    ie. each tied party gets the seats left over with equal probability.
+    :param votes: the number of votes each party received in a mapping of format {party_name: votes}
+    :param method: one of the assignment methods, see assignment.METHODS
+    :param num_seats: the number of seats to distribute
+    :param model: the perturbation of each party's votes, independently of the others: 'uniform' multiplies them by
+    a factor drawn uniformly from [1 - scale%, 1 + scale%], 'normal' by a factor drawn from N(1, scale%). Perturbed votes
+    are rounded and at least 0, and a sample without any votes keeps the original votes
+    :param scale: the size of the perturbation in percent
+    :param samples: the number of samples
+    :param seed: the seed of the random generator, for reproducible results
+    :param deadline: optionally a time.monotonic() value, after which the analysis is cancelled by DeadlineExceeded
+    :return: A dict containing
+        (1) 'distribution', the distribution for the original votes, as returned by the assignment method
+        (2) 'parties', a dict of format {party_name: {'seats': {n_seats: probability}, 'mean_seats': float,
+            'p_gain': float, 'p_lose': float, 'p_change': float}}, where p_gain (p_lose) is the probability of more
+            (fewer) seats than the original distribution gives the party, counting ambiguous seats as possible
+        (3) 'samples', the number of samples
+    """
+
+    parties = list(votes.keys())
+    weights = np.array(list(votes.values()), dtype=np.int64)
+
+    distribution = assignment.assign_result({'votes': votes, 'method': method, 'num_of_seats': num_seats, 'return_sequence': False}).distribution
+    lower, upper = distribution.seats, distribution.upper()
+
+    rng = np.random.default_rng(seed)
+    chunk_size = max(1, 1000000 // len(parties))
+    # Sparse, as only the numbers of seats near the distribution ever have samples, of format {n_seats: weight}
+    histograms = [{} for _ in parties]
+
+    for start in assignment._with_deadline(range(0, samples, chunk_size), deadline, check_every=1):
+        sample_weights = _perturb(weights, min(chunk_size, samples - start), model, scale, rng)
+
+        if method in assignment.DIVISOR_METHODS: seats, tie_shares = _divisor_samples(sample_weights, assignment.DIVISOR_METHODS[method], num_seats)
+        else: seats, tie_shares = _hare_niemeyer_samples(sample_weights, num_seats)
+
+        # A party with a tie share p has its seats with probability 1 - p, and one seat more with probability p
+        for p in range(len(parties)):
+            n_seats, index = np.unique(np.concatenate([seats[:, p], seats[:, p] + 1]), return_inverse=True)
+            counts = np.bincount(index, weights=np.concatenate([1 - tie_shares[:, p], tie_shares[:, p]]))
+            for n, x in zip(n_seats.tolist(), counts.tolist()): histograms[p][n] = histograms[p].get(n, 0) + x
+
+    out = {'distribution': distribution.to_dict(), 'parties': {}, 'samples': samples}
+
+    for p, party in enumerate(parties):
+        probabilities = {n: x / samples for n, x in sorted(histograms[p].items()) if x > 0}
+        p_gain = sum((x for n, x in probabilities.items() if n > upper[p]), 0.0)
+        p_lose = sum((x for n, x in probabilities.items() if n < lower[p]), 0.0)
+        out['parties'][party] = {'seats': probabilities,
+                                 'mean_seats': sum((n * x for n, x in probabilities.items()), 0.0),
+                                 'p_gain': p_gain, 'p_lose': p_lose, 'p_change': p_gain + p_lose}
+
+    return out
+
+def estimate_robustness_cost(n_parties: int, num_seats: int, samples: int) -> int:
+    """Estimates the cost of robustness in the units of assignment.estimate_cost, ie. roughly 0.1 microseconds."""
+
+    # About 2 log2(num_seats) + 20 bisection steps on each entry of the samples, the counts of each party in each chunk
+    # (see robustness), and the divisors of the seats
+    n_chunks = -(-samples // max(1, 1000000 // n_parties))
+    return samples * n_parties * (8 * int(num_seats).bit_length() + 80) + n_chunks * n_parties * 200 + num_seats * 10
+
+def _perturb(weights: np.ndarray, n_samples: int, model: str, scale: float, rng: np.random.Generator) -> np.ndarray:
+    """Draws an int64 array of shape (n_samples, P) of perturbed votes, see robustness."""
+
+    if model == 'uniform': factors = rng.uniform(1 - scale / 100, 1 + scale / 100, (n_samples, len(weights)))
+    elif model == 'normal': factors = rng.normal(1, scale / 100, (n_samples, len(weights)))
+    else: raise ValueError(f"Unknown perturbation model: Expected one of {PERTURBATION_MODELS} but got {model}")
+
+    sample_weights = np.maximum(np.rint(weights * factors), 0).astype(np.int64)
+    sample_weights[sample_weights.sum(axis=1) == 0] = weights
+
+    return sample_weights
+
+def _divisor_samples(weights: np.ndarray, divisor_method: 'assignment.DivisorMethod', num_seats: int, max_steps: int = 100) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Applies a divisor method to each row of a matrix of votes at once, on assignment._divisor_rows. Quotients are
+    compared as float64 there, so a row is only taken as is if its lowest quotient with a seat is clearly above its
+    highest quotient without one. The few rows that are tied, close to a tie, or not resolved in max_steps steps are
+    computed exactly with assignment.assign_iterative.
+    :param weights: an int64 array of shape (N, P) with the votes of each party in each sample
+    :return: an int array of shape (N, P) with the seats of each party that are certain, and a float array of shape
+    (N, P) with the probability that each party wins one of the tied seats
+    """
+
+    n_rows, n_parties = weights.shape
+    divisors = divisor_method.divisors(num_seats + 1).astype(np.float64)
+    quotient_weights = weights.astype(np.float64) ** divisor_method.power
+
+    _, _, _, seats = assignment._divisor_rows(quotient_weights, divisors, np.full(n_rows, num_seats), max_steps)
+
+    # Lowest quotient with a seat resp. highest without one, in each row
+    with np.errstate(divide='ignore', invalid='ignore'):
+        assigned = np.where(seats > 0, quotient_weights / divisors[np.maximum(seats - 1, 0)], np.inf).min(axis=1)
+        unassigned = np.where(quotient_weights > 0, quotient_weights / divisors[np.minimum(seats, num_seats)], 0).max(axis=1)
+
+    exact = (seats.sum(axis=1) != num_seats) | ~(assigned > unassigned * (1 + 1e-9))
+    tie_shares = np.zeros((n_rows, n_parties))
+
+    for row in np.flatnonzero(exact):
+        votes = dict(enumerate(weights[row].tolist()))
+        distribution = assignment.iterative_result(votes, num_seats, divisor_method, False, False).distribution
+        seats[row], tie_shares[row] = _lower_seats_and_tie_shares(distribution, num_seats)
+
+    return seats, tie_shares
+
+def _hare_niemeyer_samples(weights: np.ndarray, num_seats: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Applies the Hare/Niemeyer Method to each row of a matrix of votes at once, on assignment._hare_niemeyer_kernel, or
+    row by row on exact Fractions if the quotas would overflow int64.
+    :return: the same as _divisor_samples
+    """
+
+    if assignment._hare_niemeyer_fits_int64([int(weights.sum(axis=1).max()), int(weights.max())], num_seats):
+        seats, ambigs, _ = assignment._hare_niemeyer_kernel(weights, np.full(len(weights), num_seats, dtype=np.int64))
+        tie_shares = ambigs * ((num_seats - seats.sum(axis=1)) / np.maximum(ambigs.sum(axis=1), 1))[:, None]
+        return seats, tie_shares
+
+    seats, tie_shares = np.zeros(weights.shape, dtype=np.int64), np.zeros(weights.shape)
+    for row in range(len(weights)):
+        distribution = assignment._hare_niemeyer_distribution(dict(enumerate(weights[row].tolist())), num_seats)
+        seats[row], tie_shares[row] = _lower_seats_and_tie_shares(distribution, num_seats)
+
+    return seats, tie_shares
+
+def _lower_seats_and_tie_shares(distribution: Distribution, num_seats: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Splits a distribution into the certain seats of each party and its probability to win one of the tied seats."""
+
+    ambiguous = distribution.ambiguous_parties()
+    tie_shares = np.zeros(len(distribution.seats))
+    if ambiguous: tie_shares[ambiguous] = (num_seats - sum(distribution.seats)) / len(ambiguous)
+
+    return np.array(distribution.seats), tie_shares
@@ -0,0 +1,223 @@
+import heapq
+import numpy as np
+from itertools import count, islice
+from math import isqrt
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+import assignment
+
+def sensitivity(votes: Mapping[str, int], method: str, num_seats: int, deadline: Optional[float] = None) -> Dict[str, Dict]:
+    """
+    Computes, for each party, the smallest change of its votes (the votes of all other parties staying the same) which
+    certainly gains or loses it a seat at the given number of seats. A party certainly has at least k seats if k is
+    the lower bound of its seats, ie. if it does not depend on a tie, and certainly gains (loses) a seat if its lower
+    (upper) bound of seats moves past its current upper (lower) bound.
+    For divisor methods, the thresholds are computed analytically from the quotients of the other parties around the
+    current distribution. For Hare/Niemeyer, all quotas depend on the total, so the thresholds are bisected on the
+    exact single distribution, in which a party's seats never decrease with its votes.
+    :param votes: the number of votes each party received in a mapping of format {party_name: votes}
+    :param method: one of the assignment methods, see assignment.assign
+    :param num_seats: the number of seats the thresholds refer to
+    :param deadline: optionally a time.monotonic() value, after which the computation is cancelled by DeadlineExceeded
+    :return: A dict containing
+        (1) 'distribution', the current distribution, as returned by the assignment method
+        (2) 'thresholds', a dict of format {party_name: {'votes_to_gain': int, 'votes_to_lose': int}}, where
+            votes_to_gain is the number of additional votes needed to certainly gain a seat, votes_to_lose the number
+            of votes it takes to certainly lose one, and either is None if not possible (eg. losing a seat with 0 seats)
+    """
+
+    distribution = assignment.assign_result({'votes': votes, 'method': method, 'num_of_seats': num_seats, 'return_sequence': False}, deadline).distribution
+    lower, upper = list(distribution.seats), distribution.upper()
+
+    if method in assignment.DIVISOR_METHODS:
+        thresholds = _divisor_thresholds(list(votes.values()), assignment.DIVISOR_METHODS[method], num_seats, lower, upper, deadline)
+    else:
+        thresholds = _hare_niemeyer_thresholds(votes, num_seats, lower, upper, deadline)
+
+    return {'distribution': distribution.to_dict(),
+            'thresholds': {party: {'votes_to_gain': gain, 'votes_to_lose': lose} for party, (gain, lose) in zip(votes.keys(), thresholds)}}
+
+def estimate_sensitivity_cost(n_parties: int, method: str) -> int:
+    """Estimates the cost of sensitivity in the units of assignment.estimate_cost, ie. roughly 0.1 microseconds."""
+
+    # The distribution, and for divisor methods a walk along some quotients for each party, while Hare/Niemeyer bisects
+    # all parties at once on a matrix of the votes with one party's votes changed in each row
+    if method in assignment.DIVISOR_METHODS: return 64 * n_parties + 500 * n_parties
+    return 64 * n_parties + 8 * n_parties ** 2
+
+def _divisor_thresholds(votes: List[int], divisor_method: 'assignment.DivisorMethod', num_seats: int, lower: List[int], upper: List[int], deadline: Optional[float] = None) -> List[Tuple[Optional[int], Optional[int]]]:
+    """
+    Computes the thresholds of sensitivity for a divisor method. With the quotients of all other parties sorted in
+    descending order as q_1, q_2, ..., a party certainly gets at least k seats iff its k-th quotient x**power/d(k-1) is
+    greater than q_(num_seats-k+1), and possibly gets k seats iff it is not less. The quotients q_m needed are close to
+    the lowest quotient that got a seat, so they are found by walking down resp. up from the current distribution,
+    along the quotients of all parties, which are shared by all parties.
+    """
+
+    divisor, power = divisor_method.divisor, divisor_method.power
+    weights = [x ** power for x in votes]
+    n_assigned_all = sum(lower)
+
+    # Enough quotients for all parties unless they depend on many quotients of a single party, see quotient below
+    depth = num_seats - n_assigned_all + 2
+    assigned = list(islice(_assigned_quotients(weights, lower, divisor), depth + 1))
+    unassigned = list(islice(_unassigned_quotients(weights, lower, divisor), depth + 1))
+
+    thresholds = []
+
+    for i, weight in assignment._with_deadline(enumerate(votes), deadline, check_every=64):
+        if len(weights) == 1:
+            thresholds.append((None, None)) # The only party always gets all seats
+            continue
+
+        n_assigned = n_assigned_all - lower[i]
+
+        def quotient(m: int) -> Tuple[int, int]:
+            # The m-th highest quotient of the other parties as (weight, divisor)
+            if m <= n_assigned: index, shared, generate = n_assigned - m, assigned, _assigned_quotients
+            else: index, shared, generate = m - n_assigned - 1, unassigned, _unassigned_quotients
+
+            others = [q for q in shared if q[2] != i]
+            if index < len(others) or len(shared) < depth + 1: return others[index][:2]
+
+            others_weights = [w if j != i else 0 for j, w in enumerate(weights)]
+            others_seats = [s if j != i else 0 for j, s in enumerate(lower)]
+            return next(islice((q for q in generate(others_weights, others_seats, divisor) if q[2] != i), index, None))[:2]
+
+        gain = None
+        k = upper[i] + 1
+        if k <= num_seats:
+            w, d = quotient(num_seats - k + 1)
+            if d > 0: gain = _integer_root(w * divisor(k-1) // d, power) + 1 - weight # Smallest x with x**power/d(k-1) > w/d
+
+        lose = None
+        k = lower[i]
+        if k > 0:
+            w, d = quotient(num_seats - k + 1)
+            if divisor(k-1) == 0: highest = 0 if w > 0 else -1 # Any votes give an infinite quotient
+            elif w > 0: highest = _integer_root(-(-w * divisor(k-1) // d) - 1, power) # Highest x with x**power/d(k-1) < w/d
+            else: highest = -1
+            if highest >= 0: lose = weight - highest
+
+        thresholds.append((gain, lose))
+
+    return thresholds
+
+def _assigned_quotients(weights: List[int], seats: List[int], divisor: Callable[[int], int]) -> Iterator[Tuple[int, int, int]]:
+    """Generates the quotients (weight, divisor, party) that got a seat, in ascending order."""
+
+    sequences = [_quotients(w, divisor, range(n_seats - 1, -1, -1), p) for p, (w, n_seats) in enumerate(zip(weights, seats))]
+    return heapq.merge(*sequences, key=_QuotientKey)
+
+def _unassigned_quotients(weights: List[int], seats: List[int], divisor: Callable[[int], int]) -> Iterator[Tuple[int, int, int]]:
+    """Generates the quotients (weight, divisor, party) that did not get a seat, in descending order."""
+
+    sequences = [_quotients(w, divisor, count(n_seats), p) for p, (w, n_seats) in enumerate(zip(weights, seats))]
+    return heapq.merge(*sequences, key=_QuotientKey, reverse=True)
+
+def _quotients(weight: int, divisor: Callable[[int], int], seat_numbers: Iterable[int], party: int) -> Iterator[Tuple[int, int, int]]:
+    """Generates the quotients (weight, divisor, party) of a party for the given numbers of seats it already has."""
+
+    for s in seat_numbers:
+        d = divisor(s)
+        yield weight, d if weight or d else 1, party # 0/0 is 0, as in assignment._Quotient
+
+def _integer_root(n: int, power: int) -> int:
+    """Returns the largest integer x with x**power <= n, for n >= 0."""
+
+    if power == 1: return n
+    if power == 2: return isqrt(n)
+
+    x = int(round(n ** (1 / power)))
+    while x ** power > n: x -= 1
+    while (x + 1) ** power <= n: x += 1
+    return x
+
+class _QuotientKey:
+    """Sort key comparing quotients (weight, divisor, party) exactly by integer cross-multiplication."""
+
+    __slots__ = ('weight', 'divisor')
+
+    def __init__(self, quotient: Tuple[int, int, int]):
+        self.weight, self.divisor, _ = quotient
+
+    def __lt__(self, other: '_QuotientKey') -> bool:
+        return self.weight * other.divisor < other.weight * self.divisor
+
+def _hare_niemeyer_thresholds(votes: Mapping[str, int], num_seats: int, lower: List[int], upper: List[int], deadline: Optional[float] = None) -> List[Tuple[Optional[int], Optional[int]]]:
+    """
+    Computes the thresholds of sensitivity for Hare/Niemeyer by bisection on the votes of each party. Once a party has
+    more than 2 * num_seats times the votes of all others, it certainly gets all seats, and if it has (k/(num_seats-k))
+    times their votes, its quota alone certainly gets it k seats.
+    """
+
+    weights = list(votes.values())
+    total = sum(weights)
+    thresholds = [[None, None] for _ in weights]
+
+    # Smallest x with certainly upper[i] + 1 seats
+    gaining = [i for i in range(len(weights)) if upper[i] < num_seats]
+    bounds = [(weights[i], _hare_niemeyer_votes_for(upper[i] + 1, total - weights[i], num_seats)) for i in gaining]
+    for i, x in zip(gaining, _hare_niemeyer_bisect(votes, num_seats, gaining, bounds, [upper[i] + 1 for i in gaining], 0, deadline)):
+        thresholds[i][0] = x - weights[i]
+
+    # Smallest x with possibly lower[i] seats, if not 0. Without the votes of others, any votes get all seats
+    losing = [i for i in range(len(weights)) if lower[i] > 0 and total > weights[i]]
+    bounds = [(-1, weights[i]) for i in losing]
+    for i, x in zip(losing, _hare_niemeyer_bisect(votes, num_seats, losing, bounds, [lower[i] for i in losing], 1, deadline)):
+        if x > 0: thresholds[i][1] = weights[i] - x + 1
+
+    return [tuple(x) for x in thresholds]
+
+def _hare_niemeyer_votes_for(n_seats: int, others_votes: int, num_seats: int) -> int:
+    """Returns a number of votes which certainly gets n_seats seats against the votes of all other parties."""
+
+    if n_seats == num_seats: return 2 * num_seats * others_votes + 1
+    return -(-n_seats * others_votes // (num_seats - n_seats))
+
+def _hare_niemeyer_bisect(votes: Mapping[str, int], num_seats: int, parties: List[int], bounds: List[Tuple[int, int]], targets: List[int], bound: int, deadline: Optional[float] = None) -> List[int]:
+    """
+    Finds for each of the parties the smallest number of votes x in (lo, hi] such that its lower (bound=0) or upper
+    (bound=1) bound of seats reaches its target, given that it does at hi and does not at lo. All parties are bisected
+    at once, with each row of the votes passed to _hare_niemeyer_kernel being the votes with one party's votes changed,
+    unless the quotas would overflow int64, in which case the parties are bisected one by one on exact Fractions.
+    """
+
+    weights = list(votes.values())
+    parties_names = list(votes.keys())
+    lo, hi = [x[0] for x in bounds], [x[1] for x in bounds]
+    if not parties: return []
+
+    int64_max = np.iinfo(np.int64).max
+    if num_seats * (sum(weights) + max(hi)) > int64_max:
+
+        def reached(r: int, x: int) -> bool:
+            party = parties_names[parties[r]]
+            seats = assignment.single_distribution_hare_niemeyer(dict(votes, **{party: x}), num_seats)['seats'][party]
+            return (seats[bound] if type(seats) == list else seats) >= targets[r]
+
+        for r in assignment._with_deadline(range(len(parties)), deadline, check_every=1):
+            while hi[r] - lo[r] > 1:
+                mid = (lo[r] + hi[r]) // 2
+                if reached(r, mid): hi[r] = mid
+                else: lo[r] = mid
+
+        return hi
+
+    rows = np.arange(len(parties))
+    matrix = np.tile(np.array(weights, dtype=np.int64), (len(parties), 1))
+    lo, hi, targets = np.array(lo, dtype=np.int64), np.array(hi, dtype=np.int64), np.array(targets)
+
+    for _ in assignment._with_deadline(count(), deadline, check_every=1):
+        if not np.any(hi - lo > 1): break
+
+        mid = (lo + hi) // 2
+        matrix[rows, parties] = mid
+        seats, ambigs, _ = assignment._hare_niemeyer_kernel(matrix, np.full(len(parties), num_seats, dtype=np.int64))
+        is_reached = seats[rows, parties] + bound * ambigs[rows, parties] >= targets
+
+        done = hi - lo <= 1
+        hi = np.where(is_reached & ~done, mid, hi)
+        lo = np.where(~is_reached & ~done, mid, lo)
+
+    return hi.tolist()
@@ -0,0 +1,45 @@
+import json
+from typing import Any, Iterator
+
+# Compact separators, as used by Flask when serializing a response that is not streamed
+_SEPARATORS = (',', ':')
+
+def stream_json(value: Any, chunk_size: int = 65536) -> Iterator[str]:
+    """
+    Encodes an output of assignment.assign_lazy or comparison.compare_lazy as JSON, in chunks of about chunk_size
+    characters, so it can be sent as a chunked response while the generators in it are still producing rows.
+    Dicts are encoded key by key, iterators as arrays one element at a time, and functions are called once they are
+    reached (see tables.lazy_table); everything else, including the elements of iterators, is passed to json.dumps.
+    """
+
+    chunk, length = [], 0
+
+    for piece in _iter_json(value):
+        chunk.append(piece)
+        length += len(piece)
+
+        if length >= chunk_size:
+            yield ''.join(chunk)
+            chunk, length = [], 0
+
+    if chunk: yield ''.join(chunk)
+
+def _iter_json(value: Any) -> Iterator[str]:
+
+    if callable(value): value = value()
+
+    if isinstance(value, dict):
+        yield '{'
+        for i, (key, item) in enumerate(value.items()):
+            yield (',' if i else '') + json.dumps(key) + ':'
+            yield from _iter_json(item)
+        yield '}'
+
+    elif isinstance(value, Iterator):
+        yield '['
+        for i, item in enumerate(value):
+            yield (',' if i else '') + json.dumps(item, separators=_SEPARATORS)
+        yield ']'
+
+    else:
+        yield json.dumps(value, separators=_SEPARATORS)
@@ -0,0 +1,149 @@
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple, Union
+
+# Formats in which the table of distributions from 1 up to the requested number of seats can be returned:
+#   'rows': a list of distributions, one per number of seats, each of format {'seats': {...}, 'is_ambiguous': bool}
+#   'columnar': {'parties': [...], 'seats': [[n_seats per party] per row], 'ambiguities': [...]}
+#   'delta': {'parties': [...], 'changes': [[[party_index, seat_change], ...] per row], 'ambiguities': [...]}
+# In 'columnar' and 'delta', seats are the lower bound of each party's seats, and 'ambiguities' lists ranges of rows
+# of format {'rows': [first_row, last_row], 'parties': [party_index, ...]} in which these parties may get one seat more.
+# Rows are numbered by their number of seats, ie. starting at 1.
+TABLE_FORMATS = ['rows', 'columnar', 'delta']
+
+# A table row as produced by the assignment methods: the (lower bound of the) seats of each party, the indices of the
+# parties that may get one seat more, and the changes of the seats compared to the previous row as (party_index, change)
+TableRow = Tuple[Sequence[int], Sequence[int], Sequence[Tuple[int, int]]]
+
+def build_table(parties: List[str], rows: Iterable[TableRow], table_format: str = 'rows') -> Union[List[Dict], Dict]:
+    """
+    Builds the table returned by the assignment methods in the given format directly from the rows the method produces,
+    without building the 'rows' format first.
+    :param parties: the party names, in the order the rows refer to them by index
+    :param rows: the rows of the table, see TableRow. The seats lists of rows may be reused by the producer afterwards
+    :param table_format: one of TABLE_FORMATS
+    :return: the table in the given format
+    """
+
+    table = lazy_table(parties, rows, table_format)
+
+    if table_format == 'rows': return list(table)
+
+    key = 'seats' if table_format == 'columnar' else 'changes'
+    entries = list(table[key]) # Consuming the rows fills the ambiguities
+
+    return {'parties': table['parties'], key: entries, 'ambiguities': table['ambiguities']()}
+
+def lazy_table(parties: List[str], rows: Iterable[TableRow], table_format: str = 'rows') -> Union[Iterator[Dict], Dict]:
+    """
+    Like build_table, but consumes the rows only while the table is read, so it can be streamed (see streaming.py): the
+    part of the table with one entry per row is a generator, and 'ambiguities' is a function that returns the ranges
+    of ambiguous rows once that generator is exhausted.
+    """
+
+    if table_format == 'rows':
+        return (_distribution_row(parties, seats, ambiguous) for seats, ambiguous, _ in rows)
+
+    if table_format not in TABLE_FORMATS:
+        raise ValueError(f"Unknown table format: Expected one of {TABLE_FORMATS} but got {table_format}")
+
+    ambiguities = []
+
+    def row_entries():
+        for row, (seats, ambiguous, changes) in enumerate(rows, 1):
+            if ambiguous: _add_ambiguity_range(ambiguities, row, ambiguous)
+            if table_format == 'columnar': yield list(seats)
+            else: yield [[p, change] for p, change in changes]
+
+    key = 'seats' if table_format == 'columnar' else 'changes'
+
+    return {'parties': list(parties), key: row_entries(), 'ambiguities': lambda: ambiguities}
+
+def _distribution_row(parties: List[str], seats: Sequence[int], ambiguous: Sequence[int]) -> Dict:
+    """Formats a row of a table as a distribution of format {'seats': {...}, 'is_ambiguous': bool}."""
+
+    row_seats = dict(zip(parties, seats))
+    for p in ambiguous: row_seats[parties[p]] = [seats[p], seats[p] + 1]
+
+    return {'seats': row_seats, 'is_ambiguous': len(ambiguous) > 0}
+
+def _add_ambiguity_range(ambiguities: List[Dict], row: int, ambiguous: Sequence[int]):
+    """
+    Adds an ambiguous row to the ranges of ambiguous rows, extending the last range if it ends in the previous row and
+    has the same ambiguous parties.
+    """
+
+    ambiguous = list(ambiguous)
+    if ambiguities and ambiguities[-1]['rows'][1] == row - 1 and ambiguities[-1]['parties'] == ambiguous:
+        ambiguities[-1]['rows'][1] = row
+    else:
+        ambiguities.append({'rows': [row, row], 'parties': ambiguous})
+
+def iter_table_rows(table: Union[List[Dict], Dict], table_format: str = 'rows') -> Iterator[Dict]:
+    """
+    Decodes a table returned by build_table back into distributions of format {'seats': {...}, 'is_ambiguous': bool},
+    one row at a time, so tables in any format can be compared without holding the 'rows' format in memory.
+    """
+
+    if table_format == 'rows':
+        yield from table
+        return
+
+    for seats, ambiguous, _ in decode_table(table, table_format):
+        yield _distribution_row(table['parties'], seats, ambiguous)
+
+def decode_table(table: Union[List[Dict], Dict], table_format: str = 'rows', with_changes: bool = False) -> Iterator[TableRow]:
+    """
+    Decodes a table returned by build_table back into the rows it was built from (see TableRow), one row at a time.
+    :param with_changes: whether or not to compute the changes of each row compared to the previous one, which 'delta'
+    tables contain anyway (else left empty)
+    """
+
+    if table_format == 'rows':
+        yield from rows_from_distributions(table, with_changes)
+        return
+
+    parties = table['parties']
+    ambiguity_ranges = iter(table['ambiguities'])
+    next_range = next(ambiguity_ranges, None)
+    previous_seats = [0 for _ in parties]
+
+    if table_format == 'columnar': seat_rows = table['seats']
+    else: seat_rows = _accumulate_changes(len(parties), table['changes'])
+
+    for row, seats in enumerate(seat_rows, 1):
+
+        while next_range is not None and next_range['rows'][1] < row: next_range = next(ambiguity_ranges, None)
+        ambiguous = next_range['parties'] if next_range is not None and next_range['rows'][0] <= row else ()
+
+        changes = ()
+        if table_format == 'delta': changes = table['changes'][row-1]
+        elif with_changes:
+            changes = [(p, x - previous_seats[p]) for p, x in enumerate(seats) if x != previous_seats[p]]
+            previous_seats = seats
+
+        yield seats, ambiguous, changes
+
+def rows_from_distributions(distributions: Iterable[Dict], with_changes: bool = False) -> Iterator[TableRow]:
+    """Turns distributions of format {'seats': {...}, 'is_ambiguous': bool} into rows of a table (see TableRow)."""
+
+    previous_seats = None
+
+    for distribution in distributions:
+        values = list(distribution['seats'].values())
+        seats = [x[0] if type(x) == list else x for x in values]
+        ambiguous = [p for p, x in enumerate(values) if type(x) == list]
+
+        changes = ()
+        if with_changes:
+            if previous_seats is None: previous_seats = [0 for _ in seats]
+            changes = [(p, x - previous_seats[p]) for p, x in enumerate(seats) if x != previous_seats[p]]
+            previous_seats = seats
+
+        yield seats, ambiguous, changes
+
+def _accumulate_changes(n_parties: int, changes: List[List[List[int]]]) -> Iterator[List[int]]:
+    """Generates the seats of each row of a 'delta' table from its changes."""
+
+    seats = [0 for _ in range(n_parties)]
+    for row_changes in changes:
+        for p, change in row_changes: seats[p] += change
+        yield seats
@@ -0,0 +1,132 @@
+import time
+
+import pytest
+
+import app as app_module
+from admission import AdmissionControl, AdmissionRejected
+from app import app
+from assignment import DeadlineExceeded, assign
+from batch import assign_many
+from cache import AssignmentCache
+from comparison import compare, compare_many
+from sensitivity import sensitivity
+
+input = {'votes': {'A': 6, 'B': 4, 'C': 2, 'D': 2}, 'method': 'dhondt', 'num_of_seats': 1000, 'return_table': True}
+
+def test_cheap_requests_are_admitted_without_deadline():
+
+    admission = AdmissionControl(cost_threshold=100, slots=0)
+
+    with admission.admit(100) as deadline:
+        assert deadline is None
+
+def test_expensive_requests_get_deadline_and_slot():
+
+    admission = AdmissionControl(cost_threshold=100, slots=1, queue_size=1, deadline=1.1, cost_rate=1000)
+
+    with admission.admit(1000) as deadline:
+        assert 1 < deadline - time.monotonic() <= 1.1
+
+        with pytest.raises(AdmissionRejected) as e: admission.admit(1000) # Waits for 0.1 seconds at most
+        assert e.value.status == 503
+
+    with admission.admit(1000): pass # The slot was released
+
+def test_rejections():
+
+    admission = AdmissionControl(cost_threshold=100, slots=1, queue_size=0, deadline=10, cost_rate=1000)
+
+    with pytest.raises(AdmissionRejected) as e: admission.admit(100000)
+    assert e.value.status == 503
+
+    with admission.admit(1000): # Occupies the only slot, and there is no queue
+        with pytest.raises(AdmissionRejected) as e: admission.admit(1000)
+        assert e.value.status == 429 and e.value.retry_after == 1
+
+@pytest.mark.parametrize("method", ['dhondt', 'schepers', 'hare'])
+@pytest.mark.parametrize("table_format", ['rows', 'columnar', 'delta'])
+def test_deadline_cancels_assignment(method, table_format):
+
+    params = dict(input, method=method, table_format=table_format)
+
+    with pytest.raises(DeadlineExceeded): assign(params, time.monotonic() - 1)
+    with pytest.raises(DeadlineExceeded): AssignmentCache().assign(params, time.monotonic() - 1)
+    assert assign(params, time.monotonic() + 60) == assign(params)
+
+def test_deadline_in_batch():
+
+    assert assign_many([input], deadline=time.monotonic() - 1)[0][0] == 503
+
+def test_deadline_in_compare_and_sensitivity():
+
+    scenarios = [{'votes': input['votes'], 'method': 'dhondt'}, {'votes': input['votes'], 'method': 'hare'}]
+
+    with pytest.raises(DeadlineExceeded): compare(scenarios[0], scenarios[1], 1000, deadline=time.monotonic() - 1)
+    with pytest.raises(DeadlineExceeded): compare_many(scenarios, 1000, deadline=time.monotonic() - 1)
+    for method in ['dhondt', 'hare']:
+        with pytest.raises(DeadlineExceeded): sensitivity(input['votes'], method, 10, time.monotonic() - 1)
+
+def test_route_rejections(monkeypatch):
+
+    monkeypatch.setattr(app_module, 'admission', AdmissionControl(cost_threshold=1000, slots=1, queue_size=0, deadline=0.01, cost_rate=10**10))
+    ticket = app_module.admission.admit(10**6) # Occupies the only slot
+
+    client = app.test_client()
+    response = client.post('/azur', json=input)
+    assert response.status_code == 429 and 'Retry-After' in response.headers
+    assert client.post('/azur_batch', json={'scenarios': [input, input]}).status_code == 429
+    assert client.post('/azur', json=dict(input, num_of_seats=10, return_table=False)).status_code == 200 # Cheap
+
+    compare_input = {'dist_A': {'votes': input['votes'], 'method': 'dhondt'}, 'dist_B': {'votes': input['votes'], 'method': 'hare'}, 'num_of_seats': 1000}
+    assert client.post('/azur_compare', json=compare_input).status_code == 429
+    assert client.post('/azur_compare', json=dict(compare_input, stream=True)).status_code == 429
+    assert client.post('/azur_compare', json={'scenarios': [compare_input['dist_A']] * 3, 'num_of_seats': 1000}).status_code == 429
+    many_parties = {'votes': {f'P{i}': i + 1 for i in range(1000)}, 'method': 'hare', 'num_of_seats': 10}
+    assert client.post('/azur_sensitivity', json=many_parties).status_code == 429
+
+    ticket.release()
+    response = client.post('/azur', json=dict(input, num_of_seats=1000000))
+    assert response.status_code == 503 # Cancelled by the deadline
+    assert 'deadline' in response.get_json()['message']
+
+def test_costly_pages_are_admitted(monkeypatch):
+
+    monkeypatch.setattr(app_module, 'admission', AdmissionControl(cost_threshold=5000000, slots=1, queue_size=0, deadline=0.01, cost_rate=10**10))
+    ticket = app_module.admission.admit(10**8) # Occupies the only slot
+
+    # Cheap assignments, but each entry of a page of seats ranks the quotients of all parties
+    votes = {f'P{i}': 1000 + i for i in range(1000)}
+    quotients_input = {'votes': votes, 'method': 'huntington_hill', 'num_of_seats': 10, 'return_quotients': True, 'quotient_seats': [990, 999]}
+    outcomes_input = {'votes': {f'P{i}': 1 for i in range(1000)}, 'method': 'hare', 'num_of_seats': 500, 'return_outcomes': True}
+
+    client = app.test_client()
+    assert client.post('/azur', json=dict(quotients_input, return_quotients=False)).status_code == 200
+    assert client.post('/azur', json=quotients_input).status_code == 429
+    assert app_module.assignment_cost(outcomes_input) > app_module.assignment_cost(dict(outcomes_input, return_outcomes=False)) + 1000 * 1000
+
+    ticket.release()
+    response = client.post('/azur', json=quotients_input)
+    assert response.status_code == 503 and 'deadline' in response.get_json()['message']
+
+def test_stream_releases_slot_on_error(monkeypatch):
+
+    monkeypatch.setattr(app_module, 'admission', AdmissionControl(cost_threshold=1000, slots=1, queue_size=0, deadline=10, cost_rate=10**10))
+    def fail(input): raise RuntimeError()
+    monkeypatch.setattr(app_module, 'assign_lazy', fail)
+
+    assert app.test_client().post('/azur', json=dict(input, stream=True)).status_code == 500
+    with app_module.admission.admit(10**6): pass # The slot was released
+
+def test_stream_deadline():
+
+    admission = AdmissionControl(cost_threshold=100, slots=1, queue_size=0, deadline=0.2, cost_rate=10**10)
+    chunks = admission.admit(1000).stream(str(i) for i in range(10**9))
+
+    # A stalled client does not hold the slot past the deadline
+    assert next(chunks) == '0'
+    with pytest.raises(AdmissionRejected): admission.admit(1000)
+    time.sleep(0.3)
+    with admission.admit(1000): pass
+
+    # The response is cut off at the deadline
+    assert len(list(chunks)) == 0
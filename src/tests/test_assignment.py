@@ -2,7 +2,9 @@ import pytest
 import csv
 import ast
 
-from assignment import dhondt, schepers, hare_niemeyer
+from fractions import Fraction
+
+from assignment import DIVISOR_METHODS, METHODS, DivisorMethod, assign, assign_iterative, dhondt, schepers, hare_niemeyer, register_method, single_distribution_hare_niemeyer, _single_distribution_hare_niemeyer_fractions
 
 def read_vals():
     '''
@@ -125,6 +127,16 @@ def test_dhondt_distribution_values(params):
     
     assert True
 
+@pytest.mark.parametrize('params', tests['dhondt'])    
+def test_dhondt_fast_start_distribution_values(params):
+
+    if params['out_distribution'] is not None:
+        output = dhondt(params['votes'], params['num_of_seats'], False, False)
+        assert output['distribution'] == params['out_distribution']
+        assert 'assignment_sequence' not in output
+    
+    assert True
+
 @pytest.mark.parametrize('params', tests['dhondt'])  
 def test_dhondt_sequence_values(params):
     
@@ -195,6 +207,16 @@ def test_schepers_distribution_values(params):
     
     assert True
 
+@pytest.mark.parametrize('params', tests['schepers'])    
+def test_schepers_fast_start_distribution_values(params):
+
+    if params['out_distribution'] is not None:
+        output = schepers(params['votes'], params['num_of_seats'], False, False)
+        assert output['distribution'] == params['out_distribution']
+        assert 'assignment_sequence' not in output
+    
+    assert True
+
 @pytest.mark.parametrize('params', tests['schepers'])  
 def test_schepers_sequence_values(params):
     
@@ -233,6 +255,123 @@ def test_hare_distribution_values(params):
 
     assert output['distribution'] == params['out_distribution']
 
+@pytest.mark.parametrize('params', tests['hare'])
+def test_hare_table_values(params):
+
+    output = hare_niemeyer(params['votes'], params['num_of_seats'], True)
+
+    assert len(output['table']) == params['num_of_seats']
+    assert output['distribution'] == params['out_distribution']
+    assert all(output['table'][x-1] == single_distribution_hare_niemeyer(params['votes'], x) for x in range(1, params['num_of_seats']+1))
+
+@pytest.mark.parametrize('params', tests['hare'])
+def test_hare_kernel_matches_fractions(params):
+
+    output = single_distribution_hare_niemeyer(params['votes'], params['num_of_seats'])
+
+    assert output == _single_distribution_hare_niemeyer_fractions(params['votes'], params['num_of_seats'])
+
+def test_hare_int64_overflow_fallback():
+
+    output = single_distribution_hare_niemeyer({'A': 10**19, 'B': 10**19, 'C': 1}, 3)
+
+    assert output == {'seats': {'A': [1, 2], 'B': [1, 2], 'C': 0}, 'is_ambiguous': True}
+
+def reference_divisor_distribution(votes, divisor, power, num_seats):
+    '''
+    Distribution of a divisor method by ranking the quotients of all parties as Fractions, for votes above 0: the seats
+    go to the quotients above the num_seats-th highest one, and to those equal to it if they all fit
+    '''
+
+    quotients = [(Fraction(x ** power, divisor(s)) if divisor(s) > 0 else float('inf'), party)
+                 for party, x in votes.items() for s in range(num_seats + 1)]
+    lowest = sorted([q for q, _ in quotients], reverse=True)[num_seats - 1]
+
+    above = {party: sum(1 for q, p in quotients if p == party and q > lowest) for party in votes}
+    equal = {party: sum(1 for q, p in quotients if p == party and q == lowest) for party in votes}
+
+    if sum(above.values()) + sum(equal.values()) == num_seats:
+        return {party: above[party] + equal[party] for party in votes}
+    return {party: above[party] if equal[party] == 0 else [above[party], above[party] + equal[party]] for party in votes}
+
+reference_divisors = {
+    'dhondt': (lambda s: s + 1, 1),
+    'schepers': (lambda s: 2 * s + 1, 1),
+    'adams': (lambda s: s, 1),
+    'huntington_hill': (lambda s: s * (s + 1), 2),
+    'danish': (lambda s: 3 * s + 1, 1),
+    'imperiali': (lambda s: s + 2, 1),
+}
+
+@pytest.mark.parametrize('votes', [
+    {'A': 6, 'B': 4, 'C': 2, 'D': 2},
+    {'A': 1000, 'B': 310, 'C': 7},
+    {'A': 37, 'B': 37, 'C': 12, 'D': 1},
+    {'A': 5},
+])
+@pytest.mark.parametrize('method', reference_divisors.keys())
+@pytest.mark.parametrize('num_seats', [1, 2, 5, 17, 60])
+def test_divisor_methods_match_reference(votes, method, num_seats):
+
+    divisor, power = reference_divisors[method]
+    expected = reference_divisor_distribution(votes, divisor, power, num_seats)
+
+    for return_sequence in [True, False]: # With and without the fast start
+        output = assign({'votes': votes, 'method': method, 'num_of_seats': num_seats, 'return_sequence': return_sequence})
+        assert output['distribution']['seats'] == expected
+
+    table = assign({'votes': votes, 'method': method, 'num_of_seats': num_seats, 'return_table': True})['table']
+    assert [row['seats'] for row in table] == [reference_divisor_distribution(votes, divisor, power, x) for x in range(1, num_seats + 1)]
+
+@pytest.mark.parametrize('method', DIVISOR_METHODS.keys())
+def test_divisor_fast_start_matches_engine(method):
+
+    votes = {f'party_{i}': x for i, x in enumerate([982451, 15485863, 32452843, 7, 0, 15485863, 104729])}
+
+    for num_seats in [1, 6, 7, 100, 12345]:
+        sequential = assign({'votes': votes, 'method': method, 'num_of_seats': num_seats, 'return_sequence': True})
+        fast = assign({'votes': votes, 'method': method, 'num_of_seats': num_seats, 'return_sequence': False})
+        assert fast['distribution'] == sequential['distribution']
+
+def test_adams_ties_parties_without_seats():
+
+    # The first seat of each party with votes has an infinite quotient
+    output = assign({'votes': {'A': 100, 'B': 1, 'C': 1, 'D': 0}, 'method': 'adams', 'num_of_seats': 2})
+    assert output['distribution'] == {'seats': {'A': [0, 1], 'B': [0, 1], 'C': [0, 1], 'D': 0}, 'is_ambiguous': True}
+
+    output = assign({'votes': {'A': 100, 'B': 1, 'C': 1, 'D': 0}, 'method': 'adams', 'num_of_seats': 4})
+    assert output['distribution'] == {'seats': {'A': 2, 'B': 1, 'C': 1, 'D': 0}, 'is_ambiguous': False}
+
+def test_divisor_method_cache_grows():
+
+    method = DivisorMethod(lambda s: s * s + 2)
+
+    assert method.divisors(3).tolist() == [2, 3, 6]
+    assert method.divisors(10).tolist() == [s * s + 2 for s in range(10)]
+    assert method.divisors(2).tolist() == [2, 3]
+
+def test_register_method():
+
+    register_method('test_sainte_lague', DivisorMethod(lambda s: 2 * s + 1))
+    try:
+        assert 'test_sainte_lague' in METHODS
+        output = assign({'votes': {'A': 10, 'B': 4}, 'method': 'test_sainte_lague', 'num_of_seats': 3})
+        assert output == assign_iterative({'A': 10, 'B': 4}, 3, 0.5)
+    finally:
+        del METHODS['test_sainte_lague'], DIVISOR_METHODS['test_sainte_lague']
+
+def test_app_accepts_registered_methods():
+
+    from app import app
+
+    with app.test_client() as c:
+        for method in METHODS:
+            response = c.post('/azur', json={'votes': {'A': 10, 'B': 4}, 'method': method, 'num_of_seats': 3})
+            assert response.status_code == 200
+        response = c.post('/azur', json={'votes': {'A': 10, 'B': 4}, 'method': 'unknown', 'num_of_seats': 3})
+        assert response.status_code == 500
+        assert 'huntington_hill' in response.get_json()['message']
+
 # TODO tests:
 # - Länge Tabelle 
 # - Gesamtsitzzahl stimmt
@@ -0,0 +1,59 @@
+import os
+
+import batch
+from app import app
+from assignment import assign
+from batch import assign_many
+
+sample_inputs = [{'votes': {'A': 6, 'B': 4, 'C': 2, 'D': 2}, 'method': method, 'num_of_seats': 15, 'return_table': True}
+                 for method in ['dhondt', 'schepers', 'hare']]
+
+def test_assign_many_serial():
+
+    assert assign_many(sample_inputs) == [(200, assign(x)) for x in sample_inputs]
+
+def test_assign_many_parallel(monkeypatch):
+
+    monkeypatch.setattr(batch, 'PARALLEL_COST_THRESHOLD', 0)
+
+    assert assign_many(sample_inputs) == [(200, assign(x)) for x in sample_inputs]
+
+def test_pool_size(monkeypatch):
+
+    monkeypatch.delenv('AZUR_BATCH_WORKERS', raising=False)
+    monkeypatch.setenv('WEB_CONCURRENCY', str(os.cpu_count()))
+    assert batch._pool_size() == 1 # The cores are shared by the pools of all server processes
+
+    monkeypatch.delenv('WEB_CONCURRENCY')
+    assert batch._pool_size() == os.cpu_count()
+
+    monkeypatch.setenv('AZUR_BATCH_WORKERS', '3')
+    assert batch._pool_size() == 3
+
+def test_batch_route_keeps_order_and_errors():
+
+    scenarios = [sample_inputs[0], {'votes': {'A': 1}, 'method': 'dhondt'}, 'not a scenario', sample_inputs[2]]
+    response = app.test_client().post('/azur_batch', json={'scenarios': scenarios})
+    results = response.get_json()['results']
+
+    assert response.status_code == 200
+    assert [x['status'] for x in results] == [200, 404, 400, 200]
+    assert results[0]['result']['distribution'] == assign(sample_inputs[0])['distribution']
+    assert results[3]['result']['distribution'] == assign(sample_inputs[2])['distribution']
+    assert 'num_of_seats' in results[1]['error']['message']
+
+def test_batch_route_pages():
+
+    scenario = {'votes': {'A': 12, 'B': 12, 'C': 12, 'D': 1}, 'method': 'dhondt', 'num_of_seats': 2, 'return_quotients': True, 'return_outcomes': True}
+    expected = app.test_client().post('/azur', json=scenario).get_json()
+    results = app.test_client().post('/azur_batch', json={'scenarios': [scenario, sample_inputs[0]]}).get_json()['results']
+
+    assert results[0]['result']['quotients'] == expected['quotients']
+    assert results[0]['result']['outcomes'] == expected['outcomes'] and expected['outcomes']['count'] == 3
+    assert 'quotients' not in results[1]['result'] and 'outcomes' not in results[1]['result']
+
+def test_batch_route_rejects_non_list():
+
+    response = app.test_client().post('/azur_batch', json={'scenarios': {'votes': {}}})
+
+    assert response.status_code == 400
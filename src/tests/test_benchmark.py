@@ -0,0 +1,45 @@
+import json
+
+import benchmark
+from benchmark import benchmark_cases, find_regressions, main, make_votes
+
+def test_benchmark_cases_are_unique_and_run():
+
+    cases = benchmark_cases()
+    names = [name for name, _ in cases]
+
+    assert len(names) == len(set(names))
+    for name, run in cases:
+        if '-s1-' in name: assert 'distribution' in run()
+
+def test_make_votes_ties():
+
+    assert len(set(make_votes(10, 'ties').values())) == 1
+    assert make_votes(10, 'uniform') == make_votes(10, 'uniform')
+
+def test_find_regressions():
+
+    baseline = {'a': {'time': 0.1, 'peak_memory': 10000}, 'b': {'time': 0.00001, 'peak_memory': 10}}
+    results = {'a': {'time': 0.2, 'peak_memory': 10000},
+               'b': {'time': 0.0005, 'peak_memory': 1000}, # Below the noise floors of time and memory
+               'c': {'time': 1.0, 'peak_memory': 1}}       # Not in the baseline
+
+    regressions = find_regressions(results, baseline, threshold=1.5)
+
+    assert len(regressions) == 1 and regressions[0].startswith('a: time')
+
+def test_main_baseline_round_trip(tmp_path, monkeypatch):
+
+    monkeypatch.setattr(benchmark, 'measure', lambda run: {'time': 0.01, 'peak_memory': 2048})
+    baseline = str(tmp_path / 'baseline.json')
+
+    assert main(['--baseline', baseline, '--filter', 'hare-p2-s1-uniform']) == 0 # No baseline yet, so it is recorded
+    assert set(json.load(open(baseline))) == {'hare-p2-s1-uniform-notable', 'hare-p2-s1-uniform-table'}
+    assert main(['--baseline', baseline, '--filter', 'hare-p2-s1-', '--update-baseline']) == 0
+    assert set(json.load(open(baseline))) == {'hare-p2-s1-uniform-notable', 'hare-p2-s1-uniform-table',
+                                              'hare-p2-s1-zipf-notable', 'hare-p2-s1-zipf-table',
+                                              'hare-p2-s1-ties-notable', 'hare-p2-s1-ties-table'}
+    assert main(['--baseline', baseline, '--filter', 'hare-p2-s1-']) == 0
+
+    monkeypatch.setattr(benchmark, 'measure', lambda run: {'time': 0.1, 'peak_memory': 2048})
+    assert main(['--baseline', baseline, '--filter', 'hare-p2-s1-']) == 1
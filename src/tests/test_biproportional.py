@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+from fractions import Fraction
+
+from app import app
+from assignment import DIVISOR_METHODS, assign
+from biproportional import biproportional
+
+def random_matrix(seed, n_rows, n_columns, method):
+    rng = np.random.default_rng(seed)
+    votes = {f'r{i}': {f'c{j}': int(x) for j, x in enumerate(row)} for i, row in enumerate(rng.integers(0, 10000, (n_rows, n_columns)))}
+    column_seats = {f'c{j}': int(x) for j, x in enumerate(rng.integers(n_rows if DIVISOR_METHODS[method].divisors(1)[0] == 0 else 1, 40, n_columns))}
+    return votes, column_seats
+
+def check_divisors(votes, method, output):
+    """Checks the seats of each entry against its quotient with the returned divisors, in exact arithmetic."""
+
+    divisor_method = DIVISOR_METHODS[method]
+    divisors = divisor_method.divisors(max(max(output['row_seats'].values()), max(output['column_seats'].values())) + 2).tolist()
+
+    for row, x in output['seats'].items():
+        for column, seats in x.items():
+            if votes[row][column] == 0:
+                assert seats == 0
+                continue
+            quotient = Fraction(votes[row][column] ** divisor_method.power) / (Fraction(output['row_divisors'][row]) * Fraction(output['column_divisors'][column]))
+            assert (seats == 0 or quotient >= divisors[seats - 1]) and quotient <= divisors[seats]
+
+@pytest.mark.parametrize('method', DIVISOR_METHODS.keys())
+@pytest.mark.parametrize('seed, n_rows, n_columns', [(0, 3, 4), (1, 8, 6), (2, 20, 15)])
+def test_biproportional_meets_totals(method, seed, n_rows, n_columns):
+
+    votes, column_seats = random_matrix(seed, n_rows, n_columns, method)
+    output = biproportional(votes, method, column_seats, upper_method='hare')
+
+    assert output['converged']
+    assert {column: sum(x[column] for x in output['seats'].values()) for column in column_seats} == column_seats
+    assert {row: sum(x.values()) for row, x in output['seats'].items()} == output['row_seats']
+    check_divisors(votes, method, output)
+
+@pytest.mark.parametrize('method', ['dhondt', 'schepers', 'huntington_hill'])
+def test_single_column_matches_method(method):
+
+    votes = {'A': 4600, 'B': 3100, 'C': 1500, 'D': 800}
+    output = biproportional({party: {'x': x} for party, x in votes.items()}, method, {'x': 12})
+
+    expected = assign({'votes': votes, 'method': method, 'num_of_seats': 12})['distribution']['seats']
+    assert {party: x['x'] for party, x in output['seats'].items()} == expected
+    assert output['row_seats'] == expected
+
+def test_districts_example():
+
+    # Lists in electoral districts, in the style of a municipal election
+    votes = {'SP': {'1+2': 28518, '3': 32809, '4+5': 42908},
+             'SVP': {'1+2': 15305, '3': 10623, '4+5': 4626},
+             'FDP': {'1+2': 21833, '3': 5844, '4+5': 3654},
+             'Gruene': {'1+2': 12401, '3': 8202, '4+5': 17028},
+             'CVP': {'1+2': 7318, '3': 4227, '4+5': 2897},
+             'AL': {'1+2': 2904, '3': 3040, '4+5': 8230}}
+    output = biproportional(votes, 'schepers', {'1+2': 12, '3': 16, '4+5': 13})
+
+    assert output['converged'] and not output['is_ambiguous']
+    assert sum(output['row_seats'].values()) == 41
+    check_divisors(votes, 'schepers', output)
+
+def test_biproportional_ties():
+
+    # Seats can go to either diagonal
+    output = biproportional({'A': {'x': 1, 'y': 1}, 'B': {'x': 1, 'y': 1}}, 'dhondt', {'x': 1, 'y': 1}, {'A': 1, 'B': 1})
+
+    assert output['converged'] and output['is_ambiguous']
+    assert output['seats'] in [{'A': {'x': 1, 'y': 0}, 'B': {'x': 0, 'y': 1}}, {'A': {'x': 0, 'y': 1}, 'B': {'x': 1, 'y': 0}}]
+
+def test_biproportional_empty_column():
+
+    output = biproportional({'A': {'x': 10, 'y': 4, 'z': 0}, 'B': {'x': 3, 'y': 9, 'z': 5}}, 'schepers', {'x': 3, 'y': 3, 'z': 0})
+
+    assert output['seats'] == {'A': {'x': 2, 'y': 1, 'z': 0}, 'B': {'x': 1, 'y': 2, 'z': 0}}
+    assert output['column_divisors']['z'] is None
+
+@pytest.mark.parametrize('votes, method, column_seats, row_seats', [
+    ({'A': {'x': 1, 'y': 1}, 'B': {'x': 1, 'y': 1}}, 'dhondt', {'x': 1, 'y': 2}, {'A': 1, 'B': 1}), # Totals differ
+    ({'A': {'x': 1, 'y': 1}, 'B': {'x': 1, 'y': 1}}, 'dhondt', {'x': 1, 'y': 2}, None), # Tied upper apportionment
+    ({'A': {'x': 5, 'y': 0}, 'B': {'x': 3, 'y': 0}}, 'dhondt', {'x': 1, 'y': 2}, None), # Seats of a column without votes
+    ({'A': {'x': 10, 'y': 4}, 'B': {'x': 3, 'y': 9}}, 'adams', {'x': 1, 'y': 3}, None), # Too few seats for Adams
+    ({'A': {'x': 5, 'y': 0}, 'B': {'x': 0, 'y': 4}}, 'dhondt', {'x': 2, 'y': 1}, {'A': 1, 'B': 2}), # Only diagonal entries
+    ({'A': {'x': 5, 'y': 0, 'z': 0}, 'B': {'x': 3, 'y': 0, 'z': 0}, 'C': {'x': 0, 'y': 4, 'z': 6}}, 'schepers', {'x': 1, 'y': 2, 'z': 2}, {'A': 1, 'B': 1, 'C': 3}),
+    ({'A': {'x': 5, 'y': 0}, 'B': {'x': 3, 'y': 4}}, 'adams', {'x': 2, 'y': 2}, {'A': 2, 'B': 2}), # B needs a seat in x
+])
+def test_biproportional_infeasible(votes, method, column_seats, row_seats):
+
+    with pytest.raises(ValueError):
+        biproportional(votes, method, column_seats, row_seats)
+
+@pytest.mark.parametrize('method', DIVISOR_METHODS.keys())
+@pytest.mark.parametrize('votes, column_seats, row_seats', [
+    ({'A': {'x': 5, 'y': 0}, 'B': {'x': 3, 'y': 4}}, {'x': 2, 'y': 2}, {'A': 1, 'B': 3}),
+    ({'A': {'x': 5, 'y': 0, 'z': 0}, 'B': {'x': 3, 'y': 1, 'z': 0}, 'C': {'x': 0, 'y': 4, 'z': 6}}, {'x': 2, 'y': 2, 'z': 2}, {'A': 1, 'B': 2, 'C': 3}),
+])
+def test_biproportional_feasible_with_zeros(votes, method, column_seats, row_seats):
+
+    output = biproportional(votes, method, column_seats, row_seats)
+
+    assert output['converged']
+    assert {column: sum(x[column] for x in output['seats'].values()) for column in column_seats} == column_seats
+    assert {row: sum(x.values()) for row, x in output['seats'].items()} == row_seats
+    check_divisors(votes, method, output)
+
+@pytest.mark.parametrize('input, status', [
+    ({}, 200),
+    ({'row_seats': {'A': 4, 'B': 3}}, 200),
+    ({'upper_method': 'hare'}, 200),
+    ({'row_seats': {'A': 4, 'B': 4}}, 400),
+    ({'row_seats': {'A': 4}}, 400),
+    ({'method': 'hare'}, 400),
+    ({'upper_method': 'x'}, 400),
+    ({'column_seats': {'x': 3, 'y': 4, 'z': 1}}, 400),
+    ({'votes': {'A': {'x': -1, 'y': 2}, 'B': {'x': 3, 'y': 4}}}, 400),
+    ({'column_seats': {'x': 0, 'y': 0}}, 400),
+    ({'votes': {'A': {'x': 600, 'y': 0}, 'B': {'x': 0, 'y': 500}}, 'row_seats': {'A': 4, 'B': 3}}, 400),
+])
+def test_biproportional_route(input, status):
+
+    base = {'votes': {'A': {'x': 600, 'y': 300}, 'B': {'x': 200, 'y': 500}}, 'method': 'schepers', 'column_seats': {'x': 3, 'y': 4}}
+    response = app.test_client().post('/azur_biproportional', json=dict(base, **input))
+
+    assert response.status_code == status
+    if status == 200: assert response.get_json()['converged']
@@ -0,0 +1,67 @@
+import ast
+import csv
+import json
+import pytest
+
+from assignment import assign
+from bulk import main, read_records, run_bulk
+from comparison import compare
+
+def read_output(path):
+    with open(path, encoding='utf8') as f: return [json.loads(line) for line in f]
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_bulk_csv(tmp_path, workers):
+
+    output_path = tmp_path / 'results.jsonl'
+    assert main(['src/tests/tests.csv', '--output', str(output_path), '--workers', str(workers), '--chunk-size', '2']) == 0
+
+    with open('src/tests/tests.csv', encoding='utf8') as f: rows = [row for row in csv.reader(f, delimiter='|') if row]
+    results = read_output(output_path)
+
+    assert len(results) == len(rows)
+    for row, result in zip(rows, results):
+        assert result['status'] == 200
+        assert result['result']['distribution'] == ast.literal_eval(row[3])
+
+def test_bulk_jsonl(tmp_path):
+
+    assignment = {'votes': {'A': 10, 'B': 10, 'C': 3}, 'method': 'dhondt', 'num_of_seats': 9}
+    comparison = {'dist_A': {'votes': {'A': 10, 'B': 3}, 'method': 'dhondt'}, 'dist_B': {'votes': {'A': 10, 'B': 3}, 'method': 'hare'}, 'num_of_seats': 5}
+    lines = [json.dumps(assignment), '', json.dumps(comparison), '{"votes": 1, "votes": 2}', '[1]', 'x',
+             json.dumps(dict(assignment, num_of_seats=0)), json.dumps(dict(comparison, output='x'))]
+
+    input_path, output_path = tmp_path / 'scenarios.jsonl', tmp_path / 'results.jsonl'
+    input_path.write_text('\n'.join(lines) + '\n', encoding='utf8')
+
+    assert main([str(input_path), '--output', str(output_path), '--workers', '1', '--return-table']) == 1
+    results = read_output(output_path)
+
+    assert [x['line'] for x in results] == [1, 3, 4, 5, 6, 7, 8]
+    assert [x['status'] for x in results] == [200, 200, 400, 400, 400, 400, 400]
+    assert results[0]['result'] == assign(dict(assignment, return_table=True))
+    assert results[1]['result'] == compare(comparison['dist_A'], comparison['dist_B'], 5)
+    assert all('message' in x['error'] for x in results[2:])
+
+def test_bulk_is_incremental():
+
+    read = []
+    def records():
+        for i in range(1, 1001):
+            read.append(i)
+            yield i, f'{{"votes": {{"A": {i}, "B": 7}}, "method": "dhondt", "num_of_seats": 5}}'
+
+    results = run_bulk(records(), 'jsonl', {}, workers=2, chunk_size=10)
+    next(results)
+
+    # Only the chunks submitted before the first result is written have been read
+    assert len(read) <= 2 * 2 * 10 + 10
+    assert len(list(results)) == 999
+
+def test_read_records(tmp_path):
+
+    path = tmp_path / 'scenarios.csv'
+    path.write_text('"dhondt"|{"A": 1}|3\n\n"hare"|{"A": 1}|2|ignored\n', encoding='utf8')
+
+    with open(path, encoding='utf8', newline='') as f:
+        assert list(read_records(f, 'csv')) == [(1, ['dhondt', '{"A": 1}', '3']), (3, ['hare', '{"A": 1}', '2', 'ignored'])]
@@ -0,0 +1,53 @@
+import pytest
+
+from assignment import assign
+from cache import AssignmentCache
+from tables import TABLE_FORMATS
+
+sample_votes = {'A': 6, 'B': 4, 'C': 2, 'D': 2}
+
+@pytest.mark.parametrize('table_format', TABLE_FORMATS)
+@pytest.mark.parametrize('method', ['dhondt', 'schepers', 'hare'])
+def test_prefix_reuse(method, table_format):
+
+    cache = AssignmentCache()
+    cache.assign({'votes': sample_votes, 'method': method, 'num_of_seats': 20, 'return_table': True})
+
+    for seats in range(1, 21):
+        input = {'votes': sample_votes, 'method': method, 'num_of_seats': seats, 'return_table': True, 'table_format': table_format}
+        assert cache.assign(input) == assign(input)
+        assert cache.assign(dict(input, return_table=False)) == assign(dict(input, return_table=False))
+
+    assert cache.stats()['hits'] == 40
+    assert cache.stats()['misses'] == 1
+
+def test_larger_seats_replace_entry():
+
+    cache = AssignmentCache()
+    input = {'votes': sample_votes, 'method': 'dhondt', 'num_of_seats': 5}
+
+    cache.assign(input)
+    cache.assign(dict(input, num_of_seats=10))
+    cache.assign(dict(input, num_of_seats=7))
+
+    assert cache.stats()['misses'] == 2
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['entries'] == 1
+
+def test_eviction():
+
+    cache = AssignmentCache(max_entries=2)
+
+    for n in range(1, 4): cache.assign({'votes': {'A': n, 'B': 1}, 'method': 'schepers', 'num_of_seats': 5})
+
+    assert cache.stats()['entries'] == 2
+    assert cache.stats()['evictions'] == 1
+
+def test_memory_budget():
+
+    cache = AssignmentCache(memory_budget=1000)
+    output = cache.assign({'votes': sample_votes, 'method': 'hare', 'num_of_seats': 100, 'return_table': True})
+
+    assert len(output['table']) == 100
+    assert cache.stats()['entries'] == 0
+    assert cache.stats()['memory_used'] == 0
@@ -0,0 +1,75 @@
+import pytest
+
+from app import app
+from assignment import assign
+from comparison import compare, compare_many
+
+votes = {'A': 6, 'B': 4, 'C': 2, 'D': 2}
+scenarios = [{'votes': votes, 'method': method} for method in ['dhondt', 'schepers', 'hare', 'dhondt']]
+
+def test_compare_does_not_modify_params():
+
+    params = {'votes': dict(votes), 'method': 'dhondt'}
+    compare(params, params, 8)
+
+    assert params == {'votes': votes, 'method': 'dhondt'}
+
+def test_compare_without_table():
+
+    assert 'table' not in compare(scenarios[0], scenarios[1], 8, return_table=False)
+
+@pytest.mark.parametrize("num_seats", [1, 6, 25])
+def test_compare_many_matches_assign(num_seats):
+
+    outputs = [assign(dict(x, num_of_seats=num_seats, return_table=True)) for x in scenarios]
+    comparison = compare_many(scenarios, num_seats)
+
+    assert comparison['distribution']['distributions'] == [x['distribution'] for x in outputs]
+    assert [x['distributions'] for x in comparison['table']] == [list(row) for row in zip(*(x['table'] for x in outputs))]
+    assert [x['is_identical'] for x in comparison['table']] == [all(y == row[0] for y in row) for row in zip(*(x['table'] for x in outputs))]
+    assert 'assignment_sequence' not in comparison # Hare/Niemeyer has no assignment sequence
+
+@pytest.mark.parametrize("num_seats", [1, 6, 25])
+def test_compare_many_sparse(num_seats):
+
+    divisor_scenarios = [scenarios[0], scenarios[1]]
+    full = compare_many(divisor_scenarios, num_seats)
+    sparse = compare_many(divisor_scenarios, num_seats, sparse=True)
+
+    for key, index_key in [('table', 'row'), ('assignment_sequence', 'position')]:
+        divergent = [dict(x, **{index_key: i}) for i, x in enumerate(full[key], 1) if not x['is_identical']]
+
+        assert sparse[key][f'divergent_{index_key}s'] == divergent
+        assert sparse[key]['first_divergence'] == (divergent[0][index_key] if divergent else None)
+
+def test_compare_many_identical():
+
+    comparison = compare_many([scenarios[0], scenarios[3]], 10, sparse=True)
+
+    assert comparison['distribution']['is_identical']
+    assert comparison['table'] == {'divergent_rows': [], 'first_divergence': None}
+    assert comparison['assignment_sequence'] == {'divergent_positions': [], 'first_divergence': None}
+
+def test_compare_route_scenarios():
+
+    response = app.test_client().post('/azur_compare', json={'scenarios': scenarios, 'num_of_seats': 6, 'output': 'sparse'})
+
+    assert response.status_code == 200
+    assert response.get_json() == compare_many(scenarios, 6, sparse=True)
+
+@pytest.mark.parametrize("input, status", [
+    ({'scenarios': scenarios, 'num_of_seats': 0}, 400),
+    ({'scenarios': scenarios, 'num_of_seats': 6, 'output': 'dense'}, 400),
+    ({'scenarios': scenarios, 'num_of_seats': 6, 'table_format': 'columnar'}, 400),
+    ({'scenarios': scenarios, 'num_of_seats': 6, 'table_format': 'delta'}, 400),
+    ({'scenarios': scenarios, 'num_of_seats': 6, 'table_format': 'rows'}, 200),
+    ({'scenarios': scenarios, 'num_of_seats': 6, 'stream': True}, 400),
+    ({'scenarios': scenarios, 'num_of_seats': 6, 'stream': False}, 200),
+    ({'dist_A': scenarios[0], 'dist_B': scenarios[1], 'num_of_seats': 6, 'table_format': 'columnar', 'stream': True}, 200),
+    ({'scenarios': [{'votes': votes}], 'num_of_seats': 6}, 404),
+    ({'dist_A': scenarios[0], 'num_of_seats': 6}, 400),
+    ({'dist_A': scenarios[0], 'dist_B': scenarios[1], 'num_of_seats': 6}, 200),
+])
+def test_compare_route_validation(input, status):
+
+    assert app.test_client().post('/azur_compare', json=input).status_code == status
@@ -0,0 +1,76 @@
+import pytest
+
+from app import app, cache
+from assignment import DIVISOR_METHODS, assign, divisor_steps, update_divisor_steps
+from cache import AssignmentCache
+
+@pytest.mark.parametrize('method', DIVISOR_METHODS.keys())
+@pytest.mark.parametrize('changes', [{'B': 2600}, {'A': 0}, {'C': 4600, 'D': 5}, {'A': 4600}, {'A': 1, 'B': 1, 'C': 1, 'D': 1}])
+def test_update_divisor_steps(method, changes):
+
+    votes = {'A': 4600, 'B': 3100, 'C': 1500, 'D': 800}
+    new_votes = dict(votes, **changes)
+
+    old_steps = divisor_steps(votes, 40, DIVISOR_METHODS[method])
+    steps, seats_kept = update_divisor_steps(votes, new_votes, old_steps, 40, DIVISOR_METHODS[method])
+
+    assert steps == divisor_steps(new_votes, 40, DIVISOR_METHODS[method])
+
+    # The seats of the steps before the first changed one
+    first_changed = next((i for i, (old, new) in enumerate(zip(old_steps, steps)) if old != new), len(steps))
+    assert seats_kept == sum(n for _, n in steps[:first_changed])
+
+@pytest.mark.parametrize('method', ['dhondt', 'schepers', 'hare'])
+@pytest.mark.parametrize('table_format', ['rows', 'columnar'])
+def test_update_result(method, table_format):
+
+    cache = AssignmentCache()
+    base = {'votes': {'A': 10, 'B': 10, 'C': 3, 'D': 1}, 'method': method, 'num_of_seats': 30, 'return_table': True, 'table_format': table_format}
+    votes = dict(base['votes'], C=5)
+
+    assert cache.update_result(base, votes)[1] is None # The base input has no record
+
+    base_output = cache.assign(base)
+    result, seats_kept = cache.update_result(base, votes)
+    output = result.to_dict()
+
+    assert output == assign(dict(base, votes=votes))
+    assert 0 <= seats_kept < 30
+    if table_format == 'rows':
+        assert output['table'][:seats_kept] == base_output['table'][:seats_kept]
+        assert output['table'][seats_kept] != base_output['table'][seats_kept]
+
+def test_delta_route():
+
+    client = app.test_client()
+    cache.clear()
+    input = {'votes': {'A': 10, 'B': 10, 'C': 3}, 'method': 'dhondt', 'num_of_seats': 20, 'return_table': True}
+
+    base_etag = client.post('/azur', json=input).headers['ETag']
+    response = client.post('/azur_delta', json={'base': base_etag, 'votes': {'C': 8}})
+
+    updated = dict(input, votes={'A': 10, 'B': 10, 'C': 8})
+    assert response.status_code == 200
+    assert response.get_json() == assign(updated)
+    assert response.headers['ETag'] == client.post('/azur', json=updated).headers['ETag']
+    assert int(response.headers['Azur-Unchanged-Seats']) < 20
+
+    # Deltas can be chained
+    response = client.post('/azur_delta', json={'base': response.headers['ETag'], 'votes': {'A': 11}})
+    assert response.get_json() == assign(dict(updated, votes={'A': 11, 'B': 10, 'C': 8}))
+
+@pytest.mark.parametrize('body, status', [
+    ({'base': '"unknown"', 'votes': {'A': 1}}, 404),
+    ({'base': None}, 404),
+    ({'base': 1, 'votes': {'A': 1}}, 400),
+    ({'votes': {}}, 400),
+    ({'votes': {'X': 1}}, 400),
+    ({'votes': {'A': -1}}, 400),
+])
+def test_delta_route_errors(body, status):
+
+    client = app.test_client()
+    base_etag = client.post('/azur', json={'votes': {'A': 10, 'B': 3}, 'method': 'dhondt', 'num_of_seats': 5}).headers['ETag']
+
+    body = {key: x for key, x in dict({'base': base_etag}, **body).items() if x is not None}
+    assert client.post('/azur_delta', json=body).status_code == status
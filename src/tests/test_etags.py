@@ -0,0 +1,51 @@
+import json
+import pytest
+from urllib.parse import quote
+
+from app import app
+from etags import canonical_json, input_etag
+
+sample_input = {'votes': {'A': 10, 'B': 10, 'C': 3}, 'method': 'dhondt', 'num_of_seats': 9, 'return_table': True}
+compare_input = {'dist_A': {'votes': {'A': 10, 'B': 3}, 'method': 'dhondt'}, 'dist_B': {'votes': {'A': 10, 'B': 3}, 'method': 'hare'}, 'num_of_seats': 5}
+
+def test_canonical_json():
+
+    assert canonical_json({'num_of_seats': 9, 'votes': {'B': 1, 'A': 2}}) == '{"num_of_seats":9,"votes":[["B",1],["A",2]]}'
+    assert canonical_json({'dist_A': {'votes': {'B': 1, 'A': 2}, 'method': 'x'}}) == '{"dist_A":{"method":"x","votes":[["B",1],["A",2]]}}'
+
+@pytest.mark.parametrize('other, equal', [
+    (dict(reversed(list(sample_input.items()))), True),               # Order of the keys
+    (dict(sample_input, votes={'B': 10, 'A': 10, 'C': 3}), False),    # Order of the parties, which lists ties
+    (dict(sample_input, num_of_seats=10), False),
+])
+def test_input_etag(other, equal):
+
+    assert (input_etag('/azur', other) == input_etag('/azur', sample_input)) == equal
+    assert input_etag('/azur_compare', sample_input) != input_etag('/azur', sample_input)
+
+@pytest.mark.parametrize('path, input', [('/azur', sample_input), ('/azur', dict(sample_input, stream=True)), ('/azur_compare', compare_input)])
+def test_conditional_requests(path, input):
+
+    client = app.test_client()
+    response = client.post(path, json=input)
+    etag = response.headers['ETag']
+
+    assert response.status_code == 200 and etag == f'"{input_etag(path, input)}"'
+    assert 'max-age' in response.headers['Cache-Control']
+
+    response = client.post(path, json=input, headers={'If-None-Match': etag})
+    assert response.status_code == 304 and response.headers['ETag'] == etag and response.data == b''
+
+    assert client.post(path, json=input, headers={'If-None-Match': '"other"'}).status_code == 200
+
+    # The GET variant gives the same result
+    response = client.get(f'{path}?input={quote(json.dumps(input))}')
+    assert response.status_code == 200 and response.headers['ETag'] == etag
+    assert response.get_json() == client.post(path, json=input).get_json()
+
+@pytest.mark.parametrize('input, status', [(dict(sample_input, num_of_seats=-1), 400), ('{"votes": 1, "votes": 2}', 500)])
+def test_errors_have_no_etag(input, status):
+
+    response = app.test_client().get('/azur', query_string={'input': input if type(input) == str else json.dumps(input)})
+
+    assert response.status_code == status and 'ETag' not in response.headers
@@ -0,0 +1,84 @@
+import json
+import os
+import random
+import pytest
+
+from app import app, validate_input
+import loadtest
+from loadtest import PAYLOADS, SCENARIOS, Server, find_regressions, main, percentile, report, run_scenario
+
+def client_sender():
+    client = app.test_client()
+    return lambda path, body: client.post(path, json=body).status_code
+
+@pytest.mark.parametrize('kind', PAYLOADS.keys())
+def test_payloads_are_valid(kind):
+
+    path, body = PAYLOADS[kind](random.Random(0))
+
+    if path == '/azur': assert validate_input(body)[0]
+    if kind != 'huge': assert client_sender()(path, body) == 200
+
+def test_scenarios_use_known_payloads():
+
+    assert all(kind in PAYLOADS for mix in SCENARIOS.values() for kind in mix)
+
+def test_run_scenario():
+
+    result = run_scenario(client_sender(), {'small': 0.8, 'compare': 0.2}, rate=200, duration=0.2, concurrency=4, memory=lambda: 1000)
+
+    assert result['requests'] == 40
+    assert result['error_rate'] == 0
+    assert result['p50'] <= result['p95'] <= result['p99']
+    assert set(result['by_kind']) == {'small', 'compare'}
+    assert result['peak_memory'] == 1000
+
+def test_server_metrics_directory(monkeypatch):
+
+    # The server under test does not share the metrics directory of a server running on the same machine
+    monkeypatch.setenv('AZUR_METRICS_DIR', '/nonexistent/shared_metrics')
+    server = Server('flask', port=5098)
+
+    with server:
+        metrics_dir = server._metrics_dir
+        assert os.path.isdir(metrics_dir) and metrics_dir != os.environ['AZUR_METRICS_DIR']
+
+    assert not os.path.exists(metrics_dir)
+
+def test_report_errors():
+
+    result = report([('small', 200, 0.1), ('small', 503, 0.2), ('table', 500, 0.3), ('table', 0, 0.4)], 2.0, [])
+
+    assert result['throughput'] == 2
+    assert result['error_rate'] == 0.75
+    assert result['rejected'] == 1
+    assert result['peak_memory'] is None
+
+@pytest.mark.parametrize('q, expected', [(0, 1), (50, 5), (95, 10), (99, 10), (100, 10)])
+def test_percentile(q, expected):
+
+    assert percentile(list(range(1, 11)), q) == expected
+    assert percentile([], q) is None
+
+def test_find_regressions():
+
+    baseline = {'a': {'throughput': 100, 'p99': 0.05, 'error_rate': 0.0}, 'b': {'throughput': 100, 'p99': 0.0001, 'error_rate': 0.0}}
+    results = {'a': {'throughput': 50, 'p99': 0.1, 'error_rate': 0.05},
+               'b': {'throughput': 90, 'p99': 0.0009, 'error_rate': 0.005}, # Within the threshold and noise floors
+               'c': {'throughput': 1, 'p99': 10, 'error_rate': 1}}          # Not in the baseline
+
+    regressions = find_regressions(results, baseline, threshold=1.5)
+
+    assert len(regressions) == 3 and all(x.startswith('a: ') for x in regressions)
+
+def test_main_records_missing_baseline(tmp_path, monkeypatch):
+
+    monkeypatch.setattr(loadtest, 'run_scenario', lambda *args, **kwargs: {'throughput': 50, 'p99': 0.01, 'error_rate': 0.0})
+    monkeypatch.setattr(loadtest, '_print_report', lambda name, result: None)
+    baseline = str(tmp_path / 'baseline.json')
+
+    assert main(['--url', 'http://127.0.0.1:1', '--scenario', 'small', '--baseline', baseline]) == 0 # Recorded
+    assert json.load(open(baseline)) == {'small': {'throughput': 50, 'p99': 0.01, 'error_rate': 0.0}}
+
+    monkeypatch.setattr(loadtest, 'run_scenario', lambda *args, **kwargs: {'throughput': 10, 'p99': 0.01, 'error_rate': 0.0})
+    assert main(['--url', 'http://127.0.0.1:1', '--scenario', 'small', '--baseline', baseline]) == 1
@@ -0,0 +1,97 @@
+import pytest
+
+import app as app_module
+from app import app
+from metrics import EXITED_FILE, Metrics, NULL_TIMER, _read_directory, _size_bucket, compact
+
+input = {'votes': {'A': 3, 'B': 3}, 'method': 'dhondt', 'num_of_seats': 3}
+
+@pytest.fixture
+def fresh_metrics(monkeypatch):
+    metrics = Metrics()
+    monkeypatch.setattr(app_module, 'metrics', metrics)
+    monkeypatch.setattr(app_module, 'METRICS_ENABLED', True)
+    return metrics
+
+def test_server_timing_header(fresh_metrics):
+
+    response = app.test_client().post('/azur', json=input)
+    phases = [x.split(';')[0] for x in response.headers['Server-Timing'].split(', ')]
+
+    assert response.status_code == 200
+    assert phases == ['parse', 'validate', 'engine', 'serialize', 'total']
+
+def test_metrics_route_counts(fresh_metrics):
+
+    client = app.test_client()
+    client.post('/azur', json=input)
+    client.post('/azur', json=dict(input, num_of_seats=0))
+    text = client.get('/metrics').get_data(as_text=True)
+
+    assert 'azur_request_duration_seconds_count{method="dhondt",seats="le_10",parties="le_10"} 1' in text
+    assert 'azur_requests_total{status="200"} 1' in text
+    assert 'azur_errors_total{status="400"} 1' in text
+    assert 'azur_ambiguous_results_total{method="dhondt"} 1' in text
+
+def test_metrics_disabled(fresh_metrics, monkeypatch):
+
+    monkeypatch.setattr(app_module, 'METRICS_ENABLED', False)
+    response = app.test_client().post('/azur', json=input)
+
+    assert response.status_code == 200
+    assert 'Server-Timing' not in response.headers
+    assert fresh_metrics.render().count('\n') == 8 # Only the help and type lines
+
+def test_null_timer_passes_through():
+
+    with NULL_TIMER.phase('engine'): pass
+
+    assert NULL_TIMER.finish({'a': 1}, 200) == ({'a': 1}, 200)
+
+@pytest.mark.parametrize("n, bucket", [(1, 'le_10'), (10, 'le_10'), (11, 'le_100'), (1000000, 'le_1000000'), (1000001, 'inf')])
+def test_size_bucket(n, bucket):
+
+    assert _size_bucket(n) == bucket
+
+def test_metrics_shared_directory(tmp_path):
+
+    # Two processes sharing a directory, the first of which has exited after its last write
+    first, second = Metrics(str(tmp_path), flush_interval=3600), Metrics(str(tmp_path), flush_interval=3600)
+    first.record(200, 0.01, 'dhondt', 3, 2, is_ambiguous=True)
+    first.flush()
+    del first
+    second.record(200, 0.02, 'dhondt', 3, 2)
+    second.record(400, 0.0)
+    text = second.render()
+
+    assert 'azur_request_duration_seconds_count{method="dhondt",seats="le_10",parties="le_10"} 2' in text
+    assert 'azur_requests_total{status="200"} 2' in text
+    assert 'azur_errors_total{status="400"} 1' in text
+    assert 'azur_ambiguous_results_total{method="dhondt"} 1' in text
+    assert sorted(x.suffix for x in tmp_path.iterdir()) == ['.json', '.json']
+
+def test_compact_exited_processes(tmp_path, monkeypatch):
+
+    # Three processes, the first two of which exit one after the other
+    processes = []
+    for pid in [101, 102, 103]:
+        monkeypatch.setattr('os.getpid', lambda pid=pid: pid)
+        metrics = Metrics(str(tmp_path), flush_interval=3600)
+        metrics.record(200, 0.01, 'dhondt', 3, 2)
+        metrics.flush()
+        processes.append(metrics)
+    text = processes[2].render()
+
+    compact(str(tmp_path), 101)
+    listed = _read_directory(str(tmp_path))
+    before = {x.name: x.read_text() for x in tmp_path.iterdir()}
+    compact(str(tmp_path), 102)
+    compact(str(tmp_path), 999) # Without files
+
+    assert sorted(x.name for x in tmp_path.iterdir()) == sorted([EXITED_FILE] + [x for x in before if x.startswith('metrics_103_')])
+    assert processes[2].render() == text and 'azur_requests_total{status="200"} 3' in text
+
+    # A scrape reading a file before it was merged and removed does not count it twice
+    for name, content in before.items():
+        if name.startswith('metrics_102_'): (tmp_path / name).write_text(content)
+    assert _read_directory(str(tmp_path)) == listed
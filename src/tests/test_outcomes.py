@@ -0,0 +1,107 @@
+import pytest
+from fractions import Fraction
+from itertools import combinations
+from math import comb
+
+from app import app
+from assignment import DIVISOR_METHODS, assign_result
+from outcomes import OUTCOME_PAGE_LIMIT, _next_combination, _unrank_combination, count_outcomes, tie_outcomes
+
+def divisor_outcomes(votes, method, num_seats):
+    """All distributions a lot can give, by assigning seat by seat and trying every party tied for the seat."""
+
+    divisor_method = DIVISOR_METHODS[method]
+    parties, weights = list(votes.keys()), divisor_method.weights(votes)
+    divisors = divisor_method.divisors(num_seats + 1).tolist()
+
+    def quotient(p, seats):
+        return Fraction(weights[p], divisors[seats]) if divisors[seats] else Fraction(10**30 if weights[p] else 0)
+
+    states = {tuple(0 for _ in parties)}
+    for _ in range(num_seats):
+        next_states = set()
+        for seats in states:
+            quotients = [quotient(p, seats[p]) for p in range(len(parties))]
+            next_states.update(seats[:p] + (seats[p] + 1,) + seats[p + 1:] for p, q in enumerate(quotients) if q == max(quotients))
+        states = next_states
+
+    return {tuple(zip(parties, x)) for x in states}
+
+def hare_outcomes(votes, num_seats):
+    """All distributions a lot can give, ie. the seats left go to parties with remainders at least those of the rest."""
+
+    total = sum(votes.values())
+    quotas = [Fraction(v * num_seats, total) for v in votes.values()]
+    seats = [int(q) for q in quotas]
+    remainders = [q - s for q, s in zip(quotas, seats)]
+
+    outcomes = set()
+    for chosen in combinations(range(len(votes)), num_seats - sum(seats)):
+        if all(remainders[p] >= remainders[q] for p in chosen for q in range(len(votes)) if q not in chosen):
+            outcomes.add(tuple(zip(votes.keys(), [s + (p in chosen) for p, s in enumerate(seats)])))
+
+    return outcomes
+
+votes_cases = [{'A': 12, 'B': 12, 'C': 12, 'D': 1}, {'A': 6, 'B': 3, 'C': 3, 'D': 2, 'E': 1}, {'A': 10, 'B': 10, 'C': 10, 'D': 10, 'E': 10, 'F': 5}, {'A': 4600, 'B': 3100, 'C': 1500}]
+
+@pytest.mark.parametrize('method', list(DIVISOR_METHODS.keys()) + ['hare'])
+@pytest.mark.parametrize('votes', votes_cases)
+@pytest.mark.parametrize('num_seats', [1, 2, 3, 4, 7, 10])
+def test_tie_outcomes(method, votes, num_seats):
+
+    distribution = assign_result({'votes': votes, 'method': method, 'num_of_seats': num_seats}).distribution
+    outcomes = list(tie_outcomes(distribution, num_seats))
+    expected = hare_outcomes(votes, num_seats) if method == 'hare' else divisor_outcomes(votes, method, num_seats)
+
+    assert count_outcomes(distribution, num_seats) == len(outcomes)
+    assert {tuple(x.items()) for x in outcomes} == expected
+    assert all(sum(x.values()) == num_seats for x in outcomes)
+
+@pytest.mark.parametrize('first, last', [(1, 1), (2, 5), (10, 20), (250, 252), (252, 300), (253, 300)])
+def test_tie_outcome_pages(first, last):
+
+    votes = {f'P{i}': 100 for i in range(10)}
+    distribution = assign_result({'votes': votes, 'method': 'dhondt', 'num_of_seats': 5}).distribution
+    outcomes = list(tie_outcomes(distribution, 5))
+
+    assert count_outcomes(distribution, 5) == len(outcomes) == comb(10, 5)
+    assert list(tie_outcomes(distribution, 5, first, last)) == outcomes[first - 1:last]
+
+def test_count_outcomes_is_cheap():
+
+    # Far too many outcomes to enumerate, but pages anywhere are still generated directly
+    votes = {f'P{i}': 1 for i in range(1000)}
+    distribution = assign_result({'votes': votes, 'method': 'hare', 'num_of_seats': 500}).distribution
+    count = count_outcomes(distribution, 500)
+
+    assert count == comb(1000, 500)
+    last_outcome = next(tie_outcomes(distribution, 500, count, count))
+    assert list(last_outcome.values()) == [0] * 500 + [1] * 500
+
+@pytest.mark.parametrize('n, k', [(0, 0), (1, 1), (5, 0), (6, 3), (8, 5)])
+def test_unrank_combination(n, k):
+
+    combination = _unrank_combination(n, k, 0)
+
+    for rank, expected in enumerate(combinations(range(n), k)):
+        assert _unrank_combination(n, k, rank) == list(expected) == combination
+        _next_combination(combination, n)
+
+sample_input = {'votes': {'A': 12, 'B': 12, 'C': 12, 'D': 1}, 'method': 'dhondt', 'num_of_seats': 2, 'return_outcomes': True}
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_outcomes_route(stream):
+
+    output = app.test_client().post('/azur', json=dict(sample_input, stream=stream)).get_json()
+
+    assert output['outcomes'] == {'count': 3, 'distributions': [{'A': 1, 'B': 1, 'C': 0, 'D': 0}, {'A': 1, 'B': 0, 'C': 1, 'D': 0}, {'A': 0, 'B': 1, 'C': 1, 'D': 0}]}
+
+    output = app.test_client().post('/azur', json=dict(sample_input, stream=stream, outcome_range=[3, 4])).get_json()
+    assert output['outcomes'] == {'count': 3, 'distributions': [{'A': 0, 'B': 1, 'C': 1, 'D': 0}]}
+
+@pytest.mark.parametrize('changes', [{'return_outcomes': 'yes'}, {'outcome_range': [0, 3]}, {'outcome_range': [3, 2]}, {'outcome_range': [1.5, 2]}, {'outcome_range': [1, OUTCOME_PAGE_LIMIT + 1]}])
+def test_outcomes_route_errors(changes):
+
+    response = app.test_client().post('/azur', json=dict(sample_input, **changes))
+
+    assert response.status_code == 400 and 'message' in response.get_json()
@@ -0,0 +1,125 @@
+import pytest
+
+from app import app
+from assignment import DIVISOR_METHODS, assign, divisor_steps
+from quotients import QUOTIENT_PAGE_LIMIT, exact_quotient, format_quotient, quotient_table
+
+# Ties within and across parties, and a party without votes
+votes_cases = [{'A': 4600, 'B': 3100, 'C': 1500, 'D': 800}, {'A': 6, 'B': 0, 'C': 3, 'D': 2, 'E': 1}, {'A': 12, 'B': 12, 'C': 4}]
+
+@pytest.mark.parametrize('method', DIVISOR_METHODS.keys())
+@pytest.mark.parametrize('votes', votes_cases)
+def test_quotient_table_order(method, votes):
+
+    steps = divisor_steps({k: v for k, v in votes.items() if v > 0}, 40, DIVISOR_METHODS[method])
+    parties = [k for k, v in votes.items() if v > 0]
+    table = list(quotient_table(votes, DIVISOR_METHODS[method], 10, ranks=(1, 40)))
+
+    # The ranks follow the order in which the engine hands out seats
+    assert [x['party'] for x in table] == [parties[p] for tied, _ in steps for p in tied][:40]
+    assert [x['rank'] for x in table] == list(range(1, 41))
+
+    # The assigned quotients are the seats of the distribution
+    seats = assign({'votes': votes, 'method': method, 'num_of_seats': 10})['distribution']['seats']
+    for party, n in seats.items():
+        assert sum(x['assigned'] for x in table if x['party'] == party) == (n if type(n) == int else n[0])
+
+@pytest.mark.parametrize('method', DIVISOR_METHODS.keys())
+@pytest.mark.parametrize('votes', votes_cases)
+@pytest.mark.parametrize('ranks, seats', [((1, 5), (1, 3)), ((7, 25), (4, 9)), ((40, 40), (12, 12))])
+def test_quotient_table_pages(method, votes, ranks, seats):
+
+    divisor_method = DIVISOR_METHODS[method]
+    table = list(quotient_table(votes, divisor_method, 10, ranks=(1, 40)))
+
+    assert list(quotient_table(votes, divisor_method, 10, ranks=ranks)) == table[ranks[0] - 1:ranks[1]]
+
+    # Pages of seats have the same entries, except for ranks above max_rank
+    by_party_seat = {(x['party'], x['seat']): x for x in table}
+    page = list(quotient_table(votes, divisor_method, 10, seats=seats, max_rank=40))
+
+    assert [(x['seat'], x['party']) for x in page] == [(s, k) for s in range(seats[0], seats[1] + 1) for k, v in votes.items() if v > 0]
+    for x in page:
+        if x['rank'] is None: assert (x['party'], x['seat']) not in by_party_seat
+        else: assert x == by_party_seat[(x['party'], x['seat'])]
+
+def test_quotient_table_ties():
+
+    table = list(quotient_table({'A': 12, 'B': 12, 'C': 4}, DIVISOR_METHODS['dhondt'], 2, ranks=(1, 4)))
+
+    assert [(x['party'], x['quotient'], x['assigned'], x['is_ambiguous']) for x in table] == [
+        ('A', '12.000000', True, False), ('B', '12.000000', True, False), ('A', '6.000000', False, False), ('B', '6.000000', False, False)]
+
+    table = list(quotient_table({'A': 12, 'B': 12, 'C': 4}, DIVISOR_METHODS['dhondt'], 3, ranks=(3, 4)))
+    assert [(x['assigned'], x['is_ambiguous']) for x in table] == [(False, True), (False, True)]
+
+@pytest.mark.parametrize('method', DIVISOR_METHODS.keys())
+@pytest.mark.parametrize('votes', [{'p0': 0}, {'p0': 0, 'p1': 0, 'p2': 0}])
+def test_quotient_table_without_votes(method, votes):
+
+    # The engine hands out the seats to all parties in turn, as all quotients are 0
+    distribution = assign({'votes': votes, 'method': method, 'num_of_seats': 4})['distribution']
+    table = list(quotient_table(votes, DIVISOR_METHODS[method], 4, ranks=(1, 4 * len(votes))))
+
+    assert [(x['party'], x['seat']) for x in table] == [(k, s) for s in [1, 2, 3, 4] for k in votes]
+    assert all(x['quotient'] == '0.000000' and x['exact'] == '0' for x in table)
+    for party, n in distribution['seats'].items():
+        assert sum(x['assigned'] for x in table if x['party'] == party) == (n if type(n) == int else n[0])
+
+    page = list(quotient_table(votes, DIVISOR_METHODS[method], 4, seats=(1, 4), max_rank=4 * len(votes)))
+    assert sorted(page, key=lambda x: x['rank']) == table
+
+@pytest.mark.parametrize('method, weight_votes, seats, quotient, exact', [
+    ('dhondt', 1000, 2, '333.333333', '1000/3'),
+    ('schepers', 1000, 1, '666.666667', '2000/3'),
+    ('huntington_hill', 1000, 1, '707.106781', 'sqrt(500000)'),
+    ('huntington_hill', 1000, 0, 'Infinity', 'Infinity'),
+    ('dhondt', 2, 2, '0.666667', '2/3'),
+])
+def test_quotient_formats(method, weight_votes, seats, quotient, exact):
+
+    divisor_method = DIVISOR_METHODS[method]
+    weight = divisor_method.weights({'A': weight_votes})[0]
+    divisor = int(divisor_method.divisors(seats + 1)[seats])
+
+    assert format_quotient(weight, divisor, divisor_method) == quotient
+    assert exact_quotient(weight, divisor, divisor_method) == exact
+
+def test_format_quotient_rounding():
+
+    divisor_method = DIVISOR_METHODS['dhondt']
+
+    assert format_quotient(1, 8, divisor_method, 2) == '0.13' # Half up
+    assert format_quotient(1, 3, divisor_method, 0) == '0'
+    assert format_quotient(10**30, 3, divisor_method) == '333333333333333333333333333333.333333'
+
+sample_input = {'votes': {'A': 4600, 'B': 3100, 'C': 1500, 'D': 800}, 'method': 'schepers', 'num_of_seats': 10, 'return_quotients': True}
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_quotients_route(stream):
+
+    response = app.test_client().post('/azur', json=dict(sample_input, stream=stream))
+    output = response.get_json()
+
+    assert response.status_code == 200
+    assert output['distribution'] == assign(sample_input)['distribution']
+    assert output['quotients'] == list(quotient_table(sample_input['votes'], DIVISOR_METHODS['schepers'], 10, ranks=(1, 10)))
+
+    output = app.test_client().post('/azur', json=dict(sample_input, quotient_seats=[2, 3])).get_json()
+    assert [(x['party'], x['seat']) for x in output['quotients']] == [(k, s) for s in [2, 3] for k in sample_input['votes']]
+
+@pytest.mark.parametrize('changes', [
+    {'method': 'hare'},
+    {'return_quotients': 1},
+    {'quotient_ranks': [5]},
+    {'quotient_ranks': [5, 4]},
+    {'quotient_seats': [0, 4]},
+    {'quotient_ranks': [1, 2], 'quotient_seats': [1, 2]},
+    {'quotient_ranks': [1, QUOTIENT_PAGE_LIMIT + 1]},
+    {'quotient_seats': [1, QUOTIENT_PAGE_LIMIT // 4 + 1]},
+])
+def test_quotients_route_errors(changes):
+
+    response = app.test_client().post('/azur', json=dict(sample_input, **changes))
+
+    assert response.status_code == 400 and 'message' in response.get_json()
@@ -0,0 +1,61 @@
+import json
+import pytest
+import tracemalloc
+
+from assignment import METHODS, assign, assign_result
+from results import AssignmentResult, Comparison, Distribution, SeatAssignment, json_default
+from tables import TABLE_FORMATS
+
+sample_votes = {'A': 10, 'B': 10, 'C': 3, 'D': 0}
+
+@pytest.mark.parametrize('table_format', TABLE_FORMATS)
+@pytest.mark.parametrize('method', METHODS.keys())
+def test_result_matches_dicts(method, table_format):
+
+    input = {'votes': sample_votes, 'method': method, 'num_of_seats': 9, 'return_table': True, 'table_format': table_format}
+    result = assign_result(input)
+
+    assert result.to_dict() == assign(input)
+    assert json.dumps(result, default=json_default, sort_keys=True) == json.dumps(assign(input), sort_keys=True)
+    assert AssignmentResult.from_dict(assign(input)).to_dict() == assign(input)
+
+def test_distribution():
+
+    parties = list(sample_votes.keys())
+    distribution = Distribution(parties, [4, 4, 1, 0], 0b11)
+
+    assert distribution.is_ambiguous
+    assert distribution.ambiguous_parties() == [0, 1]
+    assert distribution.upper() == [5, 5, 1, 0]
+    assert distribution.to_dict() == {'seats': {'A': [4, 5], 'B': [4, 5], 'C': 1, 'D': 0}, 'is_ambiguous': True}
+    assert Distribution.from_dict(distribution.to_dict()) == distribution
+    assert Distribution.from_row(parties, ([4, 4, 1, 0], [0, 1], ())) == distribution
+
+    # Compared like their dicts, ie. regardless of the order of the parties
+    assert Distribution(parties[::-1], [0, 1, 4, 4], 0b1100) == distribution
+    assert Distribution(parties, [4, 4, 1, 0]) != distribution
+
+def test_seat_assignment_and_comparison():
+
+    parties = list(sample_votes.keys())
+
+    assert SeatAssignment(parties, [2]).to_dict() == {'seat_goes_to': 'C', 'is_ambiguous': False}
+    assert SeatAssignment(parties, [0, 1]).to_dict() == {'seat_goes_to': ['A', 'B'], 'is_ambiguous': True}
+    assert SeatAssignment.from_dict(parties, {'seat_goes_to': ['A', 'B'], 'is_ambiguous': True}) == SeatAssignment(parties, [0, 1])
+
+    first, second = Distribution(parties, [1, 1, 0, 0]), Distribution(parties, [2, 0, 0, 0])
+    assert Comparison(first, first).to_dict() == {'dist_A': first.to_dict(), 'dist_B': None, 'is_identical': True}
+    assert Comparison(first, second).to_dict() == {'dist_A': first.to_dict(), 'dist_B': second.to_dict(), 'is_identical': False}
+
+def test_result_is_compact():
+
+    input = {'votes': {f'P{i}': 1000 + 37 * i for i in range(50)}, 'method': 'dhondt', 'num_of_seats': 1000, 'return_table': True}
+    sizes = []
+
+    for function in [assign_result, assign]:
+        tracemalloc.start()
+        output = function(input)
+        sizes.append(tracemalloc.get_traced_memory()[0])
+        tracemalloc.stop()
+
+    assert sizes[0] * 2 < sizes[1]
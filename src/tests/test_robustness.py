@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from app import app
+from assignment import DIVISOR_METHODS, METHODS, assign, assign_result
+from robustness import _divisor_samples, _hare_niemeyer_samples, _lower_seats_and_tie_shares, robustness
+
+def exact_samples(weights, method, num_seats):
+    rows = [_lower_seats_and_tie_shares(assign_result({'votes': dict(enumerate(row.tolist())), 'method': method, 'num_of_seats': num_seats}).distribution, num_seats) for row in weights]
+    return np.array([seats for seats, _ in rows]), np.array([shares for _, shares in rows])
+
+@pytest.mark.parametrize('method', METHODS.keys())
+@pytest.mark.parametrize('num_seats', [1, 4, 25])
+def test_samples_match_assign(method, num_seats):
+
+    # Small votes, so that many samples are tied
+    weights = np.random.default_rng(0).choice([0, 1, 2, 3, 5, 10, 12, 1000, 77777], size=(300, 4)).astype(np.int64)
+    weights[weights.sum(axis=1) == 0, 0] = 1
+
+    if method in DIVISOR_METHODS: seats, tie_shares = _divisor_samples(weights, DIVISOR_METHODS[method], num_seats)
+    else: seats, tie_shares = _hare_niemeyer_samples(weights, num_seats)
+
+    expected_seats, expected_shares = exact_samples(weights, method, num_seats)
+
+    assert np.array_equal(seats, expected_seats)
+    assert np.allclose(tie_shares, expected_shares)
+
+@pytest.mark.parametrize('method', ['dhondt', 'hare'])
+def test_robustness_probabilities(method):
+
+    votes = {'A': 4600, 'B': 3100, 'C': 1500, 'D': 800}
+    output = robustness(votes, method, 20, 'normal', 10, 2000, seed=1)
+
+    assert output['distribution'] == assign({'votes': votes, 'method': method, 'num_of_seats': 20})['distribution']
+    for party, x in output['parties'].items():
+        assert sum(x['seats'].values()) == pytest.approx(1)
+        assert x['p_change'] == pytest.approx(x['p_gain'] + x['p_lose'])
+        assert 0 < x['p_change'] < 1
+    assert sum(x['mean_seats'] for x in output['parties'].values()) == pytest.approx(20)
+
+def test_robustness_without_noise():
+
+    votes = {'A': 10, 'B': 10, 'C': 3}
+    output = robustness(votes, 'schepers', 3, 'uniform', 0, 100, seed=1)
+
+    # The tie between A and B for the third seat is drawn by lot in each sample
+    assert output['parties'] == {
+        'A': {'seats': {1: 0.5, 2: 0.5}, 'mean_seats': 1.5, 'p_gain': 0.0, 'p_lose': 0.0, 'p_change': 0.0},
+        'B': {'seats': {1: 0.5, 2: 0.5}, 'mean_seats': 1.5, 'p_gain': 0.0, 'p_lose': 0.0, 'p_change': 0.0},
+        'C': {'seats': {0: 1.0}, 'mean_seats': 0.0, 'p_gain': 0.0, 'p_lose': 0.0, 'p_change': 0.0},
+    }
+
+def test_robustness_large_house():
+
+    # The seat counts are kept sparsely, so a large house does not cost parties * seats
+    votes = {f'P{i}': 1000 + 37 * i for i in range(200)}
+    output = robustness(votes, 'dhondt', 1000000, samples=3, seed=1)
+
+    assert all(len(x['seats']) <= 6 for x in output['parties'].values())
+    assert sum(x['mean_seats'] for x in output['parties'].values()) == pytest.approx(1000000)
+
+def test_robustness_is_reproducible():
+
+    votes = {'A': 4600, 'B': 3100, 'C': 1500}
+
+    assert robustness(votes, 'huntington_hill', 7, seed=5, samples=500) == robustness(votes, 'huntington_hill', 7, seed=5, samples=500)
+
+@pytest.mark.parametrize('input, status', [
+    ({}, 200),
+    ({'perturbation': {'model': 'normal', 'scale': 2.5}, 'samples': 10, 'seed': 3}, 200),
+    ({'perturbation': {'model': 'cauchy'}}, 400),
+    ({'perturbation': {'scale': 150}}, 400),
+    ({'samples': 0}, 400),
+    ({'samples': 1000001}, 400),
+    ({'seed': 'x'}, 400),
+    ({'num_of_seats': 0}, 400),
+])
+def test_robustness_route(input, status):
+
+    base = {'votes': {'A': 6, 'B': 4, 'C': 2, 'D': 2}, 'method': 'dhondt', 'num_of_seats': 8, 'samples': 100}
+    response = app.test_client().post('/azur_robustness', json=dict(base, **input))
+
+    assert response.status_code == status
+    if status == 200: assert set(response.get_json()['parties']) == {'A', 'B', 'C', 'D'}
@@ -0,0 +1,73 @@
+import pytest
+
+from app import app
+from assignment import assign
+from sensitivity import sensitivity
+from tests.test_tables import all_tests
+
+def seat_bounds(votes, method, num_seats, party):
+    seats = assign({'votes': votes, 'method': method, 'num_of_seats': num_seats, 'return_sequence': False})['distribution']['seats'][party]
+    return (seats[0], seats[1]) if type(seats) == list else (seats, seats)
+
+def brute_force_thresholds(votes, method, num_seats, party):
+    lower, upper = seat_bounds(votes, method, num_seats, party)
+    others = sum(votes.values()) - votes[party]
+
+    gain = next((x - votes[party] for x in range(votes[party] + 1, votes[party] + 2000)
+                 if seat_bounds(dict(votes, **{party: x}), method, num_seats, party)[0] > upper), None)
+    lose = next((votes[party] - x for x in range(votes[party] - 1, -1 if others > 0 else 0, -1)
+                 if seat_bounds(dict(votes, **{party: x}), method, num_seats, party)[1] < lower), None)
+
+    return {'votes_to_gain': gain, 'votes_to_lose': lose}
+
+@pytest.mark.parametrize("votes", [
+    {'A': 6, 'B': 4, 'C': 2, 'D': 2},
+    {'A': 12, 'B': 10, 'C': 3, 'D': 1},
+    {'A': 10, 'B': 10, 'C': 0, 'D': 12},
+    {'A': 5},
+])
+@pytest.mark.parametrize("method", ['dhondt', 'schepers', 'hare', 'danish', 'imperiali'])
+@pytest.mark.parametrize("num_seats", [1, 3, 8])
+def test_sensitivity_brute_force(votes, method, num_seats):
+
+    thresholds = sensitivity(votes, method, num_seats)['thresholds']
+
+    assert thresholds == {party: brute_force_thresholds(votes, method, num_seats, party) for party in votes.keys()}
+
+@pytest.mark.parametrize("votes", [
+    {'A': 6, 'B': 4, 'C': 2, 'D': 2},
+    {'A': 12, 'B': 10, 'C': 3, 'D': 0},
+])
+@pytest.mark.parametrize("method", ['adams', 'huntington_hill'])
+def test_sensitivity_infinite_quotients(votes, method):
+
+    # The first quotient of every party with votes is infinite (a divisor of 0)
+    thresholds = sensitivity(votes, method, 8)['thresholds']
+
+    assert thresholds == {party: brute_force_thresholds(votes, method, 8, party) for party in votes.keys()}
+
+@pytest.mark.parametrize('params', all_tests)
+def test_sensitivity_thresholds_are_minimal(params):
+
+    votes, seats, method = params['votes'], params['num_of_seats'], params['method']
+    thresholds = sensitivity(votes, method, seats)['thresholds']
+
+    for party, x in thresholds.items():
+        lower, upper = seat_bounds(votes, method, seats, party)
+
+        if x['votes_to_gain'] is not None:
+            assert seat_bounds(dict(votes, **{party: votes[party] + x['votes_to_gain']}), method, seats, party)[0] > upper
+            assert seat_bounds(dict(votes, **{party: votes[party] + x['votes_to_gain'] - 1}), method, seats, party)[0] <= upper
+
+        if x['votes_to_lose'] is not None:
+            assert seat_bounds(dict(votes, **{party: votes[party] - x['votes_to_lose']}), method, seats, party)[1] < lower
+            assert seat_bounds(dict(votes, **{party: votes[party] - x['votes_to_lose'] + 1}), method, seats, party)[1] >= lower
+
+def test_sensitivity_route():
+
+    input = {'votes': {'A': 6, 'B': 4, 'C': 2, 'D': 2}, 'method': 'schepers', 'num_of_seats': 8}
+    response = app.test_client().post('/azur_sensitivity', json=input)
+
+    assert response.status_code == 200
+    assert response.get_json() == sensitivity(input['votes'], input['method'], input['num_of_seats'])
+    assert app.test_client().post('/azur_sensitivity', json=dict(input, num_of_seats=0)).status_code == 400
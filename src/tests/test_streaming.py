@@ -0,0 +1,36 @@
+import json
+import pytest
+
+from app import app
+from assignment import assign, assign_lazy
+from comparison import compare, compare_lazy
+from streaming import stream_json
+from tables import TABLE_FORMATS
+from tests.test_tables import all_tests
+
+@pytest.mark.parametrize('table_format', TABLE_FORMATS)
+@pytest.mark.parametrize('params', all_tests)
+def test_stream_matches_assign(params, table_format):
+
+    input = {'votes': params['votes'], 'method': params['method'], 'num_of_seats': params['num_of_seats'], 'return_table': True, 'table_format': table_format}
+
+    assert json.loads(''.join(stream_json(assign_lazy(input), 64))) == json.loads(json.dumps(assign(input)))
+
+@pytest.mark.parametrize('table_format', TABLE_FORMATS)
+def test_stream_matches_compare(table_format):
+
+    params_1 = {'votes': {'A': 6, 'B': 4, 'C': 2, 'D': 2}, 'method': 'schepers'}
+    params_2 = {'votes': {'A': 6, 'B': 4, 'C': 2, 'D': 2}, 'method': 'hare'}
+
+    streamed = ''.join(stream_json(compare_lazy(params_1, params_2, 9, table_format=table_format)))
+
+    assert json.loads(streamed) == json.loads(json.dumps(compare(params_1, params_2, 9, table_format=table_format)))
+
+def test_stream_route():
+
+    input = {'votes': {'A': 3, 'B': 1}, 'method': 'dhondt', 'num_of_seats': 3, 'return_table': True}
+    response = app.test_client().post('/azur', json=dict(input, stream=True))
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert json.loads(response.get_data()) == json.loads(json.dumps(assign(input)))
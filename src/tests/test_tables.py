@@ -0,0 +1,69 @@
+import json
+import pytest
+
+from app import app
+from assignment import assign
+from tables import TABLE_FORMATS, build_table, iter_table_rows
+from tests.test_assignment import tests
+
+all_tests = [dict(x, method=method) for method, method_tests in tests.items() for x in method_tests]
+
+@pytest.mark.parametrize('table_format', TABLE_FORMATS)
+@pytest.mark.parametrize('params', all_tests)
+def test_table_formats_match_rows(params, table_format):
+
+    input = {'votes': params['votes'], 'method': params['method'], 'num_of_seats': params['num_of_seats'], 'return_table': True}
+    rows_output = assign(input)
+    output = assign(dict(input, table_format=table_format))
+
+    assert output['distribution'] == rows_output['distribution']
+    assert list(iter_table_rows(output['table'], table_format)) == rows_output['table']
+    assert json.loads(json.dumps(output)) == output
+
+def test_delta_table_structure():
+
+    table = build_table(['A', 'B'], [([1, 0], (), [(0, 1)]), ([1, 0], [0, 1], ()), ([2, 1], (), [(0, 1), (1, 1)])], 'delta')
+
+    assert table == {'parties': ['A', 'B'],
+                     'changes': [[[0, 1]], [], [[0, 1], [1, 1]]],
+                     'ambiguities': [{'rows': [2, 2], 'parties': [0, 1]}]}
+
+def test_unknown_table_format():
+
+    with pytest.raises(ValueError):
+        build_table(['A'], [], 'csv')
+
+@pytest.mark.parametrize('params', all_tests)
+def test_sparse_table_matches_rows(params):
+
+    input = {'votes': params['votes'], 'method': params['method'], 'num_of_seats': params['num_of_seats']}
+    table = assign(dict(input, return_table=True))['table']
+    n = params['num_of_seats']
+    first, last = (n + 2) // 3, (2 * n + 2) // 3
+    selection = [n, 1, (n + 1) // 2, n]
+
+    range_output = assign(dict(input, table_range=[first, last]))
+    seats_output = assign(dict(input, table_seats=selection))
+
+    assert range_output['table'] == table[first-1:last]
+    assert seats_output['table'] == [table[x-1] for x in selection]
+    assert seats_output['distribution'] == table[-1]
+
+@pytest.mark.parametrize('input, status', [
+    ({'table_seats': [1, 5]}, 200),
+    ({'table_range': [3, 7]}, 200),
+    ({'table_seats': [1, 11]}, 400),
+    ({'table_seats': [0]}, 400),
+    ({'table_range': [7, 3]}, 400),
+    ({'table_range': [3]}, 400),
+    ({'table_seats': [1], 'table_range': [1, 2]}, 400),
+    ({'table_seats': [1], 'table_format': 'delta'}, 400),
+    ({'table_seats': ['1']}, 400),
+])
+def test_sparse_table_route(input, status):
+
+    params = dict({'votes': {'A': 6, 'B': 4, 'C': 2, 'D': 2}, 'method': 'hare', 'num_of_seats': 10}, **input)
+    response = app.test_client().post('/azur', json=params)
+
+    assert response.status_code == status
+    if status == 200: assert response.get_json() == assign(params)
@@ -0,0 +1,165 @@
+"""
+Validation of the inputs of the API, shared by the routes in app.py and the offline bulk CLI in bulk.py, so that
+neither has to import the other.
+"""
+
+from assignment import DIVISOR_METHODS, METHODS, table_selection
+from outcomes import OUTCOME_PAGE_LIMIT
+from quotients import QUOTIENT_PAGE_LIMIT, quotient_page
+from tables import TABLE_FORMATS
+
+# The largest number of seats accepted
+SEAT_LIMIT = 1000000
+
+def validate_input(input): #TODO docstring; typing
+    """
+    Determines whether a given json is a valid input for the API to receive
+    :param input: the input JSON received from flask
+    :return: 
+        (1) a bool with whether or not the input is valid
+        (2) if not valid, a dict with error information
+        (3) if not valid, an int with the error id
+    """
+
+    # Required variables are in request
+    try:
+        method = input['method']
+        votes = input['votes']
+        num_of_seats = input['num_of_seats']
+    except KeyError as e:
+        return False, {'message': f'Value with key {e} is required but was not found in the input data'}, 404
+
+    # Types and dimensions of input are correct
+    try:     
+        assert type(votes) == dict, f"'votes' parameter must be dict, but got {str(type(votes))}."
+        assert all(type(v) == str for v in votes.keys()), "Some or all of of the party names in the votes dictionary are not strings."
+        assert all(type(v) == int for v in votes.values()), "Some or all of of the vote values in the votes dictionary are not integers."
+        assert all(v >= 0 for v in votes.values()), "Some or all of the vote values in the votes dictionary are negative."
+        assert all(v <= 1000000000 for v in votes.values()), "Some or all of the vote values in the votes dictionary are above 1,000,000,000."
+        assert all(len(v) in range(1,33) for v in votes.keys()), "Some or all of the party names in the votes dict are not between 1 and 32 characters long."
+        assert len(votes) > 0, "The passed votes dictionary is empty."
+
+        assert type(num_of_seats) == int, f"'num_of_seats' parameter must be int, but got {str(type(num_of_seats))}."
+        assert type(method) == str, f"'method' parameter must be string, but got {str(type(method))}."
+
+        if 'return_table' in input.keys(): assert type(input['return_table']) == bool, f"'return_table' parameter must be bool, but got {str(type(input['return_table']))}."
+        if 'return_sequence' in input.keys(): assert type(input['return_sequence']) == bool, f"'return_sequence' parameter must be bool, but got {str(type(input['return_sequence']))}."
+        if 'stream' in input.keys(): assert type(input['stream']) == bool, f"'stream' parameter must be bool, but got {str(type(input['stream']))}."
+
+        if 'table_seats' in input.keys():
+            assert type(input['table_seats']) == list, f"'table_seats' parameter must be list, but got {str(type(input['table_seats']))}."
+            assert all(type(x) == int for x in input['table_seats']), "Some or all of the numbers of seats in 'table_seats' are not integers."
+        if 'table_range' in input.keys():
+            assert type(input['table_range']) == list and len(input['table_range']) == 2, "'table_range' parameter must be a list of the first and last number of seats."
+            assert all(type(x) == int for x in input['table_range']), "The numbers of seats in 'table_range' are not integers."
+        assert not ('table_seats' in input.keys() and 'table_range' in input.keys()), "Only one of 'table_seats' and 'table_range' can be given."
+
+        if 'return_quotients' in input.keys(): assert type(input['return_quotients']) == bool, f"'return_quotients' parameter must be bool, but got {str(type(input['return_quotients']))}."
+        for key, name in [('quotient_ranks', 'rank'), ('quotient_seats', 'seat')]:
+            if key in input.keys():
+                assert type(input[key]) == list and len(input[key]) == 2 and all(type(x) == int for x in input[key]), f"'{key}' parameter must be a list of the first and last {name} as integers."
+                assert 1 <= input[key][0] <= input[key][1] <= SEAT_LIMIT, f"The first and last {name} in '{key}' must be ascending and between 1 and {SEAT_LIMIT}."
+        assert not ('quotient_ranks' in input.keys() and 'quotient_seats' in input.keys()), "Only one of 'quotient_ranks' and 'quotient_seats' can be given."
+
+        if 'return_outcomes' in input.keys(): assert type(input['return_outcomes']) == bool, f"'return_outcomes' parameter must be bool, but got {str(type(input['return_outcomes']))}."
+        if 'outcome_range' in input.keys():
+            outcome_range = input['outcome_range']
+            assert type(outcome_range) == list and len(outcome_range) == 2 and all(type(x) == int for x in outcome_range), "'outcome_range' parameter must be a list of the first and last outcome as integers."
+            assert 1 <= outcome_range[0] <= outcome_range[1], "The first and last outcome in 'outcome_range' must be ascending and from 1."
+            assert outcome_range[1] - outcome_range[0] < OUTCOME_PAGE_LIMIT, f"A page of outcomes can have at most {OUTCOME_PAGE_LIMIT} outcomes, request a smaller 'outcome_range'."
+
+    except AssertionError as e:
+        return False, {'message': str(e)}, 400
+
+    # All submitted variables are within allowed range
+    # TODO turn into asserts
+    allowed_methods = list(METHODS.keys())
+    if method not in allowed_methods: 
+        return False, {'message': f"Unknown method: Expected one of {allowed_methods} but got {method}"}, 500
+
+    if 'table_format' in input.keys() and input['table_format'] not in TABLE_FORMATS:
+        return False, {'message': f"Unknown table format: Expected one of {TABLE_FORMATS} but got {input['table_format']}"}, 400
+    
+    if num_of_seats > SEAT_LIMIT: 
+        return False, {'message': f"Num_of_seats ({num_of_seats}) is above accepted limit of {SEAT_LIMIT}"}, 400
+    elif num_of_seats <= 0:
+        return False, {'message': f"Num_of_seats ({num_of_seats}) is below 1"}, 400
+
+    parties_limit = 1000
+    if len(votes) > parties_limit: 
+        return False, {'message': f"The votes dictionary contains {len(votes)} parties, above the accepted limit of {parties_limit}"}, 400
+
+    # The table grows with seats times parties, so it keeps the size that was allowed before the limits above were raised
+    table_limit = 10000000
+    house_sizes = table_selection(input)
+
+    if house_sizes is not None:
+        if any(x < 1 or x > num_of_seats for x in house_sizes) or ('table_range' in input.keys() and len(house_sizes) == 0):
+            return False, {'message': f"The selected rows of the table must be numbers of seats between 1 and num_of_seats ({num_of_seats}), in ascending order for 'table_range'"}, 400
+        if len(house_sizes) * len(votes) > table_limit:
+            return False, {'message': f"A table of {len(house_sizes)} rows for {len(votes)} parties is above the accepted limit of {table_limit} table entries"}, 400
+        if input.get('table_format', 'rows') != 'rows':
+            return False, {'message': "Selected rows of the table can only be returned in the 'rows' table format"}, 400
+
+    elif input.get('return_table', False) and num_of_seats * len(votes) > table_limit:
+        return False, {'message': f"A table of {num_of_seats} seats for {len(votes)} parties is above the accepted limit of {table_limit} table entries"}, 400
+
+    if input.get('return_quotients', False):
+        if method not in DIVISOR_METHODS:
+            return False, {'message': f"The quotient table is only available for the divisor methods {list(DIVISOR_METHODS.keys())}"}, 400
+
+        ranks, seats = quotient_page(input)
+        page_size = ranks[1] - ranks[0] + 1 if ranks is not None else (seats[1] - seats[0] + 1) * len(votes)
+        if page_size > QUOTIENT_PAGE_LIMIT:
+            return False, {'message': f"A page of {page_size} quotients is above the accepted limit of {QUOTIENT_PAGE_LIMIT}, request fewer 'quotient_ranks' or 'quotient_seats'"}, 400
+    
+    return True, None, None
+
+def validate_compare_input(input):
+    """
+    Determines whether a given json is a valid input for /azur_compare: either two scenarios 'dist_A' and 'dist_B' or
+    a list of 'scenarios', each of which is validated as an /azur input for the shared number of seats and options
+    :param input: the input JSON received from flask
+    :return: like validate_input
+    """
+
+    if type(input) != dict: return False, {'message': f"The request JSON must be dict, but got {str(type(input))}."}, 400
+
+    return_table = input.get('return_table', True)
+    output = input.get('output', 'full')
+
+    if 'scenarios' in input.keys(): scenarios = input['scenarios']
+    else: scenarios = [input.get('dist_A'), input.get('dist_B')]
+
+    scenario_limit = 20
+    if type(scenarios) != list:
+        return False, {'message': f"'scenarios' parameter must be list, but got {str(type(scenarios))}."}, 400
+    if len(scenarios) > scenario_limit:
+        return False, {'message': f"The comparison contains {len(scenarios)} scenarios, above the accepted limit of {scenario_limit}"}, 400
+
+    if output not in ['full', 'sparse']:
+        return False, {'message': f"Unknown output: Expected one of ['full', 'sparse'] but got {output}"}, 400
+
+    for scenario in scenarios:
+        if type(scenario) != dict:
+            return False, {'message': f"Scenario must be dict, but got {str(type(scenario))}."}, 400
+
+        shared = {key: input[key] for key in ['num_of_seats', 'table_format', 'stream'] if key in input.keys()}
+        input_is_valid, error_info, error_code = validate_input(dict(scenario, return_table=return_table, **shared))
+        if not input_is_valid: return False, error_info, error_code
+
+    # A list of scenarios is compared row by row in a single response, see comparison.compare_many
+    if 'scenarios' in input.keys() and input.get('table_format', 'rows') != 'rows':
+        return False, {'message': f"A list of 'scenarios' is only compared in the 'rows' table format, but got {input['table_format']}."}, 400
+    if 'scenarios' in input.keys() and input.get('stream', False):
+        return False, {'message': "A list of 'scenarios' cannot be streamed, only 'dist_A' and 'dist_B'."}, 400
+
+    return True, None, None
+
+def dict_raise_on_duplicates(ordered_pairs): #TODO docstring; typing
+    """Helper function that rejects duplicate keys in dict, passed to json.loads."""
+    d = {}
+    for k, v in ordered_pairs:
+        if k in d: raise ValueError("Duplicate key: %r" % (k,))
+        else: d[k] = v
+    return d